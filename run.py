@@ -4,17 +4,60 @@ if __name__ == "__main__":
 
 
     import argparse
+    import json
+    import os.path
+    import sys
 
     from uncompyle3.uncompyle import Uncompyle
+    from uncompyle3.utils.debug import enable_debug, disable_debug
 
 
     argparser = argparse.ArgumentParser(description="Bytecode decompiler for CPython 3.x")
-    argparser.add_argument("file", help="path to file with bytecode")
+    argparser.add_argument("file", help="path to file with bytecode, or to directory tree with bytecode files")
+    argparser.add_argument("--output", help="directory for decompiled sources, required when decompiling directory")
+    argparser.add_argument("--jobs", type=int, help="amount of worker processes when decompiling directory, defaults to amount of CPUs")
+    argparser.add_argument("--grammar-cache", help="path to directory where parser state machines are cached")
+    argparser.add_argument("--chunk-size", type=int, help="parse top-level statements in chunks of about this many tokens, defaults to single statements")
+    argparser.add_argument("--no-stack-builder", action="store_true", help="parse all statements, including ones without jumps; without --chunk-size whole module is parsed at once")
+    argparser.add_argument("--result-cache", help="path to directory where decompiled sources are cached")
+    argparser.add_argument("--result-cache-size", type=int, default=256, help="limit of result cache size in MiB")
+    argparser.add_argument("--stats", action="store_true", help="print statistics of each decompiled file into stderr as JSON")
+    argparser.add_argument("--debug", metavar="PATH", help="write debug trace into this file")
     args = argparser.parse_args()
 
+    if args.debug is not None:
+        enable_debug(path=args.debug)
+
+    stats_hook = None
+    if args.stats:
+        stats_hook = lambda stats: sys.stderr.write("{}\n".format(json.dumps(stats.as_dict(), sort_keys=True)))
+    uncompyle = Uncompyle(
+        grammar_cache=args.grammar_cache, chunk_size=args.chunk_size, stack_builder=not args.no_stack_builder,
+        result_cache=args.result_cache, result_cache_size=args.result_cache_size * 1024 * 1024, stats_hook=stats_hook)
+
+    if os.path.isdir(args.file):
+        if args.output is None:
+            argparser.error("--output is required when decompiling directory")
+        failures = 0
+        with uncompyle:
+            for result in uncompyle.run_batch(args.file, args.output, workers=args.jobs, with_stats=args.stats):
+                if result.error is not None:
+                    failures += 1
+                    sys.stderr.write("{}: {}\n".format(result.source_path, result.error))
+                elif result.stats is not None:
+                    # Stats of workers are passed back with results
+                    stats = dict(result.stats, source_path=result.source_path)
+                    sys.stderr.write("{}\n".format(json.dumps(stats, sort_keys=True)))
+        disable_debug()
+        sys.exit(1 if failures else 0)
+
     file = open(args.file, "rb")
     file_bytes = file.read()
     file.close()
 
-    uncompyle = Uncompyle()
-    print(uncompyle.run(file_bytes))
+    # Statements are written as soon as they are decompiled; workers
+    # used for nested code objects are stopped afterwards
+    with uncompyle:
+        uncompyle.write(file_bytes, sys.stdout)
+    sys.stdout.write("\n")
+    disable_debug()
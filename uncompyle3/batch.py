@@ -0,0 +1,126 @@
+import marshal
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .utils.debug import WorkerDebug, forward_debug
+from .utils.fs import atomic_write
+
+
+# Outcome of decompilation of single file; error is None on success,
+# stats is flat dictionary of Stats record when it was requested
+FileResult = namedtuple('FileResult', ('source_path', 'target_path', 'error', 'stats'))
+
+
+def find_bytecode(source_dir):
+    """
+    Find all bytecode files in directory tree, returning their
+    paths relative to <source_dir>.
+    """
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(source_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.pyc'):
+                paths.append(os.path.relpath(os.path.join(dirpath, filename), source_dir))
+    return paths
+
+
+def get_source_path(path):
+    """
+    Get relative path of source file for relative path of bytecode
+    file. Files from __pycache__ are placed where their source files
+    would be, and interpreter tags like .cpython-35 are dropped.
+    """
+    dirname, filename = os.path.split(path)
+    if os.path.basename(dirname) == '__pycache__':
+        dirname = os.path.dirname(dirname)
+    # Module names cannot contain dots, thus everything after the
+    # first one is tag or extension
+    name = filename.split('.', 1)[0]
+    return os.path.join(dirname, '{}.py'.format(name))
+
+
+# Each worker process keeps its own decompiler, so that grammar is
+# built once per process rather than once per file
+_uncompyle = None
+_uncompyle_options = None
+
+
+def get_uncompyle(options):
+    """
+    Get decompiler of this process, created with <options>.
+    """
+    global _uncompyle, _uncompyle_options
+    if _uncompyle is None or _uncompyle_options != options:
+        from .uncompyle import Uncompyle
+        _uncompyle = Uncompyle(**options)
+        _uncompyle_options = options
+    return _uncompyle
+
+
+def decompile_file(options, source_path, target_path, with_stats=False):
+    """
+    Decompile file at <source_path> into <target_path>. Runs in
+    worker process.
+    """
+    stats = None
+    try:
+        infile = open(source_path, 'rb')
+        file_bytes = infile.read()
+        infile.close()
+        if with_stats:
+            source, stats = get_uncompyle(options).run(file_bytes, with_stats=True)
+            stats = stats.as_dict()
+        else:
+            source = get_uncompyle(options).run(file_bytes)
+        atomic_write(target_path, source.encode('utf-8'))
+    except Exception as e:
+        error = '{}: {}'.format(type(e).__name__, e)
+        return FileResult(source_path, target_path, error, None)
+    return FileResult(source_path, target_path, None, stats)
+
+
+def _decompile_task(task):
+    debug_queue, args = task
+    forward_debug(debug_queue)
+    return decompile_file(*args)
+
+
+def decompile_body_task(task):
+    """
+    Decompile nested code object in worker process; task contains
+    options of decompiler, marshalled code object and bodies of
+    code objects nested in it.
+    """
+    options, bytecode, bodies = task
+    return get_uncompyle(options).decompile_body(marshal.loads(bytecode), bodies)
+
+
+def run_batch(source_dir, target_dir, options, workers=None, chunksize=8, with_stats=False):
+    """
+    Decompile all bytecode files found in <source_dir> tree into
+    mirrored tree in <target_dir>, using pool of <workers> processes
+    (defaults to amount of CPUs). <options> are keyword arguments
+    for Uncompyle. Generate FileResult for each file, failures do
+    not stop the batch. When <with_stats> is set, results carry
+    stats of decompiled files.
+    """
+    # Workers of pool can't start pools of their own
+    options = dict(options, nested_workers=1)
+    paths = find_bytecode(source_dir)
+    if not paths:
+        return
+    # Debug messages of workers are written by this process
+    with WorkerDebug() as worker_debug, ProcessPoolExecutor(max_workers=workers) as executor:
+        tasks = []
+        for path in paths:
+            tasks.append((worker_debug.queue, (
+                options,
+                os.path.join(source_dir, path),
+                os.path.join(target_dir, get_source_path(path)),
+                with_stats)))
+        # Files are sent to workers in small groups to save on
+        # inter-process communication
+        for result in executor.map(_decompile_task, tasks, chunksize=chunksize):
+            yield result
@@ -0,0 +1,157 @@
+import hashlib
+import os
+
+from .utils.fs import atomic_write
+
+
+# Bump when layout of cache changes; changes of decompiler code
+# are covered by hash of package sources
+CACHE_VERSION = 1
+
+# Default limit of total size of cached sources, in bytes
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+# Amount of stores after which cache directory is scanned again, to
+# take into account entries written by other processes
+RESCAN_INTERVAL = 64
+
+_source_digest = None
+
+
+def get_source_digest():
+    """
+    Get hash of all modules of the package, thus any change of
+    scanner, parser or walker invalidates cached sources.
+    """
+    global _source_digest
+    if _source_digest is None:
+        package_path = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha1()
+        for dirpath, dirnames, filenames in os.walk(package_path):
+            dirnames[:] = sorted(name for name in dirnames if name not in ('tests', '__pycache__'))
+            for filename in sorted(filenames):
+                if not filename.endswith('.py'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                digest.update(os.path.relpath(path, package_path).replace(os.sep, '/').encode('utf-8'))
+                with open(path, 'rb') as f:
+                    digest.update(hashlib.sha1(f.read()).digest())
+        _source_digest = digest.digest()
+    return _source_digest
+
+
+class ResultCache:
+    """
+    On-disk storage of decompiled sources, addressed by hash of
+    bytecode and of decompiler version. Files which were used least
+    recently are removed when total size goes over the limit. Cache
+    can be shared by several processes: files are written atomically,
+    and files removed by other processes are treated as misses.
+    """
+
+    def __init__(self, path, version, max_size=DEFAULT_MAX_SIZE):
+        self.path = path
+        # Anything which identifies how sources are produced, like
+        # grammar and walker table, plus code of decompiler itself
+        self.version = hashlib.sha1(
+            repr((CACHE_VERSION, version)).encode('utf-8') + get_source_digest()).digest()
+        self.max_size = max_size
+        # Size of cache as seen by this process, None until the first
+        # scan of the cache directory
+        self.size = None
+        # Stores done since the last scan
+        self.stores = 0
+
+    def key(self, bytecode):
+        """
+        Calculate key of source for <bytecode>.
+        """
+        return hashlib.sha1(self.version + bytecode).hexdigest()
+
+    def get_file_path(self, key):
+        # Files are spread over subdirectories to keep them small
+        return os.path.join(self.path, key[:2], '{}.py'.format(key[2:]))
+
+    def load(self, key):
+        """
+        Get source stored under <key>, or None if it isn't cached.
+        """
+        path = self.get_file_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        # Modification time marks last use for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data.decode('utf-8')
+
+    def store(self, key, source):
+        """
+        Save <source> under <key>, evicting old entries if needed.
+        """
+        data = source.encode('utf-8')
+        path = self.get_file_path(key)
+        # Overwritten entry doesn't take space anymore
+        try:
+            old_size = os.stat(path).st_size
+        except OSError:
+            old_size = 0
+        # Cache is optional, failure to write it should not
+        # prevent decompilation
+        try:
+            atomic_write(path, data)
+        except OSError:
+            return
+        self.stores += 1
+        if self.size is None or self.stores >= RESCAN_INTERVAL:
+            self.size = self.scan()[1]
+            self.stores = 0
+        else:
+            self.size += len(data) - old_size
+        if self.size > self.max_size:
+            self.evict()
+
+    def scan(self):
+        """
+        Get list of (mtime, size, path) for all cached files, ordered
+        from least recently used, and their total size.
+        """
+        entries = []
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for filename in filenames:
+                # Skip files which are being written
+                if not filename.endswith('.py'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        return entries, total
+
+    def evict(self):
+        """
+        Remove least recently used files until cache takes no more
+        than 90% of its limit, to not evict on every store.
+        """
+        entries, total = self.scan()
+        target = self.max_size * 0.9
+        for mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                # Removed by another process
+                pass
+            total -= size
+        self.size = total
+        self.stores = 0
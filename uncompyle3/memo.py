@@ -0,0 +1,65 @@
+import hashlib
+from collections import OrderedDict, namedtuple
+from types import CodeType
+
+
+MemoStats = namedtuple('MemoStats', ('hits', 'misses', 'size'))
+
+
+def fingerprint(code_object):
+    """
+    Calculate structural fingerprint of <code_object>: code objects
+    with equal fingerprints are decompiled into the same source.
+    Name, file name and first line number are not part of it, thus
+    the same body found in different places has the same fingerprint.
+    """
+    return hashlib.sha1(repr(_describe(code_object)).encode('utf-8')).digest()
+
+
+def _describe(co):
+    # Scanner uses repr() of constants in tokens, so the same repr
+    # means the same output; type is added for constants like 1 and
+    # True, whose reprs differ, but which are equal as dictionary keys
+    consts = []
+    for const in co.co_consts:
+        if isinstance(const, CodeType):
+            consts.append(_describe(const))
+        else:
+            consts.append((type(const).__name__, repr(const)))
+    return (co.co_code, tuple(consts), co.co_names, co.co_varnames, co.co_flags, co.co_argcount,
+            co.co_kwonlyargcount, co.co_cellvars, co.co_freevars, co.co_lnotab)
+
+
+class CodeMemo:
+    """
+    In-memory storage of sources decompiled from code objects, keyed
+    by their fingerprints. When it holds <max_size> entries, least
+    recently used ones are dropped.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Get source stored under <key>, or None if there is none.
+        """
+        source = self.entries.get(key)
+        if source is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return source
+
+    def put(self, key, source):
+        self.entries[key] = source
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        return MemoStats(self.hits, self.misses, len(self.entries))
@@ -1,18 +1,31 @@
-from collections import UserList
+class ASTNode:
+    # Nodes are created in big numbers, thus they have no instance
+    # dictionary, and keep children in a tuple
+    __slots__ = ('type', 'data')
 
-
-class ASTNode(UserList):
-    def __init__(self, type_, children=[]):
+    def __init__(self, type_, children=()):
         # TODO: consider intern()ing type string
         self.type = type_
-        UserList.__init__(self, children)
+        self.data = tuple(children)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __setitem__(self, index, value):
+        # Generic spark tree builder fills nodes via slice assignment
+        data = list(self.data)
+        data[index] = value
+        self.data = tuple(data)
 
-#    def __getslice__(self, low, high):
-#        return self.data[low:high]
+    def __iter__(self):
+        return iter(self.data)
 
     def __eq__(self, other):
         if isinstance(other, ASTNode):
-            result = self.type == other.type and UserList.__eq__(self, other)
+            result = self.type == other.type and self.data == other.data
         else:
             result = self.type == other
         return result
@@ -24,11 +37,29 @@ class ASTNode(UserList):
         return self.__repr__(indent)
 
     def __repr__(self, indent=''):
-        current = '{}{}'.format(indent, self.type)
-        newindent = '  {}'.format(indent)
-        # Pass indent to children, if they are not other AST nodes
-        # prepend it manually
-        children = '\n'.join(child.__str__(indent=newindent) if isinstance(child, ASTNode)
-                             else '{}{}'.format(newindent, child) for child in self)
-        total = '{}\n{}'.format(current, children)
-        return total
+        # Trees can be as deep as there're statements in module,
+        # thus walk it using explicit stack rather than recursion.
+        # Stack contains nodes along with their indentation, and
+        # ready-to-use strings
+        parts = []
+        stack = [(self, indent)]
+        while stack:
+            node, indent = stack.pop()
+            if node is None:
+                parts.append(indent)
+                continue
+            parts.append('{}{}\n'.format(indent, node.type))
+            newindent = '  {}'.format(indent)
+            # Pass indent to children, if they are not other AST nodes
+            # prepend it manually, and separate children with newlines
+            children = []
+            for child in node.data:
+                if children:
+                    children.append((None, '\n'))
+                if isinstance(child, ASTNode):
+                    children.append((child, newindent))
+                else:
+                    children.append((None, '{}{}'.format(newindent, child)))
+            children.reverse()
+            stack.extend(children)
+        return ''.join(parts)
@@ -0,0 +1,66 @@
+import hashlib
+import os.path
+import pickle
+
+from uncompyle3.cache import get_source_digest
+from uncompyle3.utils.fs import atomic_write
+
+
+# Bump whenever format of cached data changes; changes of the way
+# state machines are built are covered by hash of package sources
+CACHE_VERSION = 1
+
+
+class GrammarCache:
+    """
+    On-disk storage of fully expanded parser state machines. Each
+    grammar is stored in separate file, named after hash of its rules.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def key(self, parser):
+        """
+        Calculate key of grammar currently defined in <parser>.
+        """
+        rules = sorted(rule for rulelist in parser.rules.values() for rule in rulelist)
+        data = repr((CACHE_VERSION, rules)).encode('utf-8') + get_source_digest()
+        return hashlib.sha1(data).hexdigest()
+
+    def get_file_path(self, key):
+        return os.path.join(self.path, 'grammar-{}.pickle'.format(key))
+
+    def load(self, parser):
+        """
+        Load state machine for grammar of <parser> into it.
+
+        Return True if it was found in cache, False otherwise.
+        """
+        key = self.key(parser)
+        try:
+            with open(self.get_file_path(key), 'rb') as f:
+                data = pickle.load(f)
+        # Treat missing, broken and outdated files the same way,
+        # they will be overwritten by the following store
+        except Exception:
+            return False
+        if data.get('version') != CACHE_VERSION or data.get('key') != key:
+            return False
+        parser.importStateMachine(data['machine'])
+        return True
+
+    def store(self, parser):
+        """
+        Save state machine of <parser> into cache.
+        """
+        key = self.key(parser)
+        data = {'version': CACHE_VERSION,
+                'key': key,
+                'machine': parser.exportStateMachine()}
+        # Cache is optional, failure to write it should not
+        # prevent parsing
+        try:
+            atomic_write(self.get_file_path(key), pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+        except OSError:
+            pass
@@ -0,0 +1,9 @@
+from uncompyle3.exception import UncompyleError
+
+
+class ParserError(UncompyleError):
+    """
+    Raise when tokens of code object can't be parsed
+    according to the grammar.
+    """
+    pass
@@ -0,0 +1,218 @@
+SHIFT = 'shift'
+REDUCE = 'reduce'
+ACCEPT = 'accept'
+# Marks table cells which have more than one action
+CONFLICT = ('conflict', None)
+# Lookahead at the end of input
+END = None
+# Placeholder lookahead used to find out which lookaheads propagate
+_PROPAGATE = object()
+_ACCEPT_SYMBOL = 'ACCEPT'
+
+
+class LRTable:
+    """
+    LALR(1) parsing table, built by propagation of lookaheads between
+    kernels of LR(0) item sets (Aho, Sethi, Ullman, "Compilers:
+    Principles, Techniques, and Tools", 2nd edition, section 4.7.5).
+    Grammar must have no nullable symbols. Cells which have more than
+    one possible action are marked as conflicts, input reaching any
+    of them has to be handled by general parser.
+    """
+
+    def __init__(self, rules, start):
+        # Rule with index 0 is augmented start rule
+        self.rules = [(_ACCEPT_SYMBOL, (start,))] + sorted(rules)
+        self.by_lhs = {}
+        for index, (lhs, rhs) in enumerate(self.rules):
+            if not rhs:
+                raise ValueError('grammar has nullable symbol {}'.format(lhs))
+            self.by_lhs.setdefault(lhs, []).append(index)
+        self.first = self.compute_first()
+        self.kernels = []
+        self.transitions = {}
+        self.actions = {}
+        self.gotos = {}
+        self.conflicts = 0
+        self.build_states()
+        self.build_actions(self.compute_lookaheads())
+
+    def compute_first(self):
+        """
+        Compute sets of terminals which derivations of each
+        nonterminal can start with.
+        """
+        first = dict((lhs, set()) for lhs in self.by_lhs)
+        changes = True
+        while changes:
+            changes = False
+            for lhs, rhs in self.rules:
+                sym = rhs[0]
+                new = first[sym] if sym in first else (sym,)
+                size = len(first[lhs])
+                first[lhs].update(new)
+                if len(first[lhs]) != size:
+                    changes = True
+        return first
+
+    def first_of(self, sym):
+        if sym in self.first:
+            return self.first[sym]
+        return {sym}
+
+    def closure(self, kernel):
+        """
+        Get all LR(0) items of item set with given kernel.
+        """
+        items = list(kernel)
+        predicted = set()
+        for rule, dot in items:
+            rhs = self.rules[rule][1]
+            if dot < len(rhs) and rhs[dot] in self.by_lhs and rhs[dot] not in predicted:
+                predicted.add(rhs[dot])
+                items.extend((index, 0) for index in self.by_lhs[rhs[dot]])
+        return items
+
+    def build_states(self):
+        """
+        Build canonical collection of LR(0) item sets, represented
+        by their kernels.
+        """
+        numbers = {}
+        self.kernels.append(((0, 0),))
+        numbers[self.kernels[0]] = 0
+        for state, kernel in enumerate(self.kernels):
+            targets = {}
+            for rule, dot in self.closure(kernel):
+                rhs = self.rules[rule][1]
+                if dot < len(rhs):
+                    targets.setdefault(rhs[dot], []).append((rule, dot + 1))
+            for sym in sorted(targets):
+                target = tuple(sorted(targets[sym]))
+                if target not in numbers:
+                    numbers[target] = len(self.kernels)
+                    self.kernels.append(target)
+                self.transitions[(state, sym)] = numbers[target]
+
+    def closure1(self, item):
+        """
+        Get LR(1) closure of single item with placeholder lookahead,
+        as mapping of items to their lookaheads.
+        """
+        lookaheads = {item: {_PROPAGATE}}
+        worklist = [item]
+        while worklist:
+            rule, dot = worklist.pop()
+            rhs = self.rules[rule][1]
+            if dot >= len(rhs) or rhs[dot] not in self.by_lhs:
+                continue
+            if dot + 1 < len(rhs):
+                new = self.first_of(rhs[dot + 1])
+            else:
+                new = lookaheads[(rule, dot)]
+            for index in self.by_lhs[rhs[dot]]:
+                current = lookaheads.setdefault((index, 0), set())
+                if not new <= current:
+                    current.update(new)
+                    worklist.append((index, 0))
+        return lookaheads
+
+    def compute_lookaheads(self):
+        """
+        Determine lookaheads of kernel items, returning mapping of
+        (state, item) to set of terminals.
+        """
+        lookaheads = {}
+        propagation = {}
+        closures = {}
+        for state, kernel in enumerate(self.kernels):
+            for item in kernel:
+                lookaheads.setdefault((state, item), set())
+                # Closure depends only on the item, not on state
+                if item not in closures:
+                    closures[item] = self.closure1(item)
+                for (rule, dot), terminals in closures[item].items():
+                    rhs = self.rules[rule][1]
+                    if dot >= len(rhs):
+                        continue
+                    target = (self.transitions[(state, rhs[dot])], (rule, dot + 1))
+                    spontaneous = lookaheads.setdefault(target, set())
+                    for terminal in terminals:
+                        if terminal is _PROPAGATE:
+                            propagation.setdefault((state, item), []).append(target)
+                        else:
+                            spontaneous.add(terminal)
+        lookaheads[(0, (0, 0))].add(END)
+        changes = True
+        while changes:
+            changes = False
+            for source, targets in propagation.items():
+                terminals = lookaheads[source]
+                for target in targets:
+                    if not terminals <= lookaheads[target]:
+                        lookaheads[target].update(terminals)
+                        changes = True
+        return lookaheads
+
+    def set_action(self, key, action):
+        current = self.actions.get(key)
+        if current is None:
+            self.actions[key] = action
+        elif current != action and current is not CONFLICT:
+            self.actions[key] = CONFLICT
+            self.conflicts += 1
+
+    def build_actions(self, lookaheads):
+        """
+        Fill action and goto tables.
+        """
+        for (state, sym), target in self.transitions.items():
+            if sym in self.by_lhs:
+                self.gotos[(state, sym)] = target
+            else:
+                self.set_action((state, sym), (SHIFT, target))
+        # Without nullable symbols only kernel items are complete
+        for (state, (rule, dot)), terminals in lookaheads.items():
+            if dot < len(self.rules[rule][1]):
+                continue
+            for terminal in terminals:
+                if rule == 0:
+                    self.set_action((state, terminal), (ACCEPT, None))
+                else:
+                    self.set_action((state, terminal), (REDUCE, rule))
+
+    def parse(self, tokens, types, reduce):
+        """
+        Parse <tokens>, whose terminal IDs are in <types>, calling
+        reduce(rule, args) to get value of each reduced rule.
+
+        Return value of start symbol, or None if input hits conflict
+        or syntax error.
+        """
+        states = [0]
+        values = []
+        actions = self.actions
+        gotos = self.gotos
+        rules = self.rules
+        amount = len(tokens)
+        i = 0
+        while True:
+            lookahead = types[i] if i < amount else END
+            action = actions.get((states[-1], lookahead), CONFLICT)
+            kind, arg = action
+            if kind is SHIFT:
+                states.append(arg)
+                values.append(tokens[i])
+                i += 1
+            elif kind is REDUCE:
+                rule = rules[arg]
+                size = len(rule[1])
+                args = values[-size:]
+                del values[-size:]
+                del states[-size:]
+                values.append(reduce(rule, args))
+                states.append(gotos[(states[-1], rule[0])])
+            elif kind is ACCEPT:
+                return values[0]
+            else:
+                return None
@@ -1,16 +1,70 @@
 from uncompyle3.utils.spark import GenericASTBuilder
 from .astnode import ASTNode
+from .cache import GrammarCache
+from .exception import ParserError
+from .lr import LRTable
+from .stack import StackBuilder
 
 
 # Empty function, used as argument when adding custom rules
 nop_func = lambda self, args: None
 
+# Amount of inputs which needed rules missing from LALR(1) table, after
+# which table is regenerated; until then such inputs go to Earley
+# parser, as regeneration costs much more than extension of its
+# state machine
+LR_REBUILD_INPUTS = 8
+
 
 class Parser(GenericASTBuilder):
 
-    def __init__(self):
+    def __init__(self, typed=True, grammar_cache=None, leo=False, lookahead=True, lr=True, stack_builder=True):
+        # When typed, terminals are matched against token types
+        # directly, and scanning needs single edge lookup per item
+        self.typed = typed
+        # Path to directory with state machines of already seen
+        # grammars, if any
+        self.grammar_cache = GrammarCache(grammar_cache) if grammar_cache is not None else None
         self.added_rules = set()
+        # Counters of state machine regenerations from scratch, and
+        # of grammar changes which were applied without regeneration
+        self.state_machine_rebuilds = 0
+        self.state_machine_extensions = 0
+        # Try deterministic LALR(1) parser before Earley one; it is
+        # used only for typed parser. Table isn't regenerated on each
+        # grammar change, inputs which need custom rules it lacks are
+        # skipped until LR_REBUILD_INPUTS of them are collected
+        self.lr = lr and typed
+        self.lr_table = None
+        self.lr_rules = set()
+        self.lr_pending = 0
+        # Counters of table generations, and of inputs which skipped
+        # the table as it lacked their rules
+        self.lr_table_builds = 0
+        self.lr_table_skips = 0
+        # Which parser produced the last tree, and how many times
+        # each of them was used
+        self.last_path = None
+        self.lr_parses = 0
+        self.earley_parses = 0
+        # Totals of Earley sets, items in them and entries of links
+        # table over all Earley parses
+        self.earley_sets = 0
+        self.earley_items = 0
+        self.earley_links = 0
+        # When parsing chunks, those without jumps are turned into
+        # trees by simulation of value stack rather than by parsing
+        self.stack_builder = StackBuilder(self.nonterminal) if stack_builder else None
+        self.stack_builds = 0
         GenericASTBuilder.__init__(self, ASTNode, "stmts")
+        # Skip items of deterministic right-recursive completion
+        # chains in Earley sets
+        self.leo = leo
+        # Do not keep items which can't start with type of the next
+        # token in Earley sets; needs typed parser
+        self.lookahead = lookahead
+        if self.grammar_cache is not None:
+            self.build_state_machine()
 
     def p_grammar(self, args):
         """
@@ -94,6 +148,24 @@ class Parser(GenericASTBuilder):
         or ::= expr POP_JUMP_IF_TRUE expr COME_FROM
         """
 
+    def p_function(self, args):
+        """
+        stmt ::= funcdef
+        funcdef ::= mkfunc designator
+        mkfunc ::= LOAD_CONST LOAD_CONST MAKE_FUNCTION
+
+        stmt ::= classdef
+        classdef ::= LOAD_BUILD_CLASS mkfunc expr CALL_FUNCTION designator
+
+        stmt ::= return_stmt
+        return_stmt ::= expr RETURN_VALUE
+
+        expr ::= LOAD_FAST
+        expr ::= LOAD_GLOBAL
+        expr ::= LOAD_DEREF
+        designator ::= STORE_FAST
+        """
+
     def p_assign(self, args):
         """
         stmt ::= assign
@@ -119,14 +191,180 @@ class Parser(GenericASTBuilder):
         inplace_op ::= INPLACE_OR
         """
 
+    def nonterminal(self, type_, args):
+        # Nodes are built at once, rather than filled in
+        return ASTNode(type_, args)
+
+    def error(self, token):
+        # Base parser exits the interpreter, which would also take down
+        # anything which decompiles many files, like batch workers
+        raise ParserError("Syntax error at or near `{}' token".format(token))
+
+    def typestring(self, token):
+        # Grammar terminals are compared to tokens only by type
+        # (see Token.__eq__), so type can be used as terminal ID
+        if self.typed:
+            return token.type
+        return None
+
     def parse(self, tokens):
-        self.add_custom_rules(tokens)
+        rules = self.add_custom_rules(tokens)
+        if self.lr and self.check_lr_table(rules):
+            ast = self.parse_lr(tokens)
+            if ast is not None:
+                self.last_path = 'lr'
+                self.lr_parses += 1
+                return ast
+        if self.ruleschanged:
+            self.build_state_machine()
+        self.last_path = 'earley'
+        self.earley_parses += 1
         ast = GenericASTBuilder.parse(self, tokens)
+        self.earley_sets += self.setCount
+        self.earley_items += self.itemCount
+        self.earley_links += len(self.links)
+        return ast
+
+    def check_lr_table(self, rules):
+        """
+        Check if LALR(1) table can be used for input which needs
+        custom <rules>, regenerating it when enough inputs needed
+        rules it lacks.
+        """
+        if self.lr_table is not None and not rules <= self.lr_rules:
+            self.lr_pending += 1
+            if self.lr_pending < LR_REBUILD_INPUTS:
+                self.lr_table_skips += 1
+                return False
+            self.lr_table = None
+        return True
+
+    def parse_lr(self, tokens):
+        """
+        Parse tokens using LALR(1) table.
+
+        Return None if grammar or input isn't deterministic.
+        """
+        if self.lr_table is None:
+            self.build_lr_table()
+        if self.lr_table is False:
+            return None
+        types = [self.typestring(token) for token in tokens]
+        return self.lr_table.parse(tokens, types, self.reduce_lr)
+
+    def reduce_lr(self, rule, args):
+        return self.rule2func[rule](args)
+
+    def build_lr_table(self):
+        """
+        Generate LALR(1) table for current grammar, or mark it as
+        unavailable when grammar has nullable symbols.
+        """
+        self.lr_table_builds += 1
+        self.lr_rules = set(self.added_rules)
+        self.lr_pending = 0
+        rules = []
+        for lhs, rulelist in self.rules.items():
+            if lhs != self._START:
+                rules.extend(rulelist)
+        start = self.rules[self._START][0][1][1]
+        try:
+            self.lr_table = LRTable(rules, start)
+        except ValueError:
+            self.lr_table = False
+
+    def parse_chunks(self, chunks):
+        """
+        Parse each chunk of tokens, containing whole statements,
+        separately, and combine results into single tree.
+        """
+        statements = []
+        # Consecutive chunks which can't be built without parser
+        # are parsed together
+        pending = []
+        for tokens in chunks:
+            built = None
+            if self.stack_builder is not None:
+                built = self.stack_builder.build(tokens)
+            if built is None:
+                pending.extend(tokens)
+                continue
+            self.stack_builds += 1
+            if pending:
+                statements.extend(self.get_statements(self.parse(pending)))
+                pending = []
+            statements.extend(built)
+        if pending:
+            statements.extend(self.get_statements(self.parse(pending)))
+        return self.build_statements(statements)
+
+    def get_statements(self, ast):
+        """
+        Get list of statement nodes from statements tree.
+        """
+        statements = []
+        # Walk down left-recursive stmts ::= stmts stmt
+        while len(ast) == 2:
+            statements.append(ast[1])
+            ast = ast[0]
+        statements.append(ast[0])
+        statements.reverse()
+        return statements
+
+    def build_statements(self, statements):
+        """
+        Compose statements tree from list of statement nodes,
+        the same way parser does.
+        """
+        ast = self.nonterminal('stmts', [statements[0]])
+        for statement in statements[1:]:
+            ast = self.nonterminal('stmts', [ast, statement])
         return ast
 
+    def build_state_machine(self):
+        """
+        Regenerate state machine for current grammar. When cache is
+        used, get fully expanded state machine from it, generating and
+        storing it there if it's missing.
+        """
+        self.state_machine_rebuilds += 1
+        if self.grammar_cache is None:
+            # The rest will be generated lazily during parsing
+            self.makeStateMachine()
+            return
+        if self.grammar_cache.load(self):
+            return
+        self.makeStateMachine()
+        self.expandStateMachine()
+        self.makeSet = self.makeSet_fast
+        self.grammar_cache.store(self)
+
     def add_custom_rules(self, tokens):
+        """
+        Add rules for calls, functions and classes of <tokens> which
+        grammar doesn't have yet.
+
+        Return set of all custom rules <tokens> need.
+        """
         new_rules = set()
+        has_classes = False
         for token in tokens:
+            if token.type == 'LOAD_BUILD_CLASS':
+                has_classes = True
+        for token in tokens:
+            if token.type == 'MAKE_FUNCTION':
+                # Low byte is number of default values of positional
+                # parameters, next byte number of keyword-only ones;
+                # annotations are not supported
+                if token.attr >> 16:
+                    continue
+                defaults_pos = token.attr & 0xff
+                defaults_kw = (token.attr >> 8) & 0xff
+                if defaults_pos == 0 and defaults_kw == 0:
+                    continue
+                args_line = ' '.join(['expr'] * defaults_pos + ['kwarg'] * defaults_kw)
+                new_rules.add('mkfunc ::= {} LOAD_CONST LOAD_CONST MAKE_FUNCTION'.format(args_line))
+                continue
             if token.type != 'CALL_FUNCTION':
                 continue
             # Low byte indicates number of positional paramters,
@@ -137,9 +375,27 @@ class Parser(GenericASTBuilder):
             kw_args_line = '' if args_kw == 0 else ' {}'.format(' '.join('kwarg' for _ in range(args_kw)))
             rule = 'call_function ::= expr{}{} CALL_FUNCTION'.format(pos_args_line, kw_args_line)
             new_rules.add(rule)
+            # Class is created by call of builder function with class
+            # body function, name and base classes; rule for class
+            # without bases is in base grammar
+            if has_classes and args_pos >= 2 and (args_pos, args_kw) != (2, 0):
+                bases_line = ' '.join(['expr'] * (args_pos - 1) + ['kwarg'] * args_kw)
+                new_rules.add('classdef ::= LOAD_BUILD_CLASS mkfunc {} CALL_FUNCTION designator'.format(bases_line))
+        rules = frozenset(new_rules)
         # Make sure we do not add the same rule twice, even
         # during different sessions
         new_rules.difference_update(self.added_rules)
-        for rule in new_rules:
-            self.addRule(rule, nop_func)
+        if not new_rules:
+            return rules
+        # If state machine is already there, try to extend it
+        # with new rules rather than regenerate it
+        machine_ready = not self.ruleschanged
+        added = []
+        for rule in sorted(new_rules):
+            added.extend(self.addRule(rule, nop_func))
         self.added_rules.update(new_rules)
+        if machine_ready and self.extendStateMachine(added):
+            self.state_machine_extensions += 1
+            if self.grammar_cache is not None:
+                self.grammar_cache.store(self)
+        return rules
@@ -0,0 +1,182 @@
+from uncompyle3.scanner.token import Token
+
+
+BINARY_OPS = {
+    'BINARY_POWER', 'BINARY_MULTIPLY', 'BINARY_DIVIDE', 'BINARY_FLOOR_DIVIDE',
+    'BINARY_TRUE_DIVIDE', 'BINARY_MODULO', 'BINARY_ADD', 'BINARY_SUBTRACT',
+    'BINARY_LSHIFT', 'BINARY_RSHIFT', 'BINARY_AND', 'BINARY_XOR', 'BINARY_OR'
+}
+
+INPLACE_OPS = {
+    'INPLACE_POWER', 'INPLACE_MULTIPLY', 'INPLACE_FLOOR_DIVIDE', 'INPLACE_TRUE_DIVIDE',
+    'INPLACE_MODULO', 'INPLACE_ADD', 'INPLACE_SUBTRACT', 'INPLACE_LSHIFT',
+    'INPLACE_RSHIFT', 'INPLACE_AND', 'INPLACE_XOR', 'INPLACE_OR'
+}
+
+UNARY_OPS = {'UNARY_POSITIVE', 'UNARY_NEGATIVE', 'UNARY_INVERT'}
+
+LOAD_OPS = {'LOAD_NAME', 'LOAD_CONST', 'LOAD_FAST', 'LOAD_GLOBAL', 'LOAD_DEREF'}
+
+STORE_OPS = {'STORE_NAME', 'STORE_FAST'}
+
+
+class _Pending:
+    """
+    Stack entry which isn't an expression, and can only be consumed
+    by the store which finishes the statement.
+    """
+
+    def __init__(self, type_, children):
+        self.type = type_
+        self.children = children
+
+
+class StackBuilder:
+    """
+    Builder of statement trees for sequences of statements without
+    jumps. Instead of parsing, it simulates value stack of the
+    interpreter, and produces the same trees as parser does.
+    """
+
+    def __init__(self, nonterminal):
+        # Function which creates tree node out of its type and
+        # list of children, the one parser uses
+        self.nonterminal = nonterminal
+
+    def build(self, tokens):
+        """
+        Build statement nodes for <tokens>.
+
+        Return list of nodes, or None if tokens contain anything
+        builder doesn't support.
+        """
+        node = self.nonterminal
+        stack = []
+        statements = []
+        for token in tokens:
+            type_ = token.type
+            if type_ in LOAD_OPS:
+                stack.append(node('expr', [token]))
+                continue
+            if type_ in BINARY_OPS:
+                args = self.pop_exprs(stack, 2)
+                if args is None:
+                    return None
+                args.append(node('binary_op', [token]))
+                stack.append(node('expr', [node('binary_expr', args)]))
+            elif type_ in UNARY_OPS:
+                args = self.pop_exprs(stack, 1)
+                if args is None:
+                    return None
+                args.append(node('unary_op', [token]))
+                stack.append(node('expr', [node('unary_expr', args)]))
+            elif type_ == 'UNARY_NOT':
+                args = self.pop_exprs(stack, 1)
+                if args is None:
+                    return None
+                args.append(token)
+                stack.append(node('expr', [node('unary_not', args)]))
+            elif type_ == 'COMPARE_OP':
+                args = self.pop_exprs(stack, 2)
+                if args is None:
+                    return None
+                args.append(token)
+                stack.append(node('expr', [node('cmp', [node('compare', args)])]))
+            elif type_ == 'BINARY_SUBSCR':
+                args = self.pop_exprs(stack, 2)
+                if args is None:
+                    return None
+                args.append(token)
+                stack.append(node('expr', [node('binary_subscr', args)]))
+            elif type_ == 'CALL_FUNCTION':
+                expr = self.build_call(stack, token)
+                if expr is None:
+                    return None
+                stack.append(expr)
+            elif type_ in INPLACE_OPS:
+                args = self.pop_exprs(stack, 2)
+                if args is None:
+                    return None
+                args.append(node('inplace_op', [token]))
+                stack.append(_Pending('augassign', args))
+            elif type_ == 'IMPORT_NAME':
+                args = self.pop_exprs(stack, 2)
+                if args is None:
+                    return None
+                args = [self.get_const(arg) for arg in args]
+                if None in args:
+                    return None
+                args.append(token)
+                stack.append(_Pending('importstmt', args))
+            elif type_ in STORE_OPS:
+                if not stack:
+                    return None
+                value = stack.pop()
+                designator = node('designator', [token])
+                if isinstance(value, _Pending):
+                    statement = node(value.type, value.children + [designator])
+                else:
+                    statement = node('assign', [value, designator])
+                if stack:
+                    return None
+                statements.append(node('stmt', [statement]))
+            elif type_ == 'POP_TOP' or type_ == 'RETURN_VALUE':
+                args = self.pop_exprs(stack, 1)
+                if args is None or stack:
+                    return None
+                args.append(token)
+                type_ = 'call_stmt' if type_ == 'POP_TOP' else 'return_stmt'
+                statements.append(node('stmt', [node(type_, args)]))
+            else:
+                return None
+        if stack or not statements:
+            return None
+        return statements
+
+    def pop_exprs(self, stack, amount):
+        """
+        Remove <amount> expressions from the top of <stack>.
+
+        Return them in stack order, or None if there are not
+        enough of them.
+        """
+        if len(stack) < amount:
+            return None
+        args = stack[-amount:]
+        for arg in args:
+            if isinstance(arg, _Pending):
+                return None
+        del stack[-amount:]
+        return args
+
+    def get_const(self, expr):
+        """
+        Get LOAD_CONST token out of expression which consists only of it.
+        """
+        child = expr[0]
+        if len(expr) == 1 and isinstance(child, Token) and child.type == 'LOAD_CONST':
+            return child
+        return None
+
+    def build_call(self, stack, token):
+        """
+        Build expression for function call, taking function and its
+        arguments from <stack>.
+        """
+        # Low byte is amount of positional arguments, high byte is
+        # amount of keyword arguments
+        args_pos = token.attr & 0xff
+        args_kw = (token.attr >> 8) & 0xff
+        if token.attr >> 16:
+            return None
+        args = self.pop_exprs(stack, 1 + args_pos + 2 * args_kw)
+        if args is None:
+            return None
+        children = args[:1 + args_pos]
+        for i in range(1 + args_pos, len(args), 2):
+            name = self.get_const(args[i])
+            if name is None:
+                return None
+            children.append(self.nonterminal('kwarg', [name, args[i + 1]]))
+        children.append(token)
+        return self.nonterminal('expr', [self.nonterminal('call_function', children)])
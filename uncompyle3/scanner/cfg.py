@@ -0,0 +1,241 @@
+from bisect import bisect_right
+
+from . import dis
+
+
+globals().update(dis.opmap)
+
+# Opcodes which have jump target as argument
+JUMP_OPS = frozenset(dis.hasjrel + dis.hasjabs)
+
+# Jumps after which control never goes to the next op
+UNCONDITIONAL_JUMPS = frozenset((JUMP_FORWARD, JUMP_ABSOLUTE, CONTINUE_LOOP))
+
+# Non-jump opcodes which end basic block
+BLOCK_END_OPS = frozenset((RETURN_VALUE, RAISE_VARARGS, BREAK_LOOP))
+
+
+class BasicBlock:
+    """
+    Sequence of ops from <start> offset (inclusive) to <end> offset
+    (exclusive), which is entered only at the start and left only at
+    the end. Successors and predecessors are lists of block indices.
+    """
+
+    __slots__ = ('index', 'start', 'end', 'last', 'succs', 'preds')
+
+    def __init__(self, index, start, end):
+        self.index = index
+        self.start = start
+        self.end = end
+        # Offset of the last op of the block
+        self.last = None
+        self.succs = []
+        self.preds = []
+
+    def __repr__(self):
+        return 'BasicBlock({}, {}-{}, succs={})'.format(self.index, self.start, self.end, self.succs)
+
+
+class ControlFlowGraph:
+    """
+    Control flow graph of code object, built out of decoded op
+    columns of scanner. Setup ops of loops, exception handlers and
+    with statements are treated as conditional jumps to their
+    targets; break goes to the end of enclosing loop.
+    """
+
+    def __init__(self, offsets, opcodes, targets, codelen):
+        self.blocks = []
+        # Offsets at which blocks start, in ascending order
+        self.starts = []
+        # Immediate dominator block index for each block, None for
+        # entry block and for unreachable blocks; calculated on demand
+        self._idoms = None
+        self._dom_intervals = None
+        if offsets:
+            self.build(offsets, opcodes, targets, codelen)
+
+    def build(self, offsets, opcodes, targets, codelen):
+        count = len(offsets)
+        op_offsets = set(offsets)
+        leaders = {0}
+        for i in range(count):
+            op = opcodes[i]
+            if op in JUMP_OPS:
+                if targets[i] in op_offsets:
+                    leaders.add(targets[i])
+            elif op not in BLOCK_END_OPS:
+                continue
+            if i + 1 < count:
+                leaders.add(offsets[i+1])
+        starts = self.starts = sorted(leaders)
+        blocks = self.blocks
+        # Format: {block start offset: block index}
+        block_indices = {}
+        for index, start in enumerate(starts):
+            end = starts[index+1] if index + 1 < len(starts) else codelen
+            blocks.append(BasicBlock(index, start, end))
+            block_indices[start] = index
+        # Ends of loops enclosing current op, innermost last
+        loops = []
+        block_idx = -1
+        for i in range(count):
+            offset = offsets[i]
+            op = opcodes[i]
+            while loops and loops[-1] <= offset:
+                loops.pop()
+            if op == SETUP_LOOP:
+                loops.append(targets[i])
+            if block_idx + 1 < len(starts) and starts[block_idx+1] == offset:
+                block_idx += 1
+            block = blocks[block_idx]
+            block.last = offset
+            if i + 1 < count and offsets[i+1] < block.end:
+                continue
+            # Last op of the block
+            succs = []
+            if op in JUMP_OPS:
+                if op not in UNCONDITIONAL_JUMPS:
+                    succs.append(block.end)
+                succs.append(targets[i])
+            elif op == BREAK_LOOP:
+                if loops:
+                    succs.append(loops[-1])
+            elif op not in BLOCK_END_OPS:
+                succs.append(block.end)
+            # All successors which are valid offsets are leaders
+            for succ_offset in succs:
+                succ_idx = block_indices.get(succ_offset)
+                if succ_idx is not None and succ_idx not in block.succs:
+                    block.succs.append(succ_idx)
+                    blocks[succ_idx].preds.append(block.index)
+
+    def block_at(self, offset):
+        """
+        Get block which contains op at <offset>.
+        """
+        return self.blocks[bisect_right(self.starts, offset) - 1]
+
+    def postorder(self):
+        """
+        Get indices of blocks reachable from entry, in postorder of
+        depth-first traversal.
+        """
+        if not self.blocks:
+            return []
+        blocks = self.blocks
+        visited = [False] * len(blocks)
+        visited[0] = True
+        order = []
+        stack = [(0, 0)]
+        while stack:
+            index, succ_idx = stack[-1]
+            succs = blocks[index].succs
+            if succ_idx < len(succs):
+                stack[-1] = (index, succ_idx + 1)
+                succ = succs[succ_idx]
+                if not visited[succ]:
+                    visited[succ] = True
+                    stack.append((succ, 0))
+            else:
+                stack.pop()
+                order.append(index)
+        return order
+
+    @property
+    def idoms(self):
+        if self._idoms is None:
+            self._idoms = self.build_dominators()
+        return self._idoms
+
+    def build_dominators(self):
+        """
+        Calculate immediate dominators using algorithm by Cooper,
+        Harvey and Kennedy ("A Simple, Fast Dominance Algorithm").
+        """
+        blocks = self.blocks
+        order = self.postorder()
+        # Format: [postorder number, ...] for each block, None if
+        # block is unreachable
+        numbers = [None] * len(blocks)
+        for number, index in enumerate(order):
+            numbers[index] = number
+        idoms = [None] * len(blocks)
+        if not order:
+            return idoms
+        idoms[0] = 0
+        reverse_order = order[-2::-1]
+        changed = True
+        while changed:
+            changed = False
+            for index in reverse_order:
+                new_idom = None
+                for pred in blocks[index].preds:
+                    if idoms[pred] is None:
+                        continue
+                    if new_idom is None:
+                        new_idom = pred
+                        continue
+                    # Walk both up the dominator tree until they meet
+                    finger1 = pred
+                    finger2 = new_idom
+                    while finger1 != finger2:
+                        while numbers[finger1] < numbers[finger2]:
+                            finger1 = idoms[finger1]
+                        while numbers[finger2] < numbers[finger1]:
+                            finger2 = idoms[finger2]
+                    new_idom = finger1
+                if idoms[index] != new_idom:
+                    idoms[index] = new_idom
+                    changed = True
+        idoms[0] = None
+        return idoms
+
+    def dominates(self, dominator, index):
+        """
+        Check if block <dominator> dominates block <index>, both given
+        as block indices. Every reachable block dominates itself.
+        """
+        if self._dom_intervals is None:
+            self._dom_intervals = self.build_dominator_intervals()
+        enter, leave = self._dom_intervals
+        if enter[dominator] is None or enter[index] is None:
+            return False
+        return enter[dominator] <= enter[index] and leave[index] <= leave[dominator]
+
+    def build_dominator_intervals(self):
+        # Number nodes of dominator tree on entering and leaving them,
+        # so that dominance is nesting of intervals
+        idoms = self.idoms
+        children = [[] for _ in self.blocks]
+        for index, idom in enumerate(idoms):
+            if idom is not None:
+                children[idom].append(index)
+        enter = [None] * len(self.blocks)
+        leave = [None] * len(self.blocks)
+        if not self.blocks:
+            return enter, leave
+        counter = 0
+        stack = [(0, 0)]
+        enter[0] = counter
+        while stack:
+            index, child_idx = stack[-1]
+            if child_idx < len(children[index]):
+                stack[-1] = (index, child_idx + 1)
+                child = children[index][child_idx]
+                counter += 1
+                enter[child] = counter
+                stack.append((child, 0))
+            else:
+                stack.pop()
+                counter += 1
+                leave[index] = counter
+        return enter, leave
+
+    def is_back_edge(self, source, target):
+        """
+        Check if edge between given blocks closes a loop, i.e. its
+        target dominates its source.
+        """
+        return self.dominates(target, source)
@@ -1,20 +1,39 @@
 import marshal
+from array import array
+from bisect import bisect_left
 from collections import namedtuple
+from heapq import heappop, heappush
+from time import perf_counter
 
 from . import dis
+from .cfg import JUMP_OPS, ControlFlowGraph
+from .structs import Struct, StructIndex
 from .token import Token
 
 
 # Get all the opcodes into globals
 globals().update(dis.opmap)
 
+# Phases of tokenization, whose time is measured
+PHASES = ('decode', 'build_lines_data', 'build_prev_op', 'find_new_ifs', 'build_cfg', 'find_jump_targets', 'tokenize')
+
 
 class Scanner:
 
+    def __init__(self):
+        # Seconds spent in each phase of tokenization, accumulated
+        # over all tokenized code objects
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self._cfg = None
+
     def run(self, bytecode):
-        code_object = marshal.loads(bytecode)
-        tokens = self.tokenize(code_object)
-        return tokens
+        return self.tokenize(self.load(bytecode))
+
+    def load(self, bytecode):
+        """
+        Get code object out of marshalled <bytecode>.
+        """
+        return marshal.loads(bytecode)
 
     def tokenize(self, co):
         """
@@ -26,19 +45,29 @@ class Scanner:
         tokens = []
         self.code = code = co.co_code
         codelen = len(code)
+        time_start = perf_counter()
+        self.decode()
+        time_decode = perf_counter()
         self.build_lines_data(co)
+        time_lines = perf_counter()
         self.build_prev_op()
+        time_prev_op = perf_counter()
         self.find_new_ifs()
+        time_new_ifs = perf_counter()
+        # Structure detection works on basic blocks
+        self.cfg
+        time_cfg = perf_counter()
         # Get jump targets
         # Format: {target offset: [jump offset, ...]}
         jump_targets = self.find_jump_targets()
-        # Initialize extended arg at 0. When extended arg op is encountered,
-        # variable preserved for next cycle and added as arg for next op
-        extended_arg = 0
+        time_jump_targets = perf_counter()
+        op_codes = self.op_codes
+        op_args = self.op_args
         free = None
-        for offset in self.op_range(0, codelen):
+        new_if_targets = set(self.new_ifs.values())
+        for i, offset in enumerate(self.op_offsets):
             # Process new ifs
-            if offset in self.new_ifs.values():
+            if offset in new_if_targets:
                 # Create fake tonken, which is needed by parser
                 token = Token()
                 token.type = dis.opname[JUMP_FORWARD]
@@ -57,7 +86,7 @@ class Scanner:
                     tokens.append(Token('COME_FROM', None, repr(jump_offset),
                                         offset='{}_{}'.format(offset, jump_idx)))
                     jump_idx += 1
-            op = code[offset]
+            op = op_codes[i]
             # Create token and fill all the fields we can
             # w/o touching arguments
             current_token = Token()
@@ -65,12 +94,8 @@ class Scanner:
             current_token.offset = offset
             current_token.linestart = True if offset in self.linestarts else False
             if op >= dis.HAVE_ARGUMENT:
-                # Calculate op's argument value based on its argument and
-                # preceding extended argument, if any
-                oparg = code[offset+1] + code[offset+2]*256 + extended_arg
-                extended_arg = 0
-                if op == dis.EXTENDED_ARG:
-                    extended_arg = oparg*65536
+                # Argument already includes preceding extended argument
+                oparg = op_args[i]
 
                 # Fill token's attr/pattr fields
                 current_token.attr = oparg
@@ -89,8 +114,92 @@ class Scanner:
                         free = co.co_cellvars + co.co_freevars
                     current_token.pattr = free[oparg]
             tokens.append(current_token)
+        times = self.phase_times
+        times['decode'] += time_decode - time_start
+        times['build_lines_data'] += time_lines - time_decode
+        times['build_prev_op'] += time_prev_op - time_lines
+        times['find_new_ifs'] += time_new_ifs - time_prev_op
+        times['build_cfg'] += time_cfg - time_new_ifs
+        times['find_jump_targets'] += time_jump_targets - time_cfg
+        times['tokenize'] += perf_counter() - time_jump_targets
         return tokens
 
+    def decode(self):
+        """
+        Decode all instructions of current code object into columns,
+        indexed by instruction number: offsets, opcodes, arguments
+        (with extended arguments applied) and jump targets, plus map
+        from each code offset to number of instruction it belongs to.
+        """
+        code = self.code
+        codelen = len(code)
+        hasjrel = frozenset(dis.hasjrel)
+        # Graph of previous code object isn't valid anymore
+        self._cfg = None
+        self.op_offsets = offsets = array('l')
+        self.op_codes = opcodes = array('B')
+        self.op_args = args = array('l')
+        # Target is calculated for all ops with argument, but makes
+        # sense only for jumps; ops without argument have -1
+        self.op_targets = targets = array('l')
+        self.op_index = index = array('l', [0]) * codelen
+        # Format: {opcode: [offset, ...]}, offsets are sorted
+        self.instr_offsets = instr_offsets = {}
+        # Format: {target: [jump offset, ...]}, offsets are sorted
+        self.jump_sources = jump_sources = {}
+        extended_arg = 0
+        offset = 0
+        i = 0
+        while offset < codelen:
+            op = code[offset]
+            offsets.append(offset)
+            opcodes.append(op)
+            same_ops = instr_offsets.get(op)
+            if same_ops is None:
+                instr_offsets[op] = [offset]
+            else:
+                same_ops.append(offset)
+            if op >= dis.HAVE_ARGUMENT:
+                arg = code[offset+1] + code[offset+2]*256 + extended_arg
+                extended_arg = arg*65536 if op == EXTENDED_ARG else 0
+                args.append(arg)
+                if op in hasjrel:
+                    target = arg + offset + 3
+                else:
+                    target = arg
+                if op in JUMP_OPS:
+                    sources = jump_sources.get(target)
+                    if sources is None:
+                        jump_sources[target] = [offset]
+                    else:
+                        sources.append(offset)
+                targets.append(target)
+                index[offset] = index[offset+1] = index[offset+2] = i
+                offset += 3
+            else:
+                args.append(0)
+                targets.append(-1)
+                index[offset] = i
+                offset += 1
+            i += 1
+
+    @property
+    def cfg(self):
+        """
+        Control flow graph of current code object, built on first use.
+        """
+        if self._cfg is None:
+            self._cfg = ControlFlowGraph(self.op_offsets, self.op_codes, self.op_targets, len(self.code))
+        return self._cfg
+
+    def op_slice(self, start, end):
+        """
+        Get numbers of first instruction at or after <start> offset,
+        and of first instruction at or after <end> offset.
+        """
+        offsets = self.op_offsets
+        return bisect_left(offsets, start), bisect_left(offsets, end)
+
     def build_lines_data(self, code_obj):
         """
         Generate various line-related helper data.
@@ -131,14 +240,10 @@ class Scanner:
         Compose 'list-map' which allows to jump to previous
         op, given offset of current op as index.
         """
-        code = self.code
-        codelen = len(code)
+        offsets = self.op_offsets
         # Format: (for each offset) [previous token offset, ...]
         self.prev_op = [0]
-        for offset in self.op_range(0, codelen):
-            op = code[offset]
-            for _ in range(self.op_size(op)):
-                self.prev_op.append(offset)
+        self.prev_op.extend([offsets[i] for i in self.op_index])
 
     def op_size(self, op):
         """
@@ -155,6 +260,15 @@ class Scanner:
         Iterate through positions of opcodes, skipping
         arguments.
         """
+        if start >= end:
+            return ()
+        first, last = self.op_slice(start, end)
+        if first < len(self.op_offsets) and self.op_offsets[first] == start:
+            return self.op_offsets[first:last]
+        # Range which starts in the middle of instruction
+        return self.decode_range(start, end)
+
+    def decode_range(self, start, end):
         while start < end:
             yield start
             start += self.op_size(self.code[start])
@@ -162,37 +276,63 @@ class Scanner:
     def find_new_ifs(self):
         # Format: {jump op offset: jump target}
         self.new_ifs = {}
-        code = self.code
-        for offset in self.op_range(0, len(code)):
-            op = code[offset]
-            if op in (POP_JUMP_IF_FALSE, POP_JUMP_IF_FALSE, POP_JUMP_IF_TRUE, POP_JUMP_IF_TRUE):
-                target = self.get_target(offset)
-                src_line = self.lines[offset][0]
-                tgt_line = self.lines[target][0]
-                # Means and/or logic
-                if src_line == tgt_line:
-                    continue
-                stop = False
-                for inner_offset in self.op_range(offset, target):
-                    inner_op = code[inner_offset]
-                    # If-else constructs contain jump forward in-between,
-                    # and it also jumps across the lines
-                    if inner_op == JUMP_FORWARD:
-                        inner_target = self.get_target(inner_offset)
-                        inner_src_line = self.lines[inner_offset][0]
-                        inner_tgt_line = self.lines[inner_target][0]
-                        if inner_tgt_line != inner_src_line:
-                            stop = True
-                            break
-                    # While constructs jump back at the end of the cycle
-                    elif inner_op == JUMP_ABSOLUTE:
-                        inner_target = self.get_target(inner_offset)
-                        if inner_target < offset:
-                            stop = True
-                            break
-                if stop:
-                    continue
-                self.new_ifs[offset] = target
+        offsets = self.op_offsets
+        targets = self.op_targets
+        index = self.op_index
+        lines = self.lines
+        count = len(offsets)
+        codelen = len(self.code)
+        cond_jumps = self.find_instr(0, codelen, (POP_JUMP_IF_FALSE, POP_JUMP_IF_TRUE))
+        if not cond_jumps:
+            return
+        # If-else constructs contain jump forward in-between, and it
+        # also jumps across the lines
+        # Format: [index of next such jump forward, ...] for each op
+        # index, or amount of ops if there is none
+        next_else = [count] * (count + 1)
+        first_idx = 0
+        for jump_offset in self.instr_offsets.get(JUMP_FORWARD, ()):
+            j = index[jump_offset]
+            jump_target = targets[j]
+            # Jump beyond last line crosses it as well
+            if jump_target >= codelen or lines[jump_target][0] != lines[jump_offset][0]:
+                next_else[first_idx:j+1] = [j] * (j + 1 - first_idx)
+                first_idx = j + 1
+        # While constructs jump back at the end of the cycle, to offset
+        # before the if. Such jumps become candidates when ifs go past
+        # their targets, and stop being candidates when ifs go past
+        # the jumps themselves
+        # Format: [(jump target, jump op index), ...]
+        loop_jumps = []
+        for jump_offset in self.instr_offsets.get(JUMP_ABSOLUTE, ()):
+            j = index[jump_offset]
+            if targets[j] < jump_offset:
+                loop_jumps.append((targets[j], j))
+        loop_jumps.sort()
+        loop_idx = 0
+        # Heap with indices of candidate jumps
+        candidates = []
+        for offset in cond_jumps:
+            i = index[offset]
+            target = targets[i]
+            src_line = lines[offset][0]
+            tgt_line = lines[target][0]
+            # Means and/or logic
+            if src_line == tgt_line:
+                continue
+            while loop_idx < len(loop_jumps) and loop_jumps[loop_idx][0] < offset:
+                heappush(candidates, loop_jumps[loop_idx][1])
+                loop_idx += 1
+            while candidates and candidates[0] < i:
+                heappop(candidates)
+            # Index of first op at or after target; target is within
+            # code, as its line was found above
+            end = index[target]
+            if offsets[end] < target:
+                end += 1
+            if next_else[i] < end or (candidates and candidates[0] < end):
+                continue
+            self.new_ifs[offset] = target
 
     def find_jump_targets(self):
         """
@@ -202,9 +342,7 @@ class Scanner:
         """
         code = self.code
         codelen = len(code)
-        self.structs = [{'type':  'root',
-                         'start': 0,
-                         'end':   codelen-1}]
+        self.structs = StructIndex(Struct('root', 0, codelen-1))
 
         # Map fixed jumps to their real destination
         self.fixed_jumps = {}
@@ -214,15 +352,22 @@ class Scanner:
         self.return_end_ifs = set()
 
         targets = {}
-        for offset in self.op_range(0, codelen):
-            op = code[offset]
+        op_codes = self.op_codes
+        op_args = self.op_args
+        index = self.op_index
+        # Every jump ends basic block, thus only last ops of blocks
+        # can be structure boundaries or have labels
+        for block in self.cfg.blocks:
+            offset = block.last
+            i = index[offset]
+            op = op_codes[i]
 
             # Determine structures and fix jumps
             self.detect_structure(offset)
 
             if op >= dis.HAVE_ARGUMENT:
                 label = self.fixed_jumps.get(offset)
-                oparg = code[offset+1] + code[offset+2] * 256
+                oparg = op_args[i]
 
                 if label is None:
                     if op in dis.hasjrel and op != FOR_ITER:
@@ -233,13 +378,63 @@ class Scanner:
                                 label = oparg
 
                 if label is not None and label != -1:
-                    targets[label] = targets.get(label, []) + [offset]
-            elif op == END_FINALLY and offset in self.fixed_jumps:
-                label = self.fixed_jumps[offset]
-                targets[label] = targets.get(label, []) + [offset]
+                    targets.setdefault(label, []).append(offset)
         return targets
 
 
+    def find_chunk_boundaries(self):
+        """
+        Detect offsets of top-level statements, which can be parsed
+        independently of each other: statement begins right after
+        end of previous statement, and no jump goes across it.
+
+        Return set of offsets.
+        """
+        code = self.code
+        codelen = len(code)
+        # Amount of jumps which go across boundary before op
+        # at offset, in form of differences from previous offset
+        crossings = [0] * (codelen + 2)
+        for offset in self.op_range(0, codelen):
+            op = code[offset]
+            if op not in dis.hasjrel and op not in dis.hasjabs:
+                continue
+            for target in {self.get_target(offset), self.fixed_jumps.get(offset, offset)}:
+                # Jumping forward to the boundary itself is fine, as
+                # COME_FROM goes before real op
+                if target > offset:
+                    crossings[offset+3] += 1
+                    crossings[target] -= 1
+                elif target < offset:
+                    crossings[target+1] += 1
+                    crossings[offset+1] -= 1
+        for offset in range(1, codelen):
+            crossings[offset] += crossings[offset-1]
+        boundaries = set()
+        for offset in self.op_range(0, codelen):
+            if crossings[offset] == 0 and offset > 0 and self.prev_op[offset] in self.stmts:
+                boundaries.add(offset)
+        return boundaries
+
+    def split_statements(self, tokens, chunk_size):
+        """
+        Split <tokens> of last tokenized code object into chunks of
+        whole top-level statements, each at least <chunk_size> tokens
+        long, except for the last one.
+
+        Return list of token lists.
+        """
+        boundaries = self.find_chunk_boundaries()
+        chunks = []
+        chunk = []
+        for token in tokens:
+            if len(chunk) >= chunk_size and token.offset in boundaries:
+                chunks.append(chunk)
+                chunk = []
+            chunk.append(token)
+        chunks.append(chunk)
+        return chunks
+
     def build_statement_indices(self):
         code = self.code
         start = 0
@@ -255,9 +450,6 @@ class Scanner:
             JUMP_ABSOLUTE
         }
 
-        statement_opcode_sequences = [(POP_JUMP_IF_FALSE, JUMP_FORWARD), (POP_JUMP_IF_FALSE, JUMP_ABSOLUTE),
-                                      (POP_JUMP_IF_TRUE, JUMP_FORWARD), (POP_JUMP_IF_TRUE, JUMP_ABSOLUTE)]
-
         designator_ops = {
             STORE_FAST, STORE_NAME, STORE_GLOBAL, STORE_DEREF, STORE_ATTR,
             STORE_SUBSCR, UNPACK_SEQUENCE, JUMP_ABSOLUTE
@@ -276,20 +468,14 @@ class Scanner:
         pass_stmts = set()
 
 
-        # Find stmt opcode sequences
-        for sequence in statement_opcode_sequences:
-            for i in self.op_range(start, end-(len(sequence)+1)):
-                match = True
-                for elem in sequence:
-                    if elem != code[i]:
-                        match = False
-                        break
-                    i += self.op_size(code[i])
-
-                if match is True:
-                    i = self.prev_op[i]
-                    stmts.add(i)
-                    pass_stmts.add(i)
+        # Find stmt opcode sequences: block ending with conditional
+        # jump, whose fall-through block starts with unconditional one
+        for block in self.cfg.blocks:
+            if code[block.last] in (POP_JUMP_IF_FALSE, POP_JUMP_IF_TRUE):
+                next_offset = block.end
+                if next_offset < end and code[next_offset] in (JUMP_FORWARD, JUMP_ABSOLUTE):
+                    stmts.add(next_offset)
+                    pass_stmts.add(next_offset)
 
         # Initialize statement list with the full data we've gathered so far
         # For now it's copy of stmts - both simple and compound statement offsets
@@ -363,18 +549,35 @@ class Scanner:
         except:
             instr = [instr]
 
-        result = []
-        for offset in self.op_range(start, end):
-            op = code[offset]
-            if op in instr:
-                if target is None:
-                    result.append(offset)
-                else:
-                    t = self.get_target(offset)
-                    if include_beyond_target and t >= target:
-                        result.append(offset)
-                    elif t == target:
-                        result.append(offset)
+        instr = set(instr)
+        opcodes = self.op_codes
+        targets = self.op_targets
+        index = self.op_index
+        if target is not None and not include_beyond_target and instr <= JUMP_OPS:
+            sources = self.jump_sources.get(target, ())
+            sources = sources[bisect_left(sources, start):bisect_left(sources, end)]
+            return [offset for offset in sources if opcodes[index[offset]] in instr]
+        result = self.find_instr(start, end, instr)
+        if target is None:
+            return result
+        if include_beyond_target:
+            return [offset for offset in result if targets[index[offset]] >= target]
+        return [offset for offset in result if targets[index[offset]] == target]
+
+    def find_instr(self, start, end, instr):
+        """
+        Find offsets of all opcodes from <instr> set in the block
+        from start to end, in ascending order.
+        """
+        found = []
+        for op in instr:
+            same_ops = self.instr_offsets.get(op)
+            if same_ops:
+                found.append(same_ops[bisect_left(same_ops, start):bisect_left(same_ops, end)])
+        if len(found) == 1:
+            return found[0]
+        result = [offset for same_ops in found for offset in same_ops]
+        result.sort()
         return result
 
     def last_instr(self, start, end, instr, target=None, exact=True):
@@ -400,34 +603,45 @@ class Scanner:
         except:
             instr = [instr]
 
+        instr = set(instr)
+        opcodes = self.op_codes
+        targets = self.op_targets
+        index = self.op_index
+        if target is None:
+            result_offset = None
+            for op in instr:
+                same_ops = self.instr_offsets.get(op)
+                if same_ops:
+                    last = bisect_left(same_ops, end)
+                    if last and same_ops[last-1] >= start and (result_offset is None or same_ops[last-1] > result_offset):
+                        result_offset = same_ops[last-1]
+            return result_offset
+        if exact and instr <= JUMP_OPS:
+            sources = self.jump_sources.get(target, ())
+            first = bisect_left(sources, start)
+            for i in range(bisect_left(sources, end) - 1, first - 1, -1):
+                if opcodes[index[sources[i]]] in instr:
+                    return sources[i]
+            return None
         result_offset = None
         current_distance = len(code)
-        for offset in self.op_range(start, end):
-            op = code[offset]
-            if op in instr:
-                if target is None:
+        for offset in self.find_instr(start, end, instr):
+            dest = targets[index[offset]]
+            if dest == target:
+                current_distance = 0
+                result_offset = offset
+            elif not exact:
+                new_distance = abs(target - dest)
+                if new_distance <= current_distance:
+                    current_distance = new_distance
                     result_offset = offset
-                else:
-                    dest = self.get_target(offset)
-                    if dest == target:
-                        current_distance = 0
-                        result_offset = offset
-                    elif not exact:
-                        new_distance = abs(target - dest)
-                        if new_distance <= current_distance:
-                            current_distance = new_distance
-                            result_offset = offset
         return result_offset
 
     def get_target(self, offset):
         """
         Get target offset for op located at given <offset>.
         """
-        op = self.code[offset]
-        target = self.code[offset+1] + self.code[offset+2] * 256
-        if op in dis.hasjrel:
-            target += offset + 3
-        return target
+        return self.op_targets[self.op_index[offset]]
 
     def detect_structure(self, offset):
         """
@@ -435,19 +649,8 @@ class Scanner:
         """
         code = self.code
         op = code[offset]
-        # Detect parent structure
-        parent = self.structs[0]
-        start = parent['start']
-        end = parent['end']
-
-        # Pick inner-most parent for our offset
-        for struct in self.structs:
-            curent_start = struct['start']
-            curent_end   = struct['end']
-            if (curent_start <= offset < curent_end) and (curent_start >= start and curent_end <= end):
-                start = curent_start
-                end = curent_end
-                parent = struct
+        # Pick inner-most parent structure for our offset
+        parent = self.structs.parent(offset)
 
         if op in (POP_JUMP_IF_FALSE, POP_JUMP_IF_TRUE):
             start = offset + self.op_size(op)
@@ -456,7 +659,7 @@ class Scanner:
             prev_op = self.prev_op
 
             # Do not let jump to go out of parent struct bounds
-            if target != rtarget and parent['type'] == 'and/or':
+            if target != rtarget and parent.type == 'and/or':
                 self.fixed_jumps[offset] = rtarget
                 return
 
@@ -465,9 +668,7 @@ class Scanner:
             if (code[prev_op[target]] in (JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP,
                                           POP_JUMP_IF_FALSE, POP_JUMP_IF_TRUE)) and (target > offset):
                 self.fixed_jumps[offset] = prev_op[target]
-                self.structs.append({'type': 'and/or',
-                                     'start': start,
-                                     'end': prev_op[target]})
+                self.structs.append(Struct('and/or', start, prev_op[target]))
                 return
             # Is it an and inside if block
             if op == POP_JUMP_IF_FALSE:
@@ -533,25 +734,19 @@ class Scanner:
                 if_end = self.get_target(prev_op[rtarget])
 
                 # Is this a loop not an if?
-                if (if_end < prev_op[rtarget]) and (code[prev_op[if_end]] == SETUP_LOOP):
+                if self.is_loop_jump(prev_op[rtarget], if_end) and (code[prev_op[if_end]] == SETUP_LOOP):
                     if(if_end > start):
                         return
 
                 end = self.restrict_to_parent(if_end, parent)
 
-                self.structs.append({'type': 'if-then',
-                                     'start': start,
-                                     'end': prev_op[rtarget]})
+                self.structs.append(Struct('if-then', start, prev_op[rtarget]))
                 self.not_continue.add(prev_op[rtarget])
 
                 if rtarget < end:
-                    self.structs.append({'type': 'if-else',
-                                         'start': rtarget,
-                                         'end': end})
+                    self.structs.append(Struct('if-else', rtarget, end))
             elif code[prev_op[rtarget]] == RETURN_VALUE:
-                self.structs.append({'type': 'if-then',
-                                     'start': start,
-                                     'end': rtarget})
+                self.structs.append(Struct('if-then', start, rtarget))
                 self.return_end_ifs.add(prev_op[rtarget])
 
         elif op in (JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP):
@@ -563,10 +758,25 @@ class Scanner:
                 else:
                     self.fixed_jumps[offset] = self.restrict_to_parent(target, parent)
 
+    def is_loop_jump(self, offset, target):
+        """
+        Check if jump at <offset> to <target> closes a loop, i.e.
+        goes back to block which dominates block of the jump.
+        """
+        # Loop heads precede their bodies, this saves building of
+        # dominator tree for code without loops
+        if target > offset:
+            return False
+        cfg = self.cfg
+        target_block = cfg.block_at(target)
+        if target_block.start != target:
+            return False
+        return cfg.is_back_edge(cfg.block_at(offset).index, target_block.index)
+
     def restrict_to_parent(self, target, parent):
         """Restrict target to parent structure boundaries."""
-        if not (parent['start'] < target < parent['end']):
-            target = parent['end']
+        if not (parent.start < target < parent.end):
+            target = parent.end
         return target
 
     def rem_or(self, start, end, instr, target=None, include_beyond_target=False):
@@ -579,15 +789,23 @@ class Scanner:
         instr_offsets = self.all_instr(start, end, instr, target, include_beyond_target)
         # Get all POP_JUMP_IF_TRUE (or) offsets
         pjit_offsets = self.all_instr(start, end, POP_JUMP_IF_TRUE)
+        if not pjit_offsets:
+            return instr_offsets
+        # Offset is dropped if it's after some POP_JUMP_IF_TRUE and before
+        # its target minus 3; both lists are sorted, so it's enough to
+        # track the farthest of such bounds among preceding jumps
         filtered = []
-        for pjit_offset in pjit_offsets:
-            pjit_tgt = self.get_target(pjit_offset) - 3
-            for instr_offset in instr_offsets:
-                if instr_offset <= pjit_offset or instr_offset >= pjit_tgt:
-                    filtered.append(instr_offset)
-            instr_offsets = filtered
-            filtered = []
-        return instr_offsets
+        pjit_idx = 0
+        pjit_end = None
+        for instr_offset in instr_offsets:
+            while pjit_idx < len(pjit_offsets) and pjit_offsets[pjit_idx] < instr_offset:
+                pjit_tgt = self.get_target(pjit_offsets[pjit_idx]) - 3
+                if pjit_end is None or pjit_tgt > pjit_end:
+                    pjit_end = pjit_tgt
+                pjit_idx += 1
+            if pjit_end is None or instr_offset >= pjit_end:
+                filtered.append(instr_offset)
+        return filtered
 
     def remove_mid_line_ifs(self, ifs):
         """
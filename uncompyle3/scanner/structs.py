@@ -0,0 +1,91 @@
+from collections import namedtuple
+from heapq import heappop, heappush
+
+
+# Code structure detected by scanner, spanning offsets from start
+# (inclusive) to end (exclusive)
+Struct = namedtuple('Struct', ('type', 'start', 'end'))
+
+
+def within(inner, outer):
+    return outer.start <= inner.start and inner.end <= outer.end
+
+
+class StructIndex:
+    """
+    Structures detected in code object, in order of addition, with
+    lookup of parent structure for an offset. Lookups must be done
+    in order of increasing offsets.
+
+    Structures which enclose last looked up offset are kept open.
+    While each of them lies within previous one, parent is just the
+    last open structure, and structures are closed from the end of
+    list, which makes lookups amortized constant time. Overlapping
+    structures, if heuristics ever produce them, are handled by
+    checking all open ones.
+    """
+
+    def __init__(self, root):
+        self.structs = [root]
+        # Structures which are not open yet, ordered by start; for the
+        # same start outer ones go first, to not break nesting
+        self.pending = []
+        # (index, structure) for open structures, in order of opening
+        self.open = []
+        # Whether each open structure lies within previous one
+        self.nested = True
+
+    def __iter__(self):
+        return iter(self.structs)
+
+    def __len__(self):
+        return len(self.structs)
+
+    def __getitem__(self, index):
+        return self.structs[index]
+
+    def append(self, struct):
+        heappush(self.pending, (struct.start, -struct.end, len(self.structs), struct))
+        self.structs.append(struct)
+
+    def parent(self, offset):
+        """
+        Get structure which encloses <offset>, picked the same way as
+        by checking all structures in order of addition and taking each
+        one which encloses offset and lies within previously taken one,
+        starting from the root.
+        """
+        root = self.structs[0]
+        open_ = self.open
+        # Close structures which end at or before offset
+        if self.nested:
+            while open_ and open_[-1][1].end <= offset:
+                open_.pop()
+        else:
+            open_[:] = [item for item in open_ if item[1].end > offset]
+            self.nested = self.is_nested()
+        # Open structures which start at or before offset
+        pending = self.pending
+        while pending and pending[0][0] <= offset:
+            index, struct = heappop(pending)[2:]
+            # Offsets only grow, thus it won't ever enclose any
+            if struct.end <= offset:
+                continue
+            if self.nested and not within(struct, open_[-1][1] if open_ else root):
+                self.nested = False
+            open_.append((index, struct))
+        if self.nested:
+            return open_[-1][1] if open_ else root
+        parent = root
+        for index, struct in sorted(open_):
+            if within(struct, parent):
+                parent = struct
+        return parent
+
+    def is_nested(self):
+        outer = self.structs[0]
+        for index, struct in self.open:
+            if not within(struct, outer):
+                return False
+            outer = struct
+        return True
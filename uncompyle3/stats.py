@@ -0,0 +1,65 @@
+from .parser.astnode import ASTNode
+from .scanner.scanner import PHASES
+
+
+# Counters of parser which are reported as difference between their
+# values before and after decompilation
+PARSER_COUNTERS = (
+    'state_machine_rebuilds', 'state_machine_extensions', 'lr_table_builds', 'lr_table_skips', 'lr_parses',
+    'earley_parses', 'stack_builds', 'earley_sets', 'earley_items', 'earley_links')
+
+
+class Stats:
+    """
+    Record of work done during decompilation of single file. Times
+    are in seconds. Work done for nested code objects in worker
+    processes isn't included.
+    """
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.tokens = 0
+        self.code_objects = 0
+        # Seconds spent in each phase of scanner
+        self.scanner_times = dict.fromkeys(PHASES, 0.0)
+        self.parser_time = 0.0
+        self.walker_time = 0.0
+        self.total_time = 0.0
+        self.ast_nodes = 0
+        self.source_length = 0
+        # Whether source was taken from result cache or code object
+        # memo; None when respective storage is disabled
+        self.result_cache_hit = None
+        self.memo_hit = None
+        for name in PARSER_COUNTERS:
+            setattr(self, name, 0)
+
+    def as_dict(self):
+        """
+        Get flat dictionary of all values, for metrics.
+        """
+        data = {}
+        for name, value in sorted(vars(self).items()):
+            if name == 'scanner_times':
+                for phase, seconds in value.items():
+                    data['scanner_time_{}'.format(phase)] = seconds
+            else:
+                data[name] = value
+        return data
+
+    def __repr__(self):
+        return 'Stats({})'.format(', '.join('{}={!r}'.format(name, value) for name, value in sorted(self.as_dict().items())))
+
+
+def count_nodes(ast):
+    """
+    Count nodes of tree, including tokens.
+    """
+    count = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, ASTNode):
+            stack.extend(node)
+    return count
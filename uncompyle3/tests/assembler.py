@@ -0,0 +1,120 @@
+import marshal
+import struct
+import types
+
+from uncompyle3.scanner import dis
+
+
+# Header of bytecode files produced by CPython 3.5
+MAGIC = b'\x16\r\r\n'
+
+
+def assemble_code(instructions, consts=(), names=(), varnames=(), argcount=0, kwonlyargcount=0, flags=0,
+                  name='<module>'):
+    """
+    Compose code object with CPython 3.5 bytecode out of
+    instructions, where each instruction is (line number,
+    opcode name, argument) tuple. Argument is ignored for
+    opcodes which do not have it.
+    """
+    code = bytearray()
+    lnotab = bytearray()
+    firstlineno = instructions[0][0] if instructions else 1
+    last_offset = 0
+    last_line = firstlineno
+    for line, opname, arg in instructions:
+        if line != last_line:
+            byte_incr = len(code) - last_offset
+            line_incr = line - last_line
+            while byte_incr > 255:
+                lnotab.extend((255, 0))
+                byte_incr -= 255
+            while line_incr > 127:
+                lnotab.extend((byte_incr, 127))
+                byte_incr = 0
+                line_incr -= 127
+            lnotab.extend((byte_incr, line_incr))
+            last_offset = len(code)
+            last_line = line
+        op = dis.opmap[opname]
+        if op < dis.HAVE_ARGUMENT:
+            code.append(op)
+            continue
+        if arg > 0xffff:
+            code.extend((dis.EXTENDED_ARG, (arg >> 16) & 0xff, (arg >> 24) & 0xff))
+        code.extend((op, arg & 0xff, (arg >> 8) & 0xff))
+    return types.CodeType(
+        argcount, kwonlyargcount, len(varnames), 64, flags, bytes(code), tuple(consts), tuple(names),
+        tuple(varnames), '<assembled>', name, firstlineno, bytes(lnotab), (), ())
+
+
+def assemble(instructions, **kwargs):
+    """
+    Compose contents of bytecode file, see assemble_code()
+    for arguments description.
+    """
+    code = assemble_code(instructions, **kwargs)
+    return MAGIC + struct.pack('<II', 0, 0) + marshal.dumps(code)
+
+
+def assemble_assignments(amount, variety=100):
+    """
+    Compose bytecode file for module with <amount> of simple
+    assignment statements, one per line, and its expected source.
+    """
+    instructions = []
+    lines = []
+    for i in range(amount):
+        idx = i % variety
+        instructions.append((i + 1, 'LOAD_CONST', idx))
+        instructions.append((i + 1, 'STORE_NAME', idx))
+        lines.append('var{} = {}'.format(idx, idx))
+    instructions.append((amount, 'LOAD_CONST', variety))
+    instructions.append((amount, 'RETURN_VALUE', None))
+    consts = list(range(variety)) + [None]
+    names = ['var{}'.format(idx) for idx in range(variety)]
+    return assemble(instructions, consts=consts, names=names), '\n'.join(lines)
+
+
+def assemble_jumps(instructions):
+    """
+    Assemble code object out of (line, opcode name, target index)
+    tuples, where jump targets are given as indices of instructions.
+    """
+    offsets = []
+    offset = 0
+    for line, opname, arg in instructions:
+        offsets.append(offset)
+        offset += 1 if dis.opmap[opname] < dis.HAVE_ARGUMENT else 3
+    offsets.append(offset)
+    fixed = []
+    for idx, (line, opname, arg) in enumerate(instructions):
+        op = dis.opmap[opname]
+        if op in dis.hasjabs:
+            arg = offsets[arg]
+        elif op in dis.hasjrel:
+            arg = offsets[arg] - offsets[idx] - 3
+        fixed.append((line, opname, arg))
+    return assemble_code(fixed, consts=(None,), names=('a', 'b'))
+
+
+def nested_ifs(depth, body):
+    """
+    Compose code object with <depth> nested ifs, each with <body>
+    assignments, all ending at the same offset.
+    """
+    instructions = []
+    line = 1
+    for _ in range(depth):
+        instructions.append((line, 'LOAD_NAME', 0))
+        instructions.append((line, 'POP_JUMP_IF_FALSE', None))
+        line += 1
+        for _ in range(body):
+            instructions.append((line, 'LOAD_NAME', 0))
+            instructions.append((line, 'STORE_NAME', 1))
+            line += 1
+    end = len(instructions)
+    instructions = [(l, op, end if op == 'POP_JUMP_IF_FALSE' else arg) for l, op, arg in instructions]
+    instructions.append((line, 'LOAD_CONST', 0))
+    instructions.append((line, 'RETURN_VALUE', None))
+    return assemble_jumps(instructions)
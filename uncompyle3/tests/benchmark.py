@@ -0,0 +1,229 @@
+import argparse
+import os.path
+import sys
+import time
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.realpath(os.path.join(script_dir, '..', '..')))
+
+
+def find_corpus(path):
+    """
+    Find all bytecode files in given directory tree.
+    """
+    files = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.pyc'):
+                files.append(os.path.join(dirpath, filename))
+    return files
+
+
+def load_tokens(path, scanner=None):
+    """
+    Get tokens for bytecode file the same way Uncompyle.run() does.
+    """
+    from uncompyle3.scanner.scanner import Scanner
+    from uncompyle3.scanner.token import Token
+    infile = open(path, 'rb')
+    file_bytes = infile.read()
+    infile.close()
+    if scanner is None:
+        scanner = Scanner()
+    tokens = scanner.run(file_bytes[12:])
+    if len(tokens) > 2 and tokens[-1] == Token(type_='RETURN_VALUE') and tokens[-2] == Token(type_='LOAD_CONST'):
+        del tokens[-2:]
+    return tokens
+
+
+def measure(func, rounds):
+    """
+    Run function <rounds> times and return best time of single run.
+    """
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_new_ifs(corpus, rounds):
+    """
+    Measure time of finding new ifs for nested ifs of growing
+    depth; with linear algorithm it grows 4 times per step, not
+    16 times. Corpus is not used, its ifs aren't nested deep enough.
+    """
+    from uncompyle3.scanner.scanner import Scanner
+    from uncompyle3.tests.assembler import nested_ifs
+    timings = []
+    for depth in (100, 400, 1600):
+        co = nested_ifs(depth, 20)
+        scanner = Scanner()
+        scanner.code = co.co_code
+        scanner.decode()
+        scanner.build_lines_data(co)
+        timings.append(('{} ifs'.format(depth), measure(scanner.find_new_ifs, rounds)))
+    return tuple(timings)
+
+
+def bench_parser(corpus, rounds):
+    """
+    Compare Earley parser scanning via gotoST (untyped) with
+    scanning via typed terminals.
+    """
+    from uncompyle3.parser.parser import Parser
+    token_lists = [load_tokens(path) for path in corpus]
+    results = {}
+    for typed in (False, True):
+        parser = Parser(typed=typed, lr=False)
+        # Warm up grammar, so that we do not measure state machine
+        # generation and custom rules addition
+        asts = [repr(parser.parse(tokens)) for tokens in token_lists]
+        results[typed] = asts, measure(lambda: [parser.parse(tokens) for tokens in token_lists], rounds)
+    if results[False][0] != results[True][0]:
+        sys.stderr.write('typed and untyped parsers produced different trees\n')
+    return (('untyped', results[False][1]), ('typed', results[True][1]))
+
+
+def bench_leo(corpus, rounds):
+    """
+    Compare Earley parser with and without Leo items for
+    right-recursive completion chains.
+    """
+    from uncompyle3.parser.parser import Parser
+    token_lists = [load_tokens(path) for path in corpus]
+    results = {}
+    for leo in (False, True):
+        parser = Parser(leo=leo, lr=False)
+        asts = [repr(parser.parse(tokens)) for tokens in token_lists]
+        results[leo] = asts, measure(lambda: [parser.parse(tokens) for tokens in token_lists], rounds)
+    if results[False][0] != results[True][0]:
+        sys.stderr.write('parsers with and without Leo items produced different trees\n')
+    return (('earley', results[False][1]), ('leo', results[True][1]))
+
+
+def bench_lookahead(corpus, rounds):
+    """
+    Compare Earley parser keeping all items in sets with parser
+    dropping items which can't use the next token.
+    """
+    from uncompyle3.parser.parser import Parser
+    token_lists = [load_tokens(path) for path in corpus]
+    results = {}
+    for lookahead in (False, True):
+        parser = Parser(lookahead=lookahead, lr=False)
+        asts = [repr(parser.parse(tokens)) for tokens in token_lists]
+        results[lookahead] = asts, measure(lambda: [parser.parse(tokens) for tokens in token_lists], rounds)
+    if results[False][0] != results[True][0]:
+        sys.stderr.write('parsers with and without lookahead produced different trees\n')
+    return (('earley', results[False][1]), ('lookahead', results[True][1]))
+
+
+def bench_lr(corpus, rounds):
+    """
+    Compare Earley parser with LALR(1) parser, which falls back
+    to Earley one on conflicts.
+    """
+    from uncompyle3.parser.parser import Parser
+    token_lists = [load_tokens(path) for path in corpus]
+    results = {}
+    for lr in (False, True):
+        parser = Parser(lr=lr)
+        asts = [repr(parser.parse(tokens)) for tokens in token_lists]
+        results[lr] = asts, measure(lambda: [parser.parse(tokens) for tokens in token_lists], rounds)
+        if lr:
+            lr_parses = parser.lr_parses
+            for tokens in token_lists:
+                parser.parse(tokens)
+            sys.stderr.write('LALR(1) parser used for {} of {} files\n'.format(
+                parser.lr_parses - lr_parses, len(token_lists)))
+    if results[False][0] != results[True][0]:
+        sys.stderr.write('LALR(1) and Earley parsers produced different trees\n')
+    return (('earley', results[False][1]), ('lr', results[True][1]))
+
+
+def bench_stack(corpus, rounds):
+    """
+    Compare parsing of whole modules with building statements
+    without jumps via value stack simulation.
+    """
+    from uncompyle3.parser.parser import Parser
+    from uncompyle3.scanner.scanner import Scanner
+    token_lists = []
+    chunk_lists = []
+    for path in corpus:
+        scanner = Scanner()
+        tokens = load_tokens(path, scanner)
+        token_lists.append(tokens)
+        chunk_lists.append(scanner.split_statements(tokens, 1))
+    parser = Parser(stack_builder=False)
+    asts = [repr(parser.parse(tokens)) for tokens in token_lists]
+    parse_time = measure(lambda: [parser.parse(tokens) for tokens in token_lists], rounds)
+    parser = Parser()
+    stack_asts = [repr(parser.parse_chunks(chunks)) for chunks in chunk_lists]
+    stack_time = measure(lambda: [parser.parse_chunks(chunks) for chunks in chunk_lists], rounds)
+    if asts != stack_asts:
+        sys.stderr.write('parser and stack builder produced different trees\n')
+    return (('parser', parse_time), ('stack', stack_time))
+
+
+def bench_walker(corpus, rounds):
+    """
+    Compare source generation out of syntax trees, which interprets
+    formatting table, with one using compiled table entries.
+    """
+    from uncompyle3.parser.parser import Parser
+    from uncompyle3.walker.walker import Walker
+    parser = Parser()
+    asts = [parser.parse(load_tokens(path)) for path in corpus]
+    results = {}
+    for compiled in (False, True):
+        walker = Walker(compiled=compiled)
+        sources = [walker.gen_source(ast) for ast in asts]
+        results[compiled] = sources, measure(lambda: [walker.gen_source(ast) for ast in asts], rounds)
+    if results[False][0] != results[True][0]:
+        sys.stderr.write('interpreted and compiled walkers produced different source\n')
+    return (('interpreted', results[False][1]), ('compiled', results[True][1]))
+
+
+BENCHMARKS = {
+    'leo': bench_leo,
+    'lookahead': bench_lookahead,
+    'lr': bench_lr,
+    'new_ifs': bench_new_ifs,
+    'parser': bench_parser,
+    'stack': bench_stack,
+    'walker': bench_walker,
+}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Run uncompyle3 benchmarks')
+    parser.add_argument(
+        'benchmark', nargs='?', type=str, choices=sorted(BENCHMARKS),
+        help='benchmark to run, defaults to all benchmarks', default=None
+    )
+    parser.add_argument(
+        '--corpus', type=str,
+        help='system path to directory with bytecode files, defaults to blackbox test resources',
+        default=os.path.join(script_dir, 'blackbox', 'res')
+    )
+    parser.add_argument(
+        '--rounds', type=int, help='amount of runs to pick best time from', default=20
+    )
+    args = parser.parse_args()
+
+    corpus = find_corpus(os.path.expanduser(args.corpus))
+    names = [args.benchmark] if args.benchmark else sorted(BENCHMARKS)
+    for name in names:
+        timings = BENCHMARKS[name](corpus, args.rounds)
+        baseline = timings[0][1]
+        print('{} ({} files):'.format(name, len(corpus)))
+        for variant, elapsed in timings:
+            print('  {:<12} {:>10.3f} ms  x{:.2f}'.format(variant, elapsed * 1000, baseline / elapsed))
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from uncompyle3.parser.astnode import ASTNode
+from uncompyle3.parser.parser import Parser
+from uncompyle3.tests.unit.test_grammar_extension import call_tokens
+from uncompyle3.walker.walker import Walker
+
+
+class TestASTNode(TestCase):
+
+    def test_compact(self):
+        node = ASTNode('expr', ['child'])
+        self.assertFalse(hasattr(node, '__dict__'))
+        self.assertIsInstance(node.data, tuple)
+
+    def test_sequence(self):
+        node = ASTNode('call_function', ['a', 'b', 'c'])
+        self.assertEqual(len(node), 3)
+        self.assertEqual(node[-1], 'c')
+        self.assertEqual(node[1:-1], ('b',))
+        self.assertEqual(list(node), ['a', 'b', 'c'])
+
+    def test_slice(self):
+        # Slice is tuple of children on all python versions; UserList
+        # on 3.7+ made it node with the children list as its type and
+        # no children at all
+        node = ASTNode('call_function', ['f', 'a', 'b', 'CALL_FUNCTION'])
+        self.assertEqual(node[1:-1], ('a', 'b'))
+        self.assertEqual(node[2:2], ())
+
+    def test_range_format(self):
+        # Call arguments are rendered from slice of call node
+        for compiled in (True, False):
+            ast = Parser().parse(call_tokens(2, 1))
+            self.assertEqual(Walker(compiled=compiled).gen_source(ast), 'func(arg0, arg1, kw0=value0)\n')
+
+    def test_equality(self):
+        self.assertEqual(ASTNode('expr', ['a']), ASTNode('expr', ['a']))
+        self.assertNotEqual(ASTNode('expr', ['a']), ASTNode('expr', ['b']))
+        self.assertNotEqual(ASTNode('expr', ['a']), ASTNode('stmt', ['a']))
+        self.assertEqual(ASTNode('expr', ['a']), 'expr')
+
+    def test_slice_assignment(self):
+        # The way generic spark tree builder fills nodes
+        node = ASTNode('expr')
+        node[:2] = ['a', 'b']
+        self.assertEqual(node.data, ('a', 'b'))
+
+    def test_parser(self):
+        ast = Parser(stack_builder=False).parse(call_tokens(1, 0))
+        self.assertIsInstance(ast, ASTNode)
+        self.assertEqual(ast[0][0][0].type, 'expr')
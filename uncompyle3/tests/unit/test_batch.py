@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from uncompyle3.batch import get_source_path
+from uncompyle3.tests.assembler import assemble
+from uncompyle3.tests.benchmark import find_corpus
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+from uncompyle3.uncompyle import Uncompyle
+
+
+class TestBatch(TestCase):
+
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.target_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.source_dir)
+        shutil.rmtree(self.target_dir)
+
+    def test_source_path(self):
+        self.assertEqual(get_source_path('mod.pyc'), 'mod.py')
+        self.assertEqual(get_source_path(os.path.join('pkg', 'mod.cpython-35.pyc')), os.path.join('pkg', 'mod.py'))
+        self.assertEqual(
+            get_source_path(os.path.join('pkg', '__pycache__', 'mod.cpython-35.opt-1.pyc')),
+            os.path.join('pkg', 'mod.py'))
+
+    def test_tree(self):
+        uncompyle = Uncompyle()
+        expected = {}
+        for path in find_corpus(res_path):
+            rel_path = os.path.relpath(path, res_path)
+            os.makedirs(os.path.join(self.source_dir, os.path.dirname(rel_path)), exist_ok=True)
+            shutil.copy(path, os.path.join(self.source_dir, rel_path))
+            infile = open(path, 'rb')
+            expected[get_source_path(rel_path)] = uncompyle.run(infile.read())
+            infile.close()
+        # Broken file must not stop the batch
+        broken = open(os.path.join(self.source_dir, 'broken.pyc'), 'wb')
+        broken.write(b'\x16\r\r\n' + b'\x00' * 12)
+        broken.close()
+        # As well as file which can be loaded, but not parsed
+        unparsable = open(os.path.join(self.source_dir, 'unparsable.pyc'), 'wb')
+        unparsable.write(assemble([
+            (1, 'LOAD_NAME', 0),
+            (1, 'GET_ITER', None),
+            (1, 'POP_TOP', None),
+            (1, 'LOAD_CONST', 0),
+            (1, 'RETURN_VALUE', None),
+        ], consts=(None,), names=('a',)))
+        unparsable.close()
+        results = list(uncompyle.run_batch(self.source_dir, self.target_dir, workers=2))
+        self.assertEqual(len(results), len(expected) + 2)
+        failed = {result.source_path: result.error for result in results if result.error is not None}
+        self.assertEqual(
+            sorted(failed), [os.path.join(self.source_dir, 'broken.pyc'), os.path.join(self.source_dir, 'unparsable.pyc')])
+        self.assertTrue(failed[os.path.join(self.source_dir, 'unparsable.pyc')].startswith('ParserError'))
+        for rel_path, source in expected.items():
+            outfile = open(os.path.join(self.target_dir, rel_path))
+            self.assertEqual(outfile.read(), source, rel_path)
+            outfile.close()
+        self.assertFalse(os.path.exists(os.path.join(self.target_dir, 'broken.py')))
+        self.assertFalse(os.path.exists(os.path.join(self.target_dir, 'unparsable.py')))
+
+    def test_stats(self):
+        paths = find_corpus(res_path)[:3]
+        for path in paths:
+            shutil.copy(path, self.source_dir)
+        uncompyle = Uncompyle()
+        results = list(uncompyle.run_batch(self.source_dir, self.target_dir, workers=2))
+        self.assertEqual([result.stats for result in results], [None] * len(paths))
+        # Stats of files decompiled in workers are passed back
+        results = list(uncompyle.run_batch(self.source_dir, self.target_dir, workers=2, with_stats=True))
+        self.assertEqual(len(results), len(paths))
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertEqual(result.stats['bytes_read'], os.path.getsize(result.source_path))
+            self.assertGreater(result.stats['tokens'], 0)
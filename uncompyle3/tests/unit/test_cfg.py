@@ -0,0 +1,108 @@
+from types import CodeType
+from unittest import TestCase
+
+from uncompyle3.scanner.scanner import Scanner
+from uncompyle3.tests.assembler import assemble
+from uncompyle3.tests.benchmark import find_corpus
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+
+
+def find_dominators(cfg):
+    # Plain iterative data flow over sets of blocks
+    blocks = cfg.blocks
+    reachable = set(cfg.postorder())
+    doms = {index: set(reachable) for index in reachable}
+    doms[0] = {0}
+    changed = True
+    while changed:
+        changed = False
+        for index in sorted(reachable - {0}):
+            preds = [doms[pred] for pred in blocks[index].preds if pred in reachable]
+            new = set.intersection(*preds) | {index}
+            if new != doms[index]:
+                doms[index] = new
+                changed = True
+    return doms
+
+
+class TestControlFlowGraph(TestCase):
+
+    def scan(self, file_bytes):
+        scanner = Scanner()
+        scanner.tokenize(scanner.load(file_bytes[12:]))
+        return scanner
+
+    def test_if_else(self):
+        # if a: b = 1 / else: b = 2
+        scanner = self.scan(assemble([
+            (1, 'LOAD_NAME', 0),
+            (1, 'POP_JUMP_IF_FALSE', 15),
+            (2, 'LOAD_CONST', 0),
+            (2, 'STORE_NAME', 1),
+            (2, 'JUMP_FORWARD', 6),
+            (4, 'LOAD_CONST', 1),
+            (4, 'STORE_NAME', 1),
+            (5, 'LOAD_CONST', 2),
+            (5, 'RETURN_VALUE', None),
+        ], consts=(1, 2, None), names=('a', 'b')))
+        # Graph is built once, structure detection uses it
+        cfg = scanner._cfg
+        self.assertIsNotNone(cfg)
+        self.assertIs(scanner.cfg, cfg)
+        self.assertEqual([(block.start, block.end, block.last) for block in cfg.blocks],
+                         [(0, 6, 3), (6, 15, 12), (15, 21, 18), (21, 25, 24)])
+        self.assertEqual([block.succs for block in cfg.blocks], [[1, 2], [3], [3], []])
+        self.assertEqual([block.preds for block in cfg.blocks], [[], [0], [0], [1, 2]])
+        self.assertEqual(cfg.idoms, [None, 0, 0, 0])
+        self.assertTrue(cfg.dominates(0, 3))
+        self.assertFalse(cfg.dominates(1, 3))
+        self.assertIs(cfg.block_at(10), cfg.blocks[1])
+
+    def test_loop(self):
+        # while a: if b: break
+        scanner = self.scan(assemble([
+            (1, 'SETUP_LOOP', 17),
+            (1, 'LOAD_NAME', 0),
+            (1, 'POP_JUMP_IF_FALSE', 19),
+            (2, 'LOAD_NAME', 1),
+            (2, 'POP_JUMP_IF_FALSE', 3),
+            (3, 'BREAK_LOOP', None),
+            (3, 'JUMP_ABSOLUTE', 3),
+            (3, 'POP_BLOCK', None),
+            (4, 'LOAD_CONST', 0),
+            (4, 'RETURN_VALUE', None),
+        ], consts=(None,), names=('a', 'b')))
+        cfg = scanner.cfg
+        self.assertEqual([block.start for block in cfg.blocks], [0, 3, 9, 15, 16, 19, 20])
+        self.assertEqual([block.succs for block in cfg.blocks], [[1, 6], [2, 5], [3, 1], [6], [1], [6], []])
+        # Jump after break is never reached
+        self.assertEqual(cfg.idoms, [None, 0, 1, 2, None, 1, 0])
+        self.assertTrue(cfg.is_back_edge(2, 1))
+        self.assertFalse(cfg.is_back_edge(1, 2))
+        self.assertFalse(cfg.dominates(4, 4))
+        # Jumps which close the loop, the unreachable one doesn't
+        self.assertTrue(scanner.is_loop_jump(12, 3))
+        self.assertFalse(scanner.is_loop_jump(16, 3))
+        self.assertFalse(scanner.is_loop_jump(6, 19))
+        self.assertFalse(scanner.is_loop_jump(12, 4))
+
+    def test_dominators(self):
+        scanner = Scanner()
+        for path in find_corpus(res_path):
+            infile = open(path, 'rb')
+            file_bytes = infile.read()
+            infile.close()
+            code_objects = [scanner.load(file_bytes[12:])]
+            while code_objects:
+                co = code_objects.pop()
+                code_objects.extend(const for const in co.co_consts if isinstance(const, CodeType))
+                scanner.tokenize(co)
+                cfg = scanner.cfg
+                doms = find_dominators(cfg)
+                for index in range(len(cfg.blocks)):
+                    for other in range(len(cfg.blocks)):
+                        self.assertEqual(cfg.dominates(other, index), index in doms and other in doms[index])
+                    if index in doms and index != 0:
+                        # Immediate dominator is the closest strict one
+                        strict = doms[index] - {index}
+                        self.assertEqual(cfg.idoms[index], max(strict, key=lambda dom: len(doms[dom])))
@@ -0,0 +1,38 @@
+import os
+from unittest import TestCase
+
+from uncompyle3.parser.parser import Parser
+from uncompyle3.scanner.scanner import Scanner
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+
+
+class TestChunkedParse(TestCase):
+
+    def get_tokens(self, scanner, path):
+        infile = open(os.path.join(res_path, path), 'rb')
+        bytecode = infile.read()
+        infile.close()
+        tokens = scanner.run(bytecode[12:])
+        # Strip implicit return
+        del tokens[-2:]
+        return tokens
+
+    def assertChunkedParse(self, path, chunk_size, chunk_lengths):
+        scanner = Scanner()
+        tokens = self.get_tokens(scanner, path)
+        chunks = scanner.split_statements(tokens, chunk_size)
+        self.assertEqual([len(chunk) for chunk in chunks], chunk_lengths)
+        self.assertEqual(repr(Parser().parse_chunks(chunks)), repr(Parser().parse(tokens)))
+
+    def test_simple_statements(self):
+        self.assertChunkedParse('misc/assign.cpython-35.pyc', 1, [2])
+
+    def test_branching(self):
+        # If-else statement is kept whole
+        self.assertChunkedParse('misc/complex_script1.cpython-35.pyc', 1, [2, 2, 2, 2, 2, 16, 6])
+
+    def test_looping(self):
+        self.assertChunkedParse('misc/complex_script2.cpython-35.pyc', 1, [16, 12])
+
+    def test_chunk_size(self):
+        self.assertChunkedParse('misc/complex_script1.cpython-35.pyc', 5, [6, 20, 6])
@@ -0,0 +1,97 @@
+import io
+import logging
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from uncompyle3.tests.assembler import assemble_assignments
+from uncompyle3.uncompyle import Uncompyle
+from uncompyle3.utils.debug import debug, debug_enabled, enable_debug, disable_debug, logger
+
+
+class Formatted:
+    """
+    Object which counts how many times it was formatted.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __format__(self, spec):
+        self.count += 1
+        return 'formatted'
+
+
+class TestDebug(TestCase):
+
+    def tearDown(self):
+        disable_debug()
+
+    def test_disabled(self):
+        self.assertFalse(debug_enabled())
+        arg = Formatted()
+        debug('value: {}', arg)
+        self.assertEqual(arg.count, 0)
+
+    def test_enabled(self):
+        stream = io.StringIO()
+        enable_debug(stream=stream)
+        self.assertTrue(debug_enabled())
+        arg = Formatted()
+        debug('value: {}', arg)
+        self.assertEqual(arg.count, 1)
+        # Messages are buffered until trace is flushed
+        self.assertEqual(stream.getvalue(), '')
+        disable_debug()
+        self.assertFalse(debug_enabled())
+        self.assertEqual(stream.getvalue(), 'value: formatted\n')
+
+    def test_application_level(self):
+        # Level set by application is kept, and restored after trace
+        self.assertEqual(logger.level, logging.NOTSET)
+        logger.setLevel(logging.INFO)
+        try:
+            enable_debug(stream=io.StringIO())
+            self.assertTrue(debug_enabled())
+            disable_debug()
+            self.assertEqual(logger.level, logging.INFO)
+            self.assertFalse(debug_enabled())
+        finally:
+            logger.setLevel(logging.NOTSET)
+
+    def test_trace(self):
+        file_bytes, source = assemble_assignments(3)
+        stream = io.StringIO()
+        enable_debug(stream=stream)
+        result = Uncompyle().run(file_bytes)
+        disable_debug()
+        self.assertEqual(result, source + '\n')
+        trace = stream.getvalue()
+        self.assertIn('---Tokens debug output---', trace)
+        self.assertIn('---Walker stage debug---', trace)
+
+    def test_batch_trace(self):
+        # Messages of pool workers end up in trace of parent process
+        source_dir = tempfile.mkdtemp()
+        target_dir = tempfile.mkdtemp()
+        try:
+            expected = []
+            for amount in (3, 5):
+                file_bytes = assemble_assignments(amount)[0]
+                with open(os.path.join(source_dir, 'mod{}.pyc'.format(amount)), 'wb') as f:
+                    f.write(file_bytes)
+                stream = io.StringIO()
+                enable_debug(stream=stream)
+                Uncompyle().run(file_bytes)
+                disable_debug()
+                expected.extend(stream.getvalue().splitlines())
+            stream = io.StringIO()
+            enable_debug(stream=stream)
+            results = list(Uncompyle().run_batch(source_dir, target_dir, workers=2))
+            disable_debug()
+        finally:
+            shutil.rmtree(source_dir)
+            shutil.rmtree(target_dir)
+        self.assertEqual([result.error for result in results], [None, None])
+        self.assertEqual(sorted(stream.getvalue().splitlines()), sorted(expected))
@@ -0,0 +1,94 @@
+from unittest import TestCase
+
+from uncompyle3.scanner import dis
+from uncompyle3.scanner.scanner import Scanner
+from uncompyle3.tests.assembler import assemble, assemble_assignments
+
+
+class TestDecode(TestCase):
+
+    def decode_manually(self, code):
+        # Straightforward decoding, with which columns are compared
+        result = []
+        offset = 0
+        extended_arg = 0
+        while offset < len(code):
+            op = code[offset]
+            if op >= dis.HAVE_ARGUMENT:
+                arg = code[offset+1] + code[offset+2]*256 + extended_arg
+                extended_arg = arg*65536 if op == dis.EXTENDED_ARG else 0
+                target = arg + offset + 3 if op in dis.hasjrel else arg
+                result.append((offset, op, arg, target))
+                offset += 3
+            else:
+                result.append((offset, op, 0, -1))
+                offset += 1
+        return result
+
+    def scan(self, file_bytes):
+        scanner = Scanner()
+        co = scanner.load(file_bytes[12:])
+        scanner.tokenize(co)
+        return scanner
+
+    def check_columns(self, scanner):
+        code = scanner.code
+        expected = self.decode_manually(code)
+        self.assertEqual(
+            list(zip(scanner.op_offsets, scanner.op_codes, scanner.op_args, scanner.op_targets)), expected)
+        self.assertEqual(len(scanner.op_index), len(code))
+        for i, (offset, op, arg, target) in enumerate(expected):
+            size = 1 if op < dis.HAVE_ARGUMENT else 3
+            for inner_offset in range(offset, offset + size):
+                self.assertEqual(scanner.op_index[inner_offset], i)
+            if op in dis.hasjrel or op in dis.hasjabs:
+                self.assertEqual(scanner.get_target(offset), target)
+
+    def test_assignments(self):
+        file_bytes, _ = assemble_assignments(50)
+        self.check_columns(self.scan(file_bytes))
+
+    def test_jumps(self):
+        file_bytes = assemble([
+            (1, 'LOAD_NAME', 0),
+            (1, 'POP_JUMP_IF_FALSE', 15),
+            (2, 'LOAD_CONST', 0),
+            (2, 'STORE_NAME', 1),
+            (2, 'JUMP_FORWARD', 3),
+            (4, 'LOAD_CONST', 1),
+            (4, 'STORE_NAME', 1),
+            (4, 'LOAD_CONST', 2),
+            (4, 'RETURN_VALUE', None),
+        ], consts=(1, 2, None), names=('a', 'b'))
+        scanner = self.scan(file_bytes)
+        self.check_columns(scanner)
+        self.assertEqual(scanner.get_target(3), 15)
+        self.assertEqual(scanner.get_target(12), 18)
+
+    def test_extended_arg(self):
+        file_bytes = assemble([
+            (1, 'LOAD_CONST', 0x12345),
+            (1, 'STORE_NAME', 0),
+            (1, 'LOAD_CONST', 0),
+            (1, 'RETURN_VALUE', None),
+        ], consts=[None] * 0x12346, names=('a',))
+        scanner = self.scan(file_bytes)
+        self.check_columns(scanner)
+        # Extended argument is folded into argument of the next op
+        self.assertEqual(scanner.op_codes[0], dis.EXTENDED_ARG)
+        self.assertEqual(scanner.op_args[1], 0x12345)
+
+    def test_op_range(self):
+        file_bytes, _ = assemble_assignments(20)
+        scanner = self.scan(file_bytes)
+        code = scanner.code
+        offsets = list(scanner.op_offsets)
+        for start in range(len(code) + 1):
+            for end in range(start - 1, len(code) + 1):
+                expected = []
+                offset = start
+                while offset < end:
+                    expected.append(offset)
+                    offset += 1 if code[offset] < dis.HAVE_ARGUMENT else 3
+                self.assertEqual(list(scanner.op_range(start, end)), expected)
+        self.assertEqual(list(scanner.op_range(0, len(code))), offsets)
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase, mock
+
+from uncompyle3.parser.parser import Parser
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+from uncompyle3.uncompyle import Uncompyle
+
+
+class TestGrammarCache(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def decompile(self, uncompyle, path):
+        infile = open(os.path.join(res_path, path), 'rb')
+        bytecode = infile.read()
+        infile.close()
+        return uncompyle.run(bytecode)
+
+    def test_store_on_startup(self):
+        Parser(grammar_cache=self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_load_on_startup(self):
+        Parser(grammar_cache=self.cache_dir)
+        parser = Parser(grammar_cache=self.cache_dir)
+        self.assertFalse(parser.ruleschanged)
+        self.assertEqual(parser.makeSet, parser.makeSet_fast)
+
+    def test_custom_rules(self):
+        path = 'call_arguments/keyword.cpython-35.pyc'
+        expected = self.decompile(Uncompyle(), path)
+        # Grammar with custom rules is stored under separate key; calls
+        # have to reach parser for them to be added
+        self.assertEqual(self.decompile(Uncompyle(grammar_cache=self.cache_dir, stack_builder=False), path), expected)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        self.assertEqual(self.decompile(Uncompyle(grammar_cache=self.cache_dir, stack_builder=False), path), expected)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+    def test_broken_file(self):
+        parser = Parser(grammar_cache=self.cache_dir)
+        for filename in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, filename), 'wb') as f:
+                f.write(b'garbage')
+        self.assertFalse(parser.grammar_cache.load(parser))
+        parser = Parser(grammar_cache=self.cache_dir)
+        self.assertTrue(parser.grammar_cache.load(parser))
+
+    def test_source_version(self):
+        parser = Parser(grammar_cache=self.cache_dir)
+        # Machines built by changed parser code are not reused
+        with mock.patch('uncompyle3.cache._source_digest', b'changed'):
+            self.assertFalse(parser.grammar_cache.load(parser))
+        self.assertTrue(parser.grammar_cache.load(parser))
@@ -0,0 +1,61 @@
+import shutil
+import tempfile
+from unittest import TestCase
+
+from uncompyle3.parser.parser import Parser
+from uncompyle3.scanner.token import Token
+
+
+def call_tokens(args_pos, args_kw):
+    """
+    Compose tokens for call statement with given amount of
+    positional and keyword arguments.
+    """
+    tokens = [Token('LOAD_NAME', 0, 'func', offset=0)]
+    for i in range(args_pos):
+        tokens.append(Token('LOAD_NAME', i, 'arg{}'.format(i), offset=0))
+    for i in range(args_kw):
+        tokens.append(Token('LOAD_CONST', i, repr('kw{}'.format(i)), offset=0))
+        tokens.append(Token('LOAD_NAME', i, 'value{}'.format(i), offset=0))
+    tokens.append(Token('CALL_FUNCTION', args_pos | (args_kw << 8), offset=0))
+    tokens.append(Token('POP_TOP', offset=0))
+    return tokens
+
+
+class TestGrammarExtension(TestCase):
+
+    arities = ((1, 0), (0, 0), (3, 0), (1, 2), (2, 0), (0, 1), (4, 3), (3, 0))
+
+    def assertExtends(self, parser):
+        rebuilds = parser.state_machine_rebuilds
+        for args_pos, args_kw in self.arities:
+            tokens = call_tokens(args_pos, args_kw) + call_tokens(2, 1)
+            self.assertEqual(repr(parser.parse(tokens)), repr(Parser().parse(tokens)))
+        # Grammar had no call_function rules before the first call,
+        # thus it can't be extended
+        self.assertEqual(parser.state_machine_rebuilds - rebuilds, 1)
+        self.assertEqual(parser.state_machine_extensions, len(set(self.arities)) - 1)
+
+    # State machine of Earley parser is tested, thus deterministic
+    # parser which may skip it is disabled
+
+    def test_lazy(self):
+        self.assertExtends(Parser(lr=False))
+
+    def test_cached(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            parser = Parser(grammar_cache=cache_dir, lr=False)
+            self.assertExtends(parser)
+            self.assertEqual(parser.makeSet, parser.makeSet_fast)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_nested(self):
+        parser = Parser(lr=False)
+        inner = call_tokens(2, 0)[:-1]
+        tokens = call_tokens(1, 0)
+        tokens[1:2] = inner
+        parser.parse(call_tokens(1, 0))
+        self.assertEqual(repr(parser.parse(tokens)), repr(Parser().parse(tokens)))
+        self.assertEqual(parser.state_machine_extensions, 1)
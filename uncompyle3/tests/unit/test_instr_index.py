@@ -0,0 +1,112 @@
+import random
+from unittest import TestCase
+
+from uncompyle3.scanner import dis
+from uncompyle3.scanner.scanner import Scanner
+from uncompyle3.tests.assembler import assemble_assignments
+from uncompyle3.tests.benchmark import find_corpus
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+
+
+JUMPS = sorted(set(dis.hasjrel + dis.hasjabs))
+POP_JUMP_IF_TRUE = dis.opmap['POP_JUMP_IF_TRUE']
+
+
+# Linear scans over all instructions, against which indexed
+# lookups are checked
+
+def all_instr(scanner, start, end, instr, target=None, include_beyond_target=False):
+    result = []
+    for i, offset in enumerate(scanner.op_offsets):
+        if not (start <= offset < end) or scanner.op_codes[i] not in instr:
+            continue
+        t = scanner.op_targets[i]
+        if target is None or t == target or (include_beyond_target and t >= target):
+            result.append(offset)
+    return result
+
+
+def last_instr(scanner, start, end, instr, target=None, exact=True):
+    result_offset = None
+    current_distance = len(scanner.code)
+    for i, offset in enumerate(scanner.op_offsets):
+        if not (start <= offset < end) or scanner.op_codes[i] not in instr:
+            continue
+        if target is None:
+            result_offset = offset
+            continue
+        dest = scanner.op_targets[i]
+        if dest == target:
+            current_distance = 0
+            result_offset = offset
+        elif not exact:
+            new_distance = abs(target - dest)
+            if new_distance <= current_distance:
+                current_distance = new_distance
+                result_offset = offset
+    return result_offset
+
+
+def rem_or(scanner, start, end, instr, target=None, include_beyond_target=False):
+    instr_offsets = all_instr(scanner, start, end, instr, target, include_beyond_target)
+    for pjit_offset in all_instr(scanner, start, end, (POP_JUMP_IF_TRUE,)):
+        pjit_tgt = scanner.get_target(pjit_offset) - 3
+        instr_offsets = [offset for offset in instr_offsets if offset <= pjit_offset or offset >= pjit_tgt]
+    return instr_offsets
+
+
+class TestInstrIndex(TestCase):
+
+    def scanners(self):
+        paths = find_corpus(res_path)
+        for path in paths:
+            infile = open(path, 'rb')
+            file_bytes = infile.read()
+            infile.close()
+            scanner = Scanner()
+            scanner.run(file_bytes[12:])
+            yield scanner
+        scanner = Scanner()
+        scanner.run(assemble_assignments(30)[0][12:])
+        yield scanner
+
+    def random_query(self, rng, scanner):
+        codelen = len(scanner.code)
+        start = rng.randint(0, codelen)
+        end = rng.randint(start, codelen)
+        present = sorted(set(scanner.op_codes))
+        if rng.random() < 0.5:
+            # Jumps only, which are looked up via jump targets
+            instr = rng.sample(JUMPS, rng.randint(1, 3))
+        else:
+            instr = rng.sample(present, rng.randint(1, min(3, len(present))))
+        jumps = [t for i, t in enumerate(scanner.op_targets) if scanner.op_codes[i] in JUMPS]
+        target = None
+        if rng.random() < 0.7:
+            target = rng.choice(jumps) if jumps and rng.random() < 0.8 else rng.randint(0, codelen)
+        return start, end, instr, target
+
+    def test_equivalence(self):
+        rng = random.Random(3)
+        for scanner in self.scanners():
+            for _ in range(200):
+                start, end, instr, target = self.random_query(rng, scanner)
+                beyond = rng.random() < 0.3
+                self.assertEqual(
+                    scanner.all_instr(start, end, instr, target, beyond),
+                    all_instr(scanner, start, end, instr, target, beyond))
+                self.assertEqual(
+                    scanner.rem_or(start, end, instr, target, beyond),
+                    rem_or(scanner, start, end, instr, target, beyond))
+                exact = rng.random() < 0.7
+                self.assertEqual(
+                    scanner.last_instr(start, end, instr, target, exact),
+                    last_instr(scanner, start, end, instr, target, exact))
+
+    def test_single_opcode(self):
+        # Opcode may be passed without container
+        scanner = next(self.scanners())
+        op = scanner.op_codes[0]
+        codelen = len(scanner.code)
+        self.assertEqual(scanner.all_instr(0, codelen, op), all_instr(scanner, 0, codelen, (op,)))
+        self.assertEqual(scanner.last_instr(0, codelen, op), last_instr(scanner, 0, codelen, (op,)))
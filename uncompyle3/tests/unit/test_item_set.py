@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+from uncompyle3.parser.parser import Parser
+from uncompyle3.tests.benchmark import find_corpus, load_tokens
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+
+
+class RecordingParser(Parser):
+    """
+    Earley parser which keeps Earley sets of the last parse, and
+    sizes of sets before and after each pruning.
+    """
+
+    def __init__(self, **kwargs):
+        Parser.__init__(self, lr=False, stack_builder=False, **kwargs)
+        self.sets = None
+        self.prunes = []
+
+    def makeSet(self, token, sets, i):
+        self.sets = sets
+        Parser.makeSet(self, token, sets, i)
+
+    def pruneSet(self, items, i, ttype):
+        size = len(items)
+        Parser.pruneSet(self, items, i, ttype)
+        self.prunes.append((size, len(items)))
+
+
+def find_waiting(parser, items, sym):
+    # Scan of all items of the set and of all items of their states
+    result = []
+    for item in items:
+        for rule, pos in parser.states[item[0]].items:
+            if rule[1][pos:pos+1] == (sym,):
+                result.append((item, parser.goto(item[0], sym)))
+                break
+    return result
+
+
+class TestItemSet(TestCase):
+
+    def sets(self, **kwargs):
+        parser = RecordingParser(**kwargs)
+        for path in find_corpus(res_path):
+            parser.parse(load_tokens(path))
+            yield parser, parser.sets
+
+    def test_waiting(self):
+        for parser, sets in self.sets():
+            symbols = set(parser.rules)
+            # The last set is the one which was never filled
+            for items in sets[:-1]:
+                # Lists which were cached during parse are still valid
+                # for finished set
+                for sym, waiting in items.waiting.items():
+                    self.assertEqual(waiting, find_waiting(parser, items, sym))
+                for sym in symbols:
+                    self.assertEqual(parser.waiting(items, sym), find_waiting(parser, items, sym))
+
+    def test_index(self):
+        pruned = False
+        for parser, sets in self.sets():
+            for items in sets:
+                self.assertEqual(items.index, set(items))
+                self.assertEqual(len(items.index), len(items))
+                for item in items:
+                    self.assertIn(item, items)
+            pruned = pruned or any(after < before for before, after in parser.prunes)
+        self.assertTrue(pruned)
+
+    def test_index_unpruned(self):
+        for parser, sets in self.sets(lookahead=False):
+            self.assertEqual(parser.prunes, [])
+            for items in sets:
+                self.assertEqual(items.index, set(items))
@@ -0,0 +1,90 @@
+import os
+import random
+from unittest import TestCase
+
+from uncompyle3.parser.astnode import ASTNode
+from uncompyle3.parser.parser import Parser
+from uncompyle3.scanner.scanner import Scanner
+from uncompyle3.tests.benchmark import find_corpus
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+from uncompyle3.utils.spark import GenericASTBuilder
+
+
+class RightRecursiveParser(GenericASTBuilder):
+    """
+    Toy grammar with right-recursive and ambiguous rules, which
+    also counts items in all Earley sets. Ambiguity is between
+    different rules only: when the same rule derives the same span
+    in several ways, pick among them depends on order of links,
+    which differs when Leo items are used.
+    """
+
+    def __init__(self, leo):
+        GenericASTBuilder.__init__(self, ASTNode, 'seq')
+        self.leo = leo
+        self.items = 0
+
+    def p_seq(self, args):
+        """
+        seq ::= elem seq
+        seq ::= elem
+        elem ::= a
+        elem ::= b
+        elem ::= x y
+        elem ::= pair
+        pair ::= x y
+        elem ::= LPAR seq RPAR
+        """
+
+    def typestring(self, token):
+        return token
+
+    def makeSet(self, token, sets, i):
+        GenericASTBuilder.makeSet(self, token, sets, i)
+        self.items += len(sets[i])
+
+
+class TestLeo(TestCase):
+
+    def parse(self, tokens):
+        results = []
+        for leo in (False, True):
+            parser = RightRecursiveParser(leo)
+            results.append((repr(parser.parse(tokens)), parser.items))
+        return results
+
+    def test_right_recursion(self):
+        (tree, items), (leo_tree, leo_items) = self.parse(['a'] * 300)
+        self.assertEqual(leo_tree, tree)
+        # Without Leo items, each set holds the whole chain of
+        # incomplete seq rules
+        self.assertGreater(items, 300 * 300 / 2)
+        self.assertLess(leo_items, 300 * 10)
+
+    def random_seq(self, rand, depth=0):
+        tokens = []
+        for _ in range(rand.randint(1, 8)):
+            if depth < 3 and rand.random() < 0.2:
+                tokens.append('LPAR')
+                tokens.extend(self.random_seq(rand, depth + 1))
+                tokens.append('RPAR')
+            else:
+                tokens.extend(rand.choice((['a'], ['b'], ['x', 'y'])))
+        return tokens
+
+    def test_ambiguous(self):
+        rand = random.Random(0)
+        for _ in range(200):
+            tokens = self.random_seq(rand)
+            (tree, items), (leo_tree, leo_items) = self.parse(tokens)
+            self.assertEqual(leo_tree, tree)
+
+    def test_corpus(self):
+        scanner = Scanner()
+        for path in find_corpus(res_path):
+            infile = open(path, 'rb')
+            bytecode = infile.read()
+            infile.close()
+            tokens = scanner.run(bytecode[12:])
+            del tokens[-2:]
+            self.assertEqual(repr(Parser(leo=True, lr=False).parse(tokens)), repr(Parser(lr=False).parse(tokens)), os.path.basename(path))
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from uncompyle3.parser.parser import Parser
+from uncompyle3.tests.benchmark import find_corpus, load_tokens
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+from uncompyle3.tests.unit.test_grammar_extension import call_tokens
+
+
+class CountingParser(Parser):
+    """
+    Earley parser which counts items in all Earley sets.
+    """
+
+    items = 0
+
+    def __init__(self, **kwargs):
+        Parser.__init__(self, lr=False, **kwargs)
+
+    def makeSet(self, token, sets, i):
+        Parser.makeSet(self, token, sets, i)
+        self.items += len(sets[i])
+
+
+class TestLookahead(TestCase):
+
+    def parse(self, tokens_list, **kwargs):
+        parser = CountingParser(**kwargs)
+        trees = [repr(parser.parse(tokens)) for tokens in tokens_list]
+        return trees, parser.items
+
+    def test_corpus(self):
+        tokens_list = [load_tokens(path) for path in find_corpus(res_path)]
+        trees, items = self.parse(tokens_list, lookahead=False)
+        lookahead_trees, lookahead_items = self.parse(tokens_list)
+        self.assertEqual(lookahead_trees, trees)
+        self.assertLess(lookahead_items, items)
+
+    def test_untyped(self):
+        # Lookahead needs token types, untyped parser keeps everything
+        tokens_list = [load_tokens(path) for path in find_corpus(res_path)]
+        trees, items = self.parse(tokens_list, typed=False, lookahead=False)
+        lookahead_trees, lookahead_items = self.parse(tokens_list, typed=False)
+        self.assertEqual(lookahead_trees, trees)
+        self.assertEqual(lookahead_items, items)
+
+    def test_extension(self):
+        # Lookahead sets are recomputed once grammar is extended
+        parser = Parser(lr=False)
+        parser.parse(call_tokens(1, 0))
+        tokens = call_tokens(0, 0)
+        self.assertEqual(repr(parser.parse(tokens)), repr(Parser(lookahead=False, lr=False).parse(tokens)))
+        self.assertEqual(parser.state_machine_extensions, 1)
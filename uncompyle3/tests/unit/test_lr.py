@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+from uncompyle3.parser.lr import LRTable
+from uncompyle3.parser.parser import LR_REBUILD_INPUTS, Parser
+from uncompyle3.tests.benchmark import find_corpus, load_tokens
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+from uncompyle3.tests.unit.test_grammar_extension import call_tokens
+
+
+class TestLR(TestCase):
+
+    def test_corpus(self):
+        parser = Parser()
+        earley_parser = Parser(lr=False)
+        paths = set()
+        for path in find_corpus(res_path):
+            tokens = load_tokens(path)
+            self.assertEqual(repr(parser.parse(tokens)), repr(earley_parser.parse(tokens)), path)
+            paths.add(parser.last_path)
+        self.assertEqual(paths, {'lr', 'earley'})
+        self.assertEqual(parser.lr_parses + parser.earley_parses, len(find_corpus(res_path)))
+        self.assertEqual(earley_parser.lr_parses, 0)
+
+    def test_conflict(self):
+        # Keyword argument starts with LOAD_CONST just like expression
+        # does, and which of them it is can't be decided by next token
+        parser = Parser()
+        for args_pos, args_kw, path in ((1, 0, 'lr'), (0, 1, 'earley'), (1, 0, 'lr')):
+            tokens = call_tokens(args_pos, args_kw)
+            self.assertEqual(repr(parser.parse(tokens)), repr(Parser(lr=False).parse(tokens)))
+            self.assertEqual(parser.last_path, path)
+        self.assertEqual((parser.lr_parses, parser.earley_parses), (2, 1))
+        self.assertGreater(parser.lr_table.conflicts, 0)
+
+    def assertParse(self, parser, tokens, path):
+        self.assertEqual(repr(parser.parse(tokens)), repr(Parser(lr=False).parse(tokens)))
+        self.assertEqual(parser.last_path, path)
+
+    def test_grammar_change(self):
+        parser = Parser()
+        self.assertParse(parser, call_tokens(1, 0), 'lr')
+        self.assertParse(parser, call_tokens(1, 0), 'lr')
+        self.assertEqual(parser.lr_table_builds, 1)
+        # Inputs which need new rules skip the table until enough
+        # of them are collected, others still use it
+        for args_pos in range(2, LR_REBUILD_INPUTS + 1):
+            self.assertParse(parser, call_tokens(args_pos, 0), 'earley')
+            self.assertParse(parser, call_tokens(1, 0), 'lr')
+        self.assertEqual((parser.lr_table_builds, parser.lr_table_skips), (1, LR_REBUILD_INPUTS - 1))
+        self.assertParse(parser, call_tokens(LR_REBUILD_INPUTS + 1, 0), 'lr')
+        self.assertEqual(parser.lr_table_builds, 2)
+        # Rules of skipped inputs are in the new table
+        for args_pos in range(2, LR_REBUILD_INPUTS + 1):
+            self.assertParse(parser, call_tokens(args_pos, 0), 'lr')
+        self.assertEqual((parser.lr_table_builds, parser.lr_table_skips), (2, LR_REBUILD_INPUTS - 1))
+
+    def test_nullable(self):
+        with self.assertRaises(ValueError):
+            LRTable([('stmts', ('stmt',)), ('stmt', ())], 'stmts')
@@ -0,0 +1,48 @@
+from unittest import TestCase, mock
+
+from uncompyle3.memo import CodeMemo, fingerprint
+from uncompyle3.tests.assembler import assemble_assignments
+from uncompyle3.uncompyle import Uncompyle
+
+
+class TestMemo(TestCase):
+
+    def test_fingerprint(self):
+        source = 'def f(a):\n    return a + 1\n'
+        # Position of the same body in another file doesn't matter
+        self.assertEqual(
+            fingerprint(compile(source, 'a.py', 'exec').co_consts[0]),
+            fingerprint(compile('\n\n' + source, 'b.py', 'exec').co_consts[0]))
+        self.assertNotEqual(fingerprint(compile('x = 1', 'a.py', 'exec')), fingerprint(compile('x = 1.0', 'a.py', 'exec')))
+        self.assertNotEqual(fingerprint(compile('x = 1', 'a.py', 'exec')), fingerprint(compile('x = True', 'a.py', 'exec')))
+        # Difference in nested code objects
+        self.assertNotEqual(
+            fingerprint(compile('def f():\n    return 1\n', 'a.py', 'exec')),
+            fingerprint(compile('def f():\n    return 2\n', 'a.py', 'exec')))
+
+    def test_eviction(self):
+        memo = CodeMemo(2)
+        memo.put(b'a', 'a')
+        memo.put(b'b', 'b')
+        self.assertEqual(memo.get(b'a'), 'a')
+        memo.put(b'c', 'c')
+        self.assertIsNone(memo.get(b'b'))
+        self.assertEqual(memo.get(b'a'), 'a')
+        self.assertEqual(memo.stats(), (2, 1, 2))
+
+    def test_hit(self):
+        file_bytes, source = assemble_assignments(10)
+        uncompyle = Uncompyle()
+        self.assertEqual(uncompyle.run(file_bytes), source + '\n')
+        # Same code in another file
+        changed = file_bytes[:4] + b'\xff' * 4 + file_bytes[8:]
+        with mock.patch.object(uncompyle, 'parse_code') as parse_code:
+            self.assertEqual(uncompyle.run(changed), source + '\n')
+        parse_code.assert_not_called()
+        self.assertEqual(uncompyle.memo_stats(), (1, 1, 1))
+        other_bytes, other_source = assemble_assignments(11)
+        self.assertEqual(uncompyle.run(other_bytes), other_source + '\n')
+        self.assertEqual(uncompyle.memo_stats(), (1, 2, 2))
+
+    def test_disabled(self):
+        self.assertIsNone(Uncompyle(code_memo_size=0).memo_stats())
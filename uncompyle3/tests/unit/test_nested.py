@@ -0,0 +1,103 @@
+import gc
+from unittest import TestCase
+
+from uncompyle3.tests.assembler import assemble, assemble_code
+from uncompyle3.uncompyle import Uncompyle
+
+
+# Flags of function code objects
+CO_FUNCTION = 0x43
+CO_VARARGS = 0x04
+CO_VARKEYWORDS = 0x08
+# Flags of module and class body code objects
+CO_NOFREE = 0x40
+
+
+def function_code(name, line, argnames):
+    """
+    Compose code object of function which returns sum of its
+    arguments.
+    """
+    instructions = [(line + 1, 'LOAD_FAST', 0)]
+    for i in range(1, len(argnames)):
+        instructions.extend(((line + 1, 'LOAD_FAST', i), (line + 1, 'BINARY_ADD', None)))
+    instructions.append((line + 1, 'RETURN_VALUE', None))
+    return assemble_code(
+        instructions, consts=[None], varnames=argnames, argcount=len(argnames), flags=CO_FUNCTION, name=name)
+
+
+class TestNested(TestCase):
+
+    def test_function(self):
+        # def add(a, b=1, *args, c, d=2, **kw):
+        #     'doc'
+        #     x = a + b
+        #     return x
+        add = assemble_code([
+            (3, 'LOAD_FAST', 0), (3, 'LOAD_FAST', 1), (3, 'BINARY_ADD', None), (3, 'STORE_FAST', 6),
+            (4, 'LOAD_FAST', 6), (4, 'RETURN_VALUE', None)],
+            consts=['doc'], varnames=['a', 'b', 'c', 'd', 'args', 'kw', 'x'], argcount=2, kwonlyargcount=2,
+            flags=CO_FUNCTION | CO_VARARGS | CO_VARKEYWORDS, name='add')
+        file_bytes = assemble([
+            (1, 'LOAD_CONST', 0), (1, 'LOAD_CONST', 1), (1, 'LOAD_CONST', 2), (1, 'LOAD_CONST', 3),
+            (1, 'LOAD_CONST', 4), (1, 'MAKE_FUNCTION', 0x0101), (1, 'STORE_NAME', 0),
+            (1, 'LOAD_CONST', 5), (1, 'RETURN_VALUE', None)],
+            consts=[1, 'd', 2, add, 'add', None], names=['add'])
+        expected = "def add(a, b=1, *args, c, d=2, **kw):\n    'doc'\n    x = a + b\n    return x\n"
+        self.assertEqual(Uncompyle().run(file_bytes), expected)
+
+    def test_class(self):
+        # class Foo(Base):
+        #     y = 1
+        #     def method(self):
+        #         pass
+        method = assemble_code(
+            [(4, 'LOAD_CONST', 0), (4, 'RETURN_VALUE', None)], consts=[None], varnames=['self'], argcount=1,
+            flags=CO_FUNCTION, name='method')
+        body = assemble_code([
+            (1, 'LOAD_NAME', 0), (1, 'STORE_NAME', 1), (1, 'LOAD_CONST', 0), (1, 'STORE_NAME', 2),
+            (2, 'LOAD_CONST', 1), (2, 'STORE_NAME', 3),
+            (3, 'LOAD_CONST', 2), (3, 'LOAD_CONST', 3), (3, 'MAKE_FUNCTION', 0), (3, 'STORE_NAME', 4),
+            (3, 'LOAD_CONST', 4), (3, 'RETURN_VALUE', None)],
+            consts=['Foo', 1, method, 'Foo.method', None], names=['__name__', '__module__', '__qualname__', 'y', 'method'],
+            flags=CO_NOFREE, name='Foo')
+        file_bytes = assemble([
+            (1, 'LOAD_BUILD_CLASS', None), (1, 'LOAD_CONST', 0), (1, 'LOAD_CONST', 1), (1, 'MAKE_FUNCTION', 0),
+            (1, 'LOAD_CONST', 1), (1, 'LOAD_NAME', 0), (1, 'CALL_FUNCTION', 3), (1, 'STORE_NAME', 1),
+            (1, 'LOAD_CONST', 2), (1, 'RETURN_VALUE', None)],
+            consts=[body, 'Foo', None], names=['Base', 'Foo'])
+        expected = 'class Foo(Base):\n    y = 1\n    def method(self):\n        pass\n'
+        self.assertEqual(Uncompyle().run(file_bytes), expected)
+
+    def test_parallel(self):
+        amount = 40
+        instructions = []
+        consts = []
+        names = []
+        lines = []
+        for i in range(amount):
+            argnames = ['a{}'.format(j) for j in range(i % 4 + 1)]
+            consts.extend((function_code('f{}'.format(i), i * 2 + 1, argnames), 'f{}'.format(i)))
+            names.append('f{}'.format(i))
+            line = i * 2 + 1
+            instructions.extend((
+                (line, 'LOAD_CONST', 2 * i), (line, 'LOAD_CONST', 2 * i + 1),
+                (line, 'MAKE_FUNCTION', 0), (line, 'STORE_NAME', i)))
+            lines.append('def f{}({}):\n    return {}\n'.format(i, ', '.join(argnames), ' + '.join(argnames)))
+        consts.append(None)
+        instructions.extend(((line, 'LOAD_CONST', 2 * amount), (line, 'RETURN_VALUE', None)))
+        file_bytes = assemble(instructions, consts=consts, names=names)
+        expected = ''.join(lines)
+        self.assertEqual(Uncompyle(nested_workers=1).run(file_bytes), expected)
+        with Uncompyle(nested_workers=2, nested_parallel=8) as uncompyle:
+            self.assertEqual(uncompyle.run(file_bytes), expected)
+            self.assertIsNotNone(uncompyle._pool)
+        # Workers are stopped on leaving the block
+        self.assertIsNone(uncompyle._pool)
+        # And when instance which wasn't closed is collected
+        uncompyle = Uncompyle(nested_workers=2, nested_parallel=8)
+        self.assertEqual(uncompyle.run(file_bytes), expected)
+        pool = uncompyle._pool
+        del uncompyle
+        gc.collect()
+        self.assertRaises(RuntimeError, pool.submit, int)
@@ -0,0 +1,121 @@
+import random
+from bisect import bisect_left
+from unittest import TestCase
+
+from uncompyle3.scanner import dis
+from uncompyle3.scanner.scanner import Scanner
+from uncompyle3.tests.assembler import assemble_jumps, nested_ifs
+
+
+JUMP_FORWARD = dis.opmap['JUMP_FORWARD']
+JUMP_ABSOLUTE = dis.opmap['JUMP_ABSOLUTE']
+COND_JUMPS = (dis.opmap['POP_JUMP_IF_FALSE'], dis.opmap['POP_JUMP_IF_TRUE'])
+
+
+def find_new_ifs(scanner):
+    # Scan of all ops up to target of each conditional jump, which
+    # scanner used before precomputed tables
+    new_ifs = {}
+    offsets = scanner.op_offsets
+    opcodes = scanner.op_codes
+    targets = scanner.op_targets
+    for i, offset in enumerate(offsets):
+        if opcodes[i] not in COND_JUMPS:
+            continue
+        target = targets[i]
+        if scanner.lines[offset][0] == scanner.lines[target][0]:
+            continue
+        stop = False
+        for j in range(i, bisect_left(offsets, target, i)):
+            if opcodes[j] == JUMP_FORWARD:
+                if scanner.lines[targets[j]][0] != scanner.lines[offsets[j]][0]:
+                    stop = True
+                    break
+            elif opcodes[j] == JUMP_ABSOLUTE:
+                if targets[j] < offset:
+                    stop = True
+                    break
+        if not stop:
+            new_ifs[offset] = target
+    return new_ifs
+
+
+class CountingSequence:
+    """
+    Read-only view of scanner column, which counts item reads.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.reads = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return self.data[index]
+
+
+class TestNewIfs(TestCase):
+
+    def scan(self, co):
+        scanner = Scanner()
+        scanner.tokenize(co)
+        return scanner
+
+    def test_equivalence(self):
+        rng = random.Random(5)
+        ops = ('LOAD_NAME', 'STORE_NAME', 'POP_JUMP_IF_FALSE', 'POP_JUMP_IF_TRUE', 'JUMP_FORWARD', 'JUMP_ABSOLUTE')
+        for _ in range(300):
+            length = rng.randint(1, 40)
+            instructions = []
+            line = 1
+            for idx in range(length):
+                if rng.random() < 0.4:
+                    line += 1
+                opname = rng.choice(ops)
+                if opname == 'JUMP_FORWARD':
+                    arg = rng.randint(idx + 1, length)
+                elif opname in ('POP_JUMP_IF_FALSE', 'POP_JUMP_IF_TRUE', 'JUMP_ABSOLUTE'):
+                    arg = rng.randint(0, length)
+                else:
+                    arg = 0
+                instructions.append((line, opname, arg))
+            instructions.append((line + 1, 'LOAD_CONST', 0))
+            instructions.append((line + 1, 'RETURN_VALUE', None))
+            scanner = Scanner()
+            scanner.code = assemble_jumps(instructions).co_code
+            scanner.decode()
+            scanner.build_lines_data(assemble_jumps(instructions))
+            scanner.find_new_ifs()
+            self.assertEqual(list(scanner.new_ifs.items()), list(find_new_ifs(scanner).items()))
+
+    def test_nested(self):
+        scanner = self.scan(nested_ifs(5, 3))
+        cond_jumps = scanner.all_instr(0, len(scanner.code), COND_JUMPS)
+        self.assertEqual(len(cond_jumps), 5)
+        end = len(scanner.code) - 4
+        self.assertEqual(scanner.new_ifs, {offset: end for offset in cond_jumps})
+
+    def test_scaling(self):
+        # Each if spans all ifs nested in it, thus rescanning if bodies
+        # makes amount of column reads grow with square of depth
+        def count_reads(depth):
+            co = nested_ifs(depth, 20)
+            scanner = Scanner()
+            scanner.code = co.co_code
+            scanner.decode()
+            scanner.build_lines_data(co)
+            columns = []
+            for name in ('op_offsets', 'op_codes', 'op_targets', 'op_index', 'lines'):
+                column = CountingSequence(getattr(scanner, name))
+                setattr(scanner, name, column)
+                columns.append(column)
+            scanner.find_new_ifs()
+            self.assertEqual(len(scanner.new_ifs), depth)
+            return sum(column.reads for column in columns)
+        small = count_reads(100)
+        large = count_reads(1600)
+        # 16 times more ops; would be 256 times more reads if quadratic
+        self.assertLessEqual(large, small * 16)
@@ -0,0 +1,34 @@
+from unittest import TestCase
+
+from uncompyle3.parser.astnode import ASTNode
+from uncompyle3.parser.parser import Parser
+from uncompyle3.scanner.token import Token
+from uncompyle3.tests.benchmark import find_corpus, load_tokens
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+from uncompyle3.walker.walker import Walker
+
+
+class TestRenderer(TestCase):
+
+    def assertSameSource(self, ast):
+        self.assertEqual(Walker().gen_source(ast), Walker(compiled=False).gen_source(ast))
+
+    def test_corpus(self):
+        parser = Parser()
+        for path in find_corpus(res_path):
+            self.assertSameSource(parser.parse(load_tokens(path)))
+
+    def test_irregular(self):
+        # Body with several statements leaves more than one item on
+        # data stack, compiled entries have to treat it the same way
+        def name(value):
+            return ASTNode('expr', [Token('LOAD_NAME', 0, value, offset=0)])
+
+        def assign(value, target):
+            designator = ASTNode('designator', [Token('STORE_NAME', 0, target, offset=0)])
+            return ASTNode('stmt', [ASTNode('assign', [name(value), designator])])
+
+        body = ASTNode('stmts', [ASTNode('stmts', [assign('a', 'b')]), assign('c', 'd')])
+        test = ASTNode('testexpr', [ASTNode('testfalse', [name('e'), Token('POP_JUMP_IF_FALSE', offset=0)])])
+        ifstmt = ASTNode('ifstmt', [test, body, Token('JUMP_FORWARD', offset=0), Token('COME_FROM', offset=0)])
+        self.assertSameSource(ASTNode('stmts', [ASTNode('stmt', [ifstmt])]))
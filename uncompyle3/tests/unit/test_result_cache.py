@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase, mock
+
+from uncompyle3.cache import RESCAN_INTERVAL, ResultCache
+from uncompyle3.tests.assembler import assemble_assignments
+from uncompyle3.uncompyle import Uncompyle
+
+
+class TestResultCache(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_hit(self):
+        file_bytes, source = assemble_assignments(10)
+        self.assertEqual(Uncompyle(result_cache=self.cache_dir).run(file_bytes), source + '\n')
+        uncompyle = Uncompyle(result_cache=self.cache_dir)
+        with mock.patch.object(uncompyle, 'parse_code') as parse:
+            self.assertEqual(uncompyle.run(file_bytes), source + '\n')
+        parse.assert_not_called()
+
+    def test_header_ignored(self):
+        file_bytes, source = assemble_assignments(10)
+        Uncompyle(result_cache=self.cache_dir).run(file_bytes)
+        # Different timestamp in header, same code
+        changed = file_bytes[:4] + b'\xff' * 4 + file_bytes[8:]
+        uncompyle = Uncompyle(result_cache=self.cache_dir)
+        with mock.patch.object(uncompyle, 'parse_code') as parse:
+            self.assertEqual(uncompyle.run(changed), source + '\n')
+        parse.assert_not_called()
+
+    def test_version(self):
+        cache = ResultCache(self.cache_dir, 'a')
+        cache.store(cache.key(b'code'), 'x = 1\n')
+        self.assertEqual(cache.load(cache.key(b'code')), 'x = 1\n')
+        other = ResultCache(self.cache_dir, 'b')
+        self.assertIsNone(other.load(other.key(b'code')))
+
+    def test_source_version(self):
+        cache = ResultCache(self.cache_dir, 'a')
+        cache.store(cache.key(b'code'), 'x = 1\n')
+        # Changed decompiler code doesn't get sources of old one
+        with mock.patch('uncompyle3.cache._source_digest', b'changed'):
+            other = ResultCache(self.cache_dir, 'a')
+        self.assertIsNone(other.load(other.key(b'code')))
+
+    def test_overwrite(self):
+        cache = ResultCache(self.cache_dir, 'a')
+        key = cache.key(b'code')
+        cache.store(key, 'x' * 100)
+        cache.store(key, 'x' * 100)
+        cache.store(key, 'x' * 50)
+        self.assertEqual(cache.size, 50)
+
+    def test_shared_size(self):
+        # Each cache sees entries of the others after a while, so
+        # together they can't go over the limit by much
+        caches = [ResultCache(self.cache_dir, 'a', max_size=60000) for _ in range(4)]
+        peak = 0
+        for i in range(800):
+            for cache in caches:
+                cache.store(cache.key('{}-{}'.format(id(cache), i).encode('ascii')), 'x' * 100)
+            if i % 20 == 0:
+                peak = max(peak, caches[0].scan()[1])
+        self.assertLessEqual(peak, 60000 + len(caches) * RESCAN_INTERVAL * 100)
+
+    def test_eviction(self):
+        cache = ResultCache(self.cache_dir, 'a', max_size=1000)
+        keys = [cache.key(str(i).encode('ascii')) for i in range(30)]
+        for i, key in enumerate(keys):
+            cache.store(key, 'x' * 100)
+            # Make order of use unambiguous regardless of timer resolution
+            os.utime(cache.get_file_path(key), (i, i))
+            # Reading entry marks it as recently used
+            cache.load(keys[0])
+        self.assertLessEqual(cache.scan()[1], 1000)
+        self.assertIsNotNone(cache.load(keys[0]))
+        self.assertIsNotNone(cache.load(keys[-1]))
+        self.assertIsNone(cache.load(keys[1]))
+
+    def test_concurrent_delete(self):
+        cache = ResultCache(self.cache_dir, 'a', max_size=1000)
+        other = ResultCache(self.cache_dir, 'a', max_size=1000)
+        keys = [cache.key(str(i).encode('ascii')) for i in range(30)]
+        for key in keys:
+            cache.store(key, 'x' * 100)
+            other.store(key, 'x' * 100)
+        # Another process clears the cache
+        for name in os.listdir(self.cache_dir):
+            shutil.rmtree(os.path.join(self.cache_dir, name))
+        self.assertIsNone(cache.load(keys[-1]))
+        cache.evict()
+        self.assertEqual(cache.size, 0)
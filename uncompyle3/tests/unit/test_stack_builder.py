@@ -0,0 +1,66 @@
+from unittest import TestCase
+
+from uncompyle3.parser.parser import Parser
+from uncompyle3.scanner.scanner import Scanner
+from uncompyle3.scanner.token import Token
+from uncompyle3.tests.assembler import assemble_assignments
+from uncompyle3.tests.benchmark import find_corpus
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+from uncompyle3.tests.unit.test_grammar_extension import call_tokens
+from uncompyle3.uncompyle import Uncompyle
+
+
+class TestStackBuilder(TestCase):
+
+    def test_corpus(self):
+        # Each statement which builder handles has to get the same tree
+        # as it gets from parser
+        built = 0
+        for path in find_corpus(res_path):
+            scanner = Scanner()
+            infile = open(path, 'rb')
+            tokens = scanner.run(infile.read()[12:])
+            infile.close()
+            del tokens[-2:]
+            for chunk in scanner.split_statements(tokens, 1):
+                parser = Parser(lr=False)
+                statements = parser.stack_builder.build(chunk)
+                if statements is None:
+                    continue
+                built += 1
+                self.assertEqual(repr(statements), repr(parser.get_statements(parser.parse(chunk))), path)
+        self.assertGreater(built, 0)
+
+    def test_unsupported(self):
+        builder = Parser().stack_builder
+        self.assertIsNone(builder.build([]))
+        # Dangling expression
+        self.assertIsNone(builder.build(call_tokens(1, 0)[:-1]))
+        # Jumps are left to parser
+        tokens = [Token('LOAD_NAME', 0, 'a', offset=0), Token('POP_JUMP_IF_FALSE', 9, '9', offset=3),
+                  Token('LOAD_CONST', 0, '1', offset=6), Token('STORE_NAME', 0, 'b', offset=9),
+                  Token('COME_FROM', None, '3', offset='12_0')]
+        self.assertIsNone(builder.build(tokens))
+        # Keyword argument name must be constant
+        tokens = call_tokens(0, 1)
+        tokens[1] = Token('LOAD_NAME', 0, 'name', offset=0)
+        self.assertIsNone(builder.build(tokens))
+
+    def test_flat_module(self):
+        bytecode, expected = assemble_assignments(1000)
+        uncompyle = Uncompyle()
+        self.assertEqual(uncompyle.run(bytecode).rstrip('\n'), expected)
+        self.assertEqual(uncompyle._parser.stack_builds, 1000)
+        self.assertEqual(uncompyle._parser.lr_parses + uncompyle._parser.earley_parses, 0)
+
+    def test_chunk_size(self):
+        bytecode, expected = assemble_assignments(1000)
+        # Explicit chunk size is kept with stack builder enabled
+        uncompyle = Uncompyle(chunk_size=100)
+        self.assertEqual(uncompyle.run(bytecode).rstrip('\n'), expected)
+        self.assertEqual(uncompyle._parser.stack_builds, 20)
+        # Without stack builder and chunk size module is parsed at once
+        uncompyle = Uncompyle(stack_builder=False)
+        self.assertEqual(uncompyle.run(bytecode).rstrip('\n'), expected)
+        self.assertEqual(uncompyle._parser.stack_builds, 0)
+        self.assertEqual(uncompyle._parser.lr_parses + uncompyle._parser.earley_parses, 1)
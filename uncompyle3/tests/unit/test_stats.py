@@ -0,0 +1,60 @@
+import os
+from unittest import TestCase
+
+from uncompyle3.scanner.scanner import PHASES
+from uncompyle3.tests.assembler import assemble_assignments
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+from uncompyle3.uncompyle import Uncompyle
+
+
+class TestStats(TestCase):
+
+    def read(self, path):
+        infile = open(os.path.join(res_path, path), 'rb')
+        file_bytes = infile.read()
+        infile.close()
+        return file_bytes
+
+    def test_record(self):
+        file_bytes = self.read('looping/while.cpython-35.pyc')
+        uncompyle = Uncompyle(code_memo_size=0)
+        source, stats = uncompyle.run(file_bytes, with_stats=True)
+        self.assertEqual(source, uncompyle.run(file_bytes))
+        self.assertEqual(stats.bytes_read, len(file_bytes))
+        self.assertEqual(stats.source_length, len(source))
+        self.assertEqual(stats.code_objects, 1)
+        self.assertGreater(stats.tokens, 0)
+        self.assertGreater(stats.ast_nodes, stats.tokens)
+        self.assertEqual(sorted(stats.scanner_times), sorted(PHASES))
+        self.assertGreater(stats.walker_time, 0)
+        self.assertGreaterEqual(stats.total_time, stats.parser_time + stats.walker_time)
+        self.assertIsNone(stats.memo_hit)
+        # Loop can't be built without parser
+        self.assertEqual(stats.earley_parses + stats.lr_parses, 1)
+        if stats.earley_parses:
+            self.assertGreater(stats.earley_items, stats.earley_sets)
+        data = stats.as_dict()
+        self.assertIn('scanner_time_find_jump_targets', data)
+        self.assertEqual(data['tokens'], stats.tokens)
+
+    def test_hook(self):
+        records = []
+        uncompyle = Uncompyle(stats_hook=records.append)
+        file_bytes, source = assemble_assignments(5)
+        self.assertEqual(uncompyle.run(file_bytes), source + '\n')
+        uncompyle.run(file_bytes)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0].stack_builds, 5)
+        self.assertFalse(records[0].memo_hit)
+        self.assertTrue(records[1].memo_hit)
+        self.assertEqual(records[1].tokens, 0)
+
+    def test_earley(self):
+        file_bytes = self.read('operation_logic/complex1.cpython-35.pyc')
+        uncompyle = Uncompyle()
+        uncompyle._parser.lr = False
+        source, stats = uncompyle.run(file_bytes, with_stats=True)
+        self.assertGreaterEqual(stats.earley_parses, 1)
+        self.assertGreater(stats.earley_sets, 0)
+        self.assertGreater(stats.earley_items, stats.earley_sets)
+        self.assertGreater(stats.earley_links, 0)
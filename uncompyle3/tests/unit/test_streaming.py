@@ -0,0 +1,43 @@
+import io
+from unittest import TestCase
+
+from uncompyle3.parser.parser import Parser
+from uncompyle3.tests.assembler import assemble, assemble_assignments
+from uncompyle3.tests.benchmark import find_corpus, load_tokens
+from uncompyle3.tests.blackbox.blackboxtestcase import res_path
+from uncompyle3.uncompyle import Uncompyle
+from uncompyle3.walker.walker import Walker
+
+
+class TestStreaming(TestCase):
+
+    def test_corpus(self):
+        parser = Parser()
+        for path in find_corpus(res_path):
+            ast = parser.parse(load_tokens(path))
+            source = Walker().gen_source(ast)
+            self.assertEqual(''.join(Walker().iter_source(ast)), source)
+            self.assertEqual(''.join(Walker(compiled=False).iter_source(ast)), source)
+            sink = io.StringIO()
+            Walker().write_source(ast, sink)
+            self.assertEqual(sink.getvalue(), source)
+
+    def test_statements(self):
+        # Each top-level statement comes out as separate piece
+        file_bytes, source = assemble_assignments(50)
+        pieces = list(Uncompyle().iter_run(file_bytes))
+        self.assertEqual(len(pieces), 50)
+        self.assertEqual(''.join(pieces), source + '\n')
+        sink = io.StringIO()
+        Uncompyle().write(file_bytes, sink)
+        self.assertEqual(sink.getvalue(), source + '\n')
+
+    def test_deep_expression(self):
+        # a = b - (b - (b - ...)) nests expressions to the right
+        depth = 300
+        instructions = [(1, 'LOAD_NAME', 1)] * depth
+        instructions += [(1, 'BINARY_SUBTRACT', None)] * (depth - 1)
+        instructions += [(1, 'STORE_NAME', 0), (1, 'LOAD_CONST', 0), (1, 'RETURN_VALUE', None)]
+        file_bytes = assemble(instructions, consts=[None], names=['a', 'b'])
+        expected = 'a = {}b - b{}\n'.format('b - (' * (depth - 2), ')' * (depth - 2))
+        self.assertEqual(Uncompyle().run(file_bytes), expected)
@@ -0,0 +1,24 @@
+import sys
+from unittest import TestCase
+
+from uncompyle3.tests.assembler import assemble_assignments
+from uncompyle3.uncompyle import Uncompyle
+
+
+class TestStress(TestCase):
+
+    def test_many_statements(self):
+        # Statement sequence makes tree as deep as there are statements,
+        # thus this many goes way beyond default recursion limit
+        amount = 100000
+        self.assertLess(sys.getrecursionlimit(), amount)
+        bytecode, expected = assemble_assignments(amount)
+        # Default path builds flat statements without parser; tree
+        # building and epsilon derivation of Earley parser have to be
+        # exercised on whole module to catch recursion
+        uncompyle = Uncompyle(stack_builder=False)
+        uncompyle._parser.lr = False
+        result = uncompyle.run(bytecode)
+        self.assertEqual(result.rstrip('\n'), expected)
+        self.assertEqual(uncompyle._parser.earley_parses, 1)
+        self.assertEqual(uncompyle._parser.stack_builds + uncompyle._parser.lr_parses, 0)
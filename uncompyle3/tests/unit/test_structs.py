@@ -0,0 +1,65 @@
+import random
+from unittest import TestCase
+
+from uncompyle3.scanner.structs import Struct, StructIndex
+
+
+def find_parent(structs, offset):
+    # Linear search which scanner used before the index
+    parent = structs[0]
+    start = parent.start
+    end = parent.end
+    for struct in structs:
+        if (struct.start <= offset < struct.end) and (struct.start >= start and struct.end <= end):
+            start = struct.start
+            end = struct.end
+            parent = struct
+    return parent
+
+
+class TestStructIndex(TestCase):
+
+    def check(self, rng, length, amount, nested):
+        root = Struct('root', 0, length - 1)
+        index = StructIndex(root)
+        structs = [root]
+        for offset in range(length):
+            self.assertIs(index.parent(offset), find_parent(structs, offset))
+            if rng.random() * length > amount:
+                continue
+            if nested:
+                # Structure within current parent, like scanner makes
+                parent = find_parent(structs, offset)
+                if parent.end <= offset + 1:
+                    continue
+                start = rng.randint(offset + 1, parent.end - 1)
+                end = rng.randint(start, parent.end)
+            else:
+                start = rng.randint(0, length - 1)
+                end = rng.randint(start, length - 1)
+            struct = Struct(rng.choice(('if-then', 'if-else', 'and/or')), start, end)
+            index.append(struct)
+            structs.append(struct)
+        self.assertEqual(list(index), structs)
+
+    def test_nested(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            self.check(rng, rng.randint(1, 200), rng.randint(1, 60), True)
+
+    def test_overlapping(self):
+        rng = random.Random(11)
+        for _ in range(50):
+            self.check(rng, rng.randint(1, 200), rng.randint(1, 60), False)
+
+    def test_same_bounds(self):
+        # The latest of structures with the same bounds is the parent
+        root = Struct('root', 0, 20)
+        index = StructIndex(root)
+        first = Struct('if-then', 5, 10)
+        second = Struct('and/or', 5, 10)
+        index.append(first)
+        index.append(second)
+        self.assertIs(index.parent(4), root)
+        self.assertIs(index.parent(5), second)
+        self.assertIs(index.parent(10), root)
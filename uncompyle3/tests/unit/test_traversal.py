@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from uncompyle3.parser.astnode import ASTNode
+from uncompyle3.utils.spark import GenericASTTraversal
+
+
+class RecordingTraversal(GenericASTTraversal):
+
+    def __init__(self, ast):
+        GenericASTTraversal.__init__(self, ast)
+        self.visited = []
+
+    def n_pruned(self, node):
+        self.visited.append('pruned')
+        return self.PRUNE
+
+    def n_raising(self, node):
+        self.visited.append('raising')
+        self.prune()
+
+    def n_exited_exit(self, node):
+        self.visited.append('exit')
+
+    def default(self, node):
+        self.visited.append(node.type)
+
+
+class TestTraversal(TestCase):
+
+    ast = ASTNode('root', [
+        ASTNode('pruned', [ASTNode('skipped')]),
+        ASTNode('raising', [ASTNode('skipped')]),
+        ASTNode('exited', [ASTNode('leaf')]),
+        ASTNode('exited')
+    ])
+
+    def test_preorder(self):
+        traversal = RecordingTraversal(self.ast)
+        traversal.preorder()
+        self.assertEqual(traversal.visited, ['root', 'pruned', 'raising', 'exited', 'leaf', 'exit', 'exited', 'exit'])
+        # Each node type is resolved once
+        self.assertEqual(sorted(traversal.handlers), ['exited', 'leaf', 'pruned', 'raising', 'root'])
+
+    def test_postorder(self):
+        # Pruning makes no sense for postorder traversal, value
+        # returned by handlers is ignored
+        ast = ASTNode('root', [ASTNode('pruned', [ASTNode('leaf')]), ASTNode('exited')])
+        traversal = RecordingTraversal(ast)
+        traversal.postorder()
+        self.assertEqual(traversal.visited, ['leaf', 'pruned', 'exited', 'root'])
@@ -1,40 +1,399 @@
+import marshal
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from types import CodeType
+
+from .batch import decompile_body_task, run_batch
+from .cache import DEFAULT_MAX_SIZE, ResultCache
+from .memo import CodeMemo, fingerprint
 from .scanner.scanner import Scanner
+from .stats import PARSER_COUNTERS, Stats, count_nodes
 from .scanner.token import Token
 from .parser.parser import Parser
-from .walker.walker import Walker
-from .utils.debug import debug
+from .walker.containers import CodeBody
+from .walker.walker import TABLE_DIRECT, Walker
+from .utils.debug import debug, debug_enabled
+
+
+# Code object flags
+CO_NEWLOCALS = 0x02
+CO_VARARGS = 0x04
+CO_VARKEYWORDS = 0x08
+
+
+def is_nested(const):
+    """
+    Check if constant is code object of function or class body
+    which is decompiled into source. Comprehensions, lambdas and
+    generator expressions are left as their repr().
+    """
+    return isinstance(const, CodeType) and not const.co_name.startswith('<')
 
 
 class Uncompyle:
 
-    def __init__(self):
+    def __init__(self, grammar_cache=None, chunk_size=None, stack_builder=True, result_cache=None,
+                 result_cache_size=DEFAULT_MAX_SIZE, code_memo_size=1024, nested_workers=None, nested_parallel=64,
+                 stats_hook=None):
+        # Batch workers create their own instances with the same options
+        self._options = {'grammar_cache': grammar_cache, 'chunk_size': chunk_size, 'stack_builder': stack_builder,
+                         'result_cache': result_cache, 'result_cache_size': result_cache_size,
+                         'code_memo_size': code_memo_size, 'nested_workers': nested_workers,
+                         'nested_parallel': nested_parallel}
+        # When chunk size is specified, top-level statements are
+        # parsed in groups of roughly this amount of tokens, rather
+        # than whole module at once. Explicit chunk size is always
+        # used as is
+        self._chunk_size = chunk_size
+        # Statements without jumps are built without parsing; this
+        # needs module to be split into chunks, thus when chunk size
+        # isn't specified, each chunk is single statement. Whole
+        # module is parsed at once only with stack builder disabled
+        if stack_builder and chunk_size is None:
+            self._chunk_size = 1
         self._scanner = Scanner()
-        self._parser = Parser()
+        self._parser = Parser(grammar_cache=grammar_cache, stack_builder=stack_builder)
         self._walker = Walker()
+        # Sources are cached for grammar defined before any input
+        # specific rules are added, and for walker table
+        self._result_cache = None
+        if result_cache is not None:
+            rules = sorted(rule for rulelist in self._parser.rules.values() for rule in rulelist)
+            table = sorted(TABLE_DIRECT.items())
+            self._result_cache = ResultCache(result_cache, (rules, table), max_size=result_cache_size)
+        # Sources of code objects seen before, so that code repeated
+        # across files is decompiled once
+        self._code_memo = CodeMemo(code_memo_size) if code_memo_size else None
+        # Nested code objects are decompiled in pool of this many
+        # processes (by default one per CPU), when there are at least
+        # <nested_parallel> of them at the same nesting level; workers
+        # need to build grammar, thus pool doesn't pay off for few
+        self._nested_workers = nested_workers if nested_workers is not None else os.cpu_count() or 1
+        self._nested_parallel = nested_parallel
+        self._pool = None
+        self._pool_finalizer = None
+        # Function called with Stats record after each decompiled file
+        self._stats_hook = stats_hook
+        # Record of file being decompiled, when stats are collected
+        self._stats = None
+
+    def close(self):
+        """
+        Stop worker processes used for nested code objects.
+        """
+        if self._pool is not None:
+            self._pool_finalizer()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def run(self, file_bytes, with_stats=False):
+        """
+        Decompile contents of bytecode file. When <with_stats> is set,
+        return source along with Stats record.
+        """
+        if not with_stats:
+            return ''.join(self.iter_run(file_bytes))
+        stats = Stats()
+        source = ''.join(self.iter_run(file_bytes, stats))
+        return source, stats
 
-    def run(self, file_bytes):
+    def memo_stats(self):
+        """
+        Get hit/miss statistics of code object memo, or None if
+        it is disabled.
+        """
+        if self._code_memo is None:
+            return None
+        return self._code_memo.stats()
+
+    def run_batch(self, source_dir, target_dir, workers=None, with_stats=False):
+        """
+        Decompile all bytecode files in <source_dir> tree into mirrored
+        tree of source files in <target_dir>, using pool of <workers>
+        processes. Generate FileResult for each file. Stats hook isn't
+        called for files decompiled in workers; when <with_stats> is
+        set, results carry flat dictionaries of their Stats records.
+        """
+        return run_batch(source_dir, target_dir, self._options, workers=workers, with_stats=with_stats)
+
+    def iter_run(self, file_bytes, stats=None):
+        """
+        Generate decompiled source piece by piece, each top-level
+        statement is yielded as soon as it is rendered. Source found
+        in result cache or code object memo is yielded as a whole.
+        When <stats> record is passed, or stats hook is set, record is
+        filled as source is generated.
+        """
+        if stats is None and self._stats_hook is not None:
+            stats = Stats()
+        if stats is None:
+            yield from self.iter_decompile(file_bytes)
+            return
+        scanner = self._scanner
+        parser = self._parser
+        scanner_times = dict(scanner.phase_times)
+        counters = [getattr(parser, name) for name in PARSER_COUNTERS]
+        # Time spent by consumer of pieces isn't counted
+        total_time = 0.0
+        self._stats = stats
+        try:
+            start = perf_counter()
+            for text in self.iter_decompile(file_bytes):
+                total_time += perf_counter() - start
+                stats.source_length += len(text)
+                yield text
+                start = perf_counter()
+            total_time += perf_counter() - start
+        finally:
+            self._stats = None
+        stats.bytes_read = len(file_bytes)
+        stats.total_time = total_time
+        for phase, seconds in scanner.phase_times.items():
+            stats.scanner_times[phase] = seconds - scanner_times[phase]
+        for name, value in zip(PARSER_COUNTERS, counters):
+            setattr(stats, name, getattr(parser, name) - value)
+        if self._stats_hook is not None:
+            self._stats_hook(stats)
+
+    def iter_decompile(self, file_bytes):
         ### File format check stage ###
         # python version magic = file_bytes[:4]
         # source file timestamp = file_bytes[4:8]
         # source file size = file_bytes[8:12]
         bytecode = file_bytes[12:]
 
+        cache = self._result_cache
+        if cache is not None:
+            key = cache.key(bytecode)
+            source = cache.load(key)
+            if self._stats is not None:
+                self._stats.result_cache_hit = source is not None
+            if source is not None:
+                yield source
+                return
+
+        code_object = self._scanner.load(bytecode)
+        memo = self._code_memo
+        if memo is not None:
+            code_key = ('module', fingerprint(code_object))
+            source = memo.get(code_key)
+            if self._stats is not None:
+                self._stats.memo_hit = source is not None
+            if source is not None:
+                if cache is not None:
+                    cache.store(key, source)
+                yield source
+                return
+
+        bodies = self.decompile_nested(code_object)
+        ast = self.parse_code(code_object)
+
+        ### Walker stage ###
+        debug('\n\n---Walker stage debug---')
+        stats = self._stats
+        if cache is None and memo is None and stats is None:
+            yield from self._walker.iter_source(ast, bodies)
+            return
+        pieces = []
+        walker_time = 0.0
+        start = perf_counter()
+        for text in self._walker.iter_source(ast, bodies):
+            walker_time += perf_counter() - start
+            pieces.append(text)
+            yield text
+            start = perf_counter()
+        walker_time += perf_counter() - start
+        if stats is not None:
+            stats.walker_time += walker_time
+        source = ''.join(pieces)
+        if memo is not None:
+            memo.put(code_key, source)
+        if cache is not None:
+            cache.store(key, source)
+
+    def write(self, file_bytes, sink):
+        """
+        Write decompiled source into file-like object <sink>.
+        """
+        for text in self.iter_run(file_bytes):
+            sink.write(text)
+
+    def parse(self, file_bytes):
+        return self.parse_code(self._scanner.load(file_bytes[12:]))
+
+    def parse_code(self, code_object):
+        tokens = self.tokenize(code_object)
+        if len(tokens) > 2 and tokens[-1] == Token(type_='RETURN_VALUE') and tokens[-2] == Token(type_='LOAD_CONST'):
+            del tokens[-2:]
+        return self.parse_tokens(tokens)
+
+    def tokenize(self, code_object):
         ### Scanner stage ###
-        tokens = self._scanner.run(bytecode)
-        debug('---Tokens debug output---\n#: offset linestart type attr pattr')
-        k = 1
-        for i in tokens:
-            debug('op {}:'.format(k), i.offset, i.linestart, i.type, i.attr, i.pattr)
-            k+=1
+        tokens = self._scanner.tokenize(code_object)
+        if self._stats is not None:
+            self._stats.code_objects += 1
+            self._stats.tokens += len(tokens)
+        if debug_enabled():
+            debug('---Tokens debug output---\n#: offset linestart type attr pattr')
+            k = 1
+            for i in tokens:
+                debug('op {}: {} {} {} {} {}', k, i.offset, i.linestart, i.type, i.attr, i.pattr)
+                k+=1
+        return tokens
 
+    def parse_tokens(self, tokens):
+        """
+        Parse <tokens> of code object which was tokenized last.
+        """
         ### Parser stage ###
         debug('\n\n---Parser stage debug---')
-        if len(tokens) > 2 and tokens[-1] == Token(type_='RETURN_VALUE') and tokens[-2] == Token(type_='LOAD_CONST'):
-            del tokens[-2:]
+        start = perf_counter()
+        if self._chunk_size is None:
+            ast = self._parser.parse(tokens)
+        else:
+            chunks = self._scanner.split_statements(tokens, self._chunk_size)
+            ast = self._parser.parse_chunks(chunks)
+        if self._stats is not None:
+            self._stats.parser_time += perf_counter() - start
+            self._stats.ast_nodes += count_nodes(ast)
+        debug('{}', ast)
+        return ast
 
-        ast = self._parser.parse(tokens)
-        debug(ast)
+    def decompile_nested(self, code_object):
+        """
+        Decompile all functions and classes nested in <code_object>.
+        Code objects are processed level by level, starting from the
+        deepest one, as each of them needs sources of its own nested
+        code objects; within level they are independent, and are
+        decompiled in parallel.
 
-        ### Walker stage ###
-        debug('\n\n---Walker stage debug---')
-        return self._walker.gen_source(ast)
+        Return mapping of indices of constants of <code_object> to
+        their CodeBody.
+        """
+        levels = []
+        level = [code_object]
+        while True:
+            level = [const for parent in level for const in parent.co_consts if is_nested(const)]
+            if not level:
+                break
+            levels.append(level)
+        # Bodies of already decompiled code objects, by id(); all of
+        # them are alive as long as <code_object> is
+        done = {}
+        for level in reversed(levels):
+            tasks = [(nested, self.get_bodies(nested, done)) for nested in level]
+            for nested, body in zip(level, self.decompile_level(tasks)):
+                done[id(nested)] = body
+        return self.get_bodies(code_object, done)
+
+    def get_bodies(self, code_object, done):
+        bodies = {}
+        for index, const in enumerate(code_object.co_consts):
+            if is_nested(const):
+                bodies[index] = done[id(const)]
+        return bodies
+
+    def decompile_level(self, tasks):
+        """
+        Decompile code objects of one nesting level; <tasks> contains
+        code objects along with bodies of their nested code objects.
+
+        Return list of CodeBody.
+        """
+        memo = self._code_memo
+        results = [None] * len(tasks)
+        misses = []
+        for i, (nested, bodies) in enumerate(tasks):
+            if memo is not None:
+                # Fingerprint covers nested code objects as well, thus
+                # stored body is valid regardless of where code is
+                body = memo.get(('body', fingerprint(nested)))
+                if body is not None:
+                    results[i] = body
+                    continue
+            misses.append(i)
+        if len(misses) >= self._nested_parallel and self._nested_workers > 1:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self._nested_workers)
+                # Instances which are dropped without being closed
+                # should not keep idle workers until interpreter exit
+                self._pool_finalizer = weakref.finalize(self, self._pool.shutdown)
+            # Pool workers must not start pools of their own
+            options = dict(self._options, nested_workers=1)
+            jobs = [(options, marshal.dumps(tasks[i][0]), tasks[i][1]) for i in misses]
+            chunksize = max(1, len(jobs) // (self._nested_workers * 4))
+            bodies = list(self._pool.map(decompile_body_task, jobs, chunksize=chunksize))
+        else:
+            bodies = [self.decompile_body(*tasks[i]) for i in misses]
+        for i, body in zip(misses, bodies):
+            results[i] = body
+            if memo is not None:
+                memo.put(('body', fingerprint(tasks[i][0])), body)
+        return results
+
+    def decompile_body(self, code_object, bodies):
+        """
+        Decompile function or class body <code_object>, with its own
+        nested code objects already decompiled into <bodies>.
+
+        Return CodeBody.
+        """
+        tokens = self.tokenize(code_object)
+        is_function = bool(code_object.co_flags & CO_NEWLOCALS)
+        docstring = None
+        if is_function:
+            # First constant of function is its docstring or None
+            if code_object.co_consts and isinstance(code_object.co_consts[0], str):
+                docstring = code_object.co_consts[0]
+        else:
+            # Class body starts with assignment of __module__ and
+            # __qualname__, followed by __doc__ if there's docstring
+            types = [token.type for token in tokens[:6]]
+            names = [token.pattr for token in tokens[:6]]
+            if types[:4] == ['LOAD_NAME', 'STORE_NAME', 'LOAD_CONST', 'STORE_NAME'] and \
+                    names[1] == '__module__' and names[3] == '__qualname__':
+                del tokens[:4]
+                if types[4:6] == ['LOAD_CONST', 'STORE_NAME'] and names[5] == '__doc__':
+                    docstring = code_object.co_consts[tokens[0].attr]
+                    del tokens[:2]
+        # Implicit return at the end of body; class bodies which
+        # use __class__ cell return it instead of None
+        if len(tokens) >= 2 and tokens[-1].type == 'RETURN_VALUE' and (
+                (tokens[-2].type == 'LOAD_CONST' and tokens[-2].pattr == 'None') or
+                (not is_function and tokens[-2].type == 'LOAD_CLOSURE')):
+            del tokens[-2:]
+        source = ''
+        if tokens:
+            ast = self.parse_tokens(tokens)
+            start = perf_counter()
+            source = self._walker.gen_source(ast, bodies)
+            if self._stats is not None:
+                self._stats.walker_time += perf_counter() - start
+        if docstring is not None:
+            source = '{!r}\n{}'.format(docstring, source)
+        if not source:
+            source = 'pass\n'
+        if not is_function:
+            return CodeBody(None, None, None, None, source)
+        names = code_object.co_varnames
+        argcount = code_object.co_argcount
+        kwonlycount = code_object.co_kwonlyargcount
+        # Local variables start with positional parameters, then go
+        # keyword-only ones, then names of * and ** parameters
+        positional = names[:argcount]
+        kwonly = names[argcount:argcount + kwonlycount]
+        i = argcount + kwonlycount
+        varargs = varkw = None
+        if code_object.co_flags & CO_VARARGS:
+            varargs = names[i]
+            i += 1
+        if code_object.co_flags & CO_VARKEYWORDS:
+            varkw = names[i]
+        return CodeBody(positional, varargs, kwonly, varkw, source)
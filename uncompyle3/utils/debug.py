@@ -1,20 +1,131 @@
-import os
+import logging
+import logging.handlers
+import multiprocessing
 import sys
 
 
-def get_log_path():
-    path = os.path.dirname(os.path.realpath(os.path.abspath(sys.argv[0])))
-    path = os.path.join(path, 'debug.log')
-    return path
+# Debug trace is disabled unless explicitly requested via
+# enable_debug(), or via configuration of standard logging; level
+# is left to application which embeds decompiler
+logger = logging.getLogger('uncompyle3')
+logger.addHandler(logging.NullHandler())
 
-f = open(get_log_path(), 'w')
-f.close()
+_handlers = []
+# Level logger had before enable_debug() was called
+_saved_level = None
+# Whether messages of this worker process are sent to parent
+_forwarding = False
 
 
+def debug_enabled():
+    """
+    Check if debug messages are going anywhere. Callers which do
+    significant work to compose message should check it first.
+    """
+    return logger.isEnabledFor(logging.DEBUG)
 
-def debug(*data):
-    line = ' '.join(str(i) for i in data) + '\n'
-    f = open(get_log_path(), 'a')
-    f.write(line)
-    f.close()
-    #print(line)
+
+def debug(message, *args):
+    """
+    Log debug message. When any <args> are passed, message is format
+    string for them, and it is formatted only if debug is enabled.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        if args:
+            message = message.format(*args)
+        logger.debug(message)
+
+
+def enable_debug(path=None, stream=None, capacity=4096):
+    """
+    Start writing debug trace into file at <path>, or into <stream>,
+    or into stderr if neither is given. Messages are buffered and
+    written in batches of <capacity> messages.
+    """
+    if path is not None:
+        target = logging.FileHandler(path, mode='w')
+    else:
+        target = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    target.setFormatter(logging.Formatter('%(message)s'))
+    global _saved_level
+    handler = logging.handlers.MemoryHandler(capacity, flushLevel=logging.ERROR, target=target)
+    logger.addHandler(handler)
+    if not _handlers:
+        _saved_level = logger.level
+    logger.setLevel(logging.DEBUG)
+    _handlers.append(handler)
+
+
+def disable_debug():
+    """
+    Flush buffered debug trace and stop writing it, restoring
+    level logger had before.
+    """
+    if not _handlers:
+        return
+    logger.setLevel(_saved_level)
+    while _handlers:
+        handler = _handlers.pop()
+        target = handler.target
+        logger.removeHandler(handler)
+        # Memory handler flushes buffer on close
+        handler.close()
+        target.close()
+
+
+class _Listener(logging.handlers.QueueListener):
+    # Records of workers go through the logger, as if they were
+    # logged in this process
+    def handle(self, record):
+        logger.handle(record)
+
+
+class WorkerDebug:
+    """
+    Context manager which collects debug messages of worker
+    processes and passes them to handlers of this process. Its
+    queue is to be given to forward_debug() in workers; it is None
+    when debug is disabled.
+    """
+
+    def __init__(self):
+        self.queue = None
+        self._manager = None
+        self._listener = None
+
+    def __enter__(self):
+        if debug_enabled():
+            # Queue of manager can be sent to workers along with tasks
+            self._manager = multiprocessing.Manager()
+            self.queue = self._manager.Queue()
+            self._listener = _Listener(self.queue)
+            self._listener.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._listener is not None:
+            # Listener handles all queued records before stopping
+            self._listener.stop()
+            self._manager.shutdown()
+            self._listener = None
+            self._manager = None
+            self.queue = None
+
+
+def forward_debug(queue):
+    """
+    Send debug messages of this worker process into <queue> of
+    WorkerDebug. Handlers inherited from parent process are
+    dropped: worker may exit without flushing them, and they
+    would write into the same file as parent otherwise.
+    """
+    global _forwarding
+    if queue is None or _forwarding:
+        return
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    del _handlers[:]
+    logger.addHandler(logging.handlers.QueueHandler(queue))
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    _forwarding = True
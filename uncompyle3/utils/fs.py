@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+
+def atomic_write(path, data):
+    """
+    Write <data> bytes into file at <path>. File is first written
+    under temporary name in the same directory and then renamed,
+    thus concurrent readers see either old or complete new file.
+    """
+    dirname = os.path.dirname(path)
+    os.makedirs(dirname, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
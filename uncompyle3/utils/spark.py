@@ -99,6 +99,38 @@ class _State:
         self.T, self.complete, self.items = [], [], items
         self.stateno = stateno
 
+#
+#  Per-state FIRST sets, computed on first access.
+#
+class _Firsts(dict):
+    def __init__(self, compute):
+        dict.__init__(self)
+        self.compute = compute
+
+    def __missing__(self, state):
+        rv = self[state] = self.compute(state)
+        return rv
+
+#
+#  Earley set.  Items are kept in order of addition, which allows to
+#  use the set as worklist while it's being filled, and are indexed
+#  for membership tests.  Items waiting for a nonterminal are indexed
+#  on demand, once the set is finished.
+#
+class _ItemSet(list):
+    def __init__(self, items=()):
+        list.__init__(self)
+        self.index, self.waiting = set(), {}
+        for item in items:
+            self.append(item)
+
+    def append(self, item):
+        self.index.add(item)
+        list.append(self, item)
+
+    def __contains__(self, item):
+        return item in self.index
+
 class GenericParser:
     #
     #  An Earley parser, as per J. Earley, "An Efficient Context-Free
@@ -118,6 +150,9 @@ class GenericParser:
         self.collectRules()
         self.augment(start)
         self.ruleschanged = 1
+        self.leo = 0
+        self.lookahead = 1
+        self.resetFirst()
 
     _NULLABLE = '\e_'
     _START = 'START'
@@ -130,35 +165,16 @@ class GenericParser:
     #
     def __getstate__(self):
         if self.ruleschanged:
-            #
-            #  XXX - duplicated from parse()
-            #
-            self.computeNull()
-            self.newrules = {}
-            self.new2old = {}
-            self.makeNewRules()
-            self.ruleschanged = 0
-            self.edges, self.cores = {}, {}
-            self.states = { 0: self.makeState0() }
-            self.makeState(0, self._BOF)
-        #
-        #  XXX - should find a better way to do this..
-        #
-        changes = 1
-        while changes:
-            changes = 0
-            for k, v in list(self.edges.items()):
-                if v is None:
-                    state, sym = k
-                    if state in self.states:
-                        self.goto(state, sym)
-                        changes = 1
+            self.makeStateMachine()
+        self.expandStateMachine()
         rv = self.__dict__.copy()
         for s in list(self.states.values()):
             del s.items
         del rv['rule2func']
         del rv['nullable']
         del rv['cores']
+        del rv['first']
+        del rv['firsts']
         return rv
 
     def __setstate__(self, D):
@@ -171,6 +187,128 @@ class GenericParser:
         D['rule2func'] = self.rule2func
         D['makeSet'] = self.makeSet_fast
         self.__dict__ = D
+        self.resetFirst()
+
+    #
+    #  Build initial state of the state machine; the rest of it
+    #  is generated lazily during parsing.
+    #
+    def makeStateMachine(self):
+        self.computeNull()
+        self.newrules = {}
+        self.new2old = {}
+        self.makeNewRules()
+        self.ruleschanged = 0
+        self.resetFirst()
+        self.edges, self.cores = {}, {}
+        self.states = { 0: self.makeState0() }
+        self.makeState(0, self._BOF)
+        #
+        #  Lazily generated state machine can't be used by
+        #  makeSet_fast().
+        #
+        if 'makeSet' in self.__dict__:
+            del self.makeSet
+
+    #
+    #  Generate all the states which haven't been generated yet.
+    #
+    def expandStateMachine(self):
+        #
+        #  XXX - should find a better way to do this..
+        #
+        changes = 1
+        while changes:
+            changes = 0
+            for k, v in list(self.edges.items()):
+                if v is None:
+                    state, sym = k
+                    if state in self.states:
+                        self.goto(state, sym)
+                        changes = 1
+
+    #
+    #  Add rules to already generated state machine, instead of
+    #  regenerating it from scratch.  Existing states which predict
+    #  LHS of new rule get new item, and their transitions on the
+    #  first symbol of the rule are reset to be generated again;
+    #  everything else is kept.  This is possible only when rule
+    #  doesn't touch nullable symbols and doesn't make its state
+    #  predict anything new, i.e. its first symbol is a terminal or
+    #  is predicted along with LHS already.  Returns false, leaving
+    #  state machine untouched, when any of the rules can't be added.
+    #
+    def extendStateMachine(self, rules):
+        for lhs, rhs in rules:
+            if lhs == self._START or lhs not in self.nullable or len(rhs) == 0:
+                return 0
+            for sym in rhs:
+                if sym in self.rules and (sym not in self.nullable or self.nullable[sym]):
+                    return 0
+            first = rhs[0]
+            if first in self.rules and first not in self.predictedBy(lhs):
+                return 0
+
+        for rule in rules:
+            self.newrules[rule[0]].append(rule)
+            self.new2old[rule] = rule
+
+        for state in list(self.states.values()):
+            #
+            #  Predicted items have nothing but nullable symbols
+            #  before the dot; kernel items always have something.
+            #
+            predicted = set()
+            for rule, pos in state.items:
+                if pos == self.skip(rule):
+                    predicted.add(rule[0])
+            for rule in rules:
+                lhs, rhs = rule
+                if lhs not in predicted:
+                    continue
+                state.items.append((rule, 0))
+                key = (state.stateno, rhs[0])
+                if rhs[0] not in self.newrules and key not in self.edges:
+                    state.T.append(rhs[0])
+                self.edges[key] = None
+
+        self.ruleschanged = 0
+        self.resetFirst()
+        if 'makeSet' in self.__dict__:
+            self.expandStateMachine()
+        return 1
+
+    #
+    #  Set of nonterminals which get predicted when nonterminal nt is.
+    #
+    def predictedBy(self, nt):
+        rv = {nt: 1}
+        worklist = [nt]
+        for nt in worklist:
+            for rule in self.newrules[nt]:
+                lhs, rhs = rule
+                pos = self.skip(rule)
+                if pos < len(rhs) and rhs[pos] in self.newrules and rhs[pos] not in rv:
+                    rv[rhs[pos]] = 1
+                    worklist.append(rhs[pos])
+        return rv
+
+    #
+    #  Unlike pickling, export keeps everything needed to continue
+    #  generating states, and import of fully expanded state machine
+    #  switches parser to makeSet_fast().
+    #
+    _MACHINE = ('nullable', 'newrules', 'new2old', 'edges', 'cores', 'states')
+
+    def exportStateMachine(self):
+        return dict((name, getattr(self, name)) for name in self._MACHINE)
+
+    def importStateMachine(self, D):
+        for name in self._MACHINE:
+            setattr(self, name, D[name])
+        self.ruleschanged = 0
+        self.resetFirst()
+        self.makeSet = self.makeSet_fast
 
     #
     #  A hook for GenericASTBuilder and GenericASTMatcher.  Mess
@@ -184,7 +322,9 @@ class GenericParser:
         # TODO: switched from
         # rules = string.split(doc)
         # check that has the same functionality
-        rules = doc.split()
+        # Symbols are interned, so that lookups of typed terminals
+        # in edges can succeed on identity check
+        rules = [sys.intern(sym) for sym in doc.split()]
 
         index = []
         for i in range(len(rules)):
@@ -192,6 +332,7 @@ class GenericParser:
                 index.append(i-1)
         index.append(len(rules))
 
+        added = []
         for i in range(len(index)-1):
             lhs = rules[index[i]]
             rhs = rules[index[i]+2:index[i+1]]
@@ -206,7 +347,9 @@ class GenericParser:
                 self.rules[lhs] = [ rule ]
             self.rule2func[rule] = fn
             self.rule2name[rule] = func.__name__[2:]
+            added.append(rule)
         self.ruleschanged = 1
+        return added
 
     def collectRules(self):
         for name in _namelist(self):
@@ -255,6 +398,80 @@ class GenericParser:
                     self.nullable[lhs] = 1
                     changes = 1
 
+    #
+    #  FIRST sets of nonterminals, i.e. terminals their derivations
+    #  can start with.  Rules of G_e never derive empty string, so
+    #  only the first symbol after nullable ones counts.
+    #
+    def computeFirst(self):
+        first = {}
+        for lhs in self.newrules:
+            first[lhs] = set()
+        changes = 1
+        while changes:
+            changes = 0
+            for lhs, rules in self.newrules.items():
+                rv = first[lhs]
+                n = len(rv)
+                for rule in rules:
+                    pos = self.skip(rule)
+                    if pos == len(rule[1]):
+                        continue
+                    sym = rule[1][pos]
+                    if sym in first:
+                        rv.update(first[sym])
+                    else:
+                        rv.add(sym)
+                if len(rv) != n:
+                    changes = 1
+        self.first = first
+
+    def resetFirst(self):
+        self.first = None
+        self.firsts = _Firsts(self.stateFirst)
+
+    #
+    #  Terminals which item of the state needs to see next to make
+    #  any progress, or None if the state completes something and
+    #  thus is useful whatever comes next.
+    #
+    def stateFirst(self, state):
+        items = getattr(self.states[state], 'items', None)
+        if items is None:
+            return None
+        if self.first is None:
+            self.computeFirst()
+        rv = set()
+        for rule, pos in items:
+            rhs = rule[1]
+            if pos == len(rhs):
+                return None
+            sym = rhs[pos]
+            if sym in self.first:
+                rv.update(self.first[sym])
+            else:
+                rv.add(sym)
+        return rv
+
+    #
+    #  Drop items which can't make use of the upcoming token, so
+    #  that they aren't scanned and aren't found when completing.
+    #  Items can't be dropped at the end of input, that's where
+    #  the final item is looked for.
+    #
+    def pruneSet(self, items, i, ttype):
+        firsts = self.firsts
+        kept = []
+        for item in items:
+            first = firsts[item[0]]
+            if first is None or ttype in first:
+                kept.append(item)
+            else:
+                self.links.pop((item, i), None)
+        if len(kept) < len(items):
+            items[:] = kept
+            items.index = set(kept)
+
     def makeState0(self):
         s0 = _State(0, [])
         for rule in self.newrules[self._START]:
@@ -312,31 +529,33 @@ class GenericParser:
         raise SystemExit
 
     def parse(self, tokens):
-        sets = [ [(1,0), (2,0)] ]
+        sets = [ _ItemSet([(1,0), (2,0)]) ]
         self.links = {}
 
         if self.ruleschanged:
-            self.computeNull()
-            self.newrules = {}
-            self.new2old = {}
-            self.makeNewRules()
-            self.ruleschanged = 0
-            self.edges, self.cores = {}, {}
-            self.states = { 0: self.makeState0() }
-            self.makeState(0, self._BOF)
+            self.makeStateMachine()
+
+        if self.leo:
+            self.leoStart(tokens)
 
         for i in range(len(tokens)):
-            sets.append([])
+            sets.append(_ItemSet())
 
-            if sets[i] == []:
+            if not sets[i]:
                 break
             self.makeSet(tokens[i], sets, i)
         else:
-            sets.append([])
+            sets.append(_ItemSet())
             self.makeSet(None, sets, len(tokens))
 
         #_dump(tokens, sets, self.states)
 
+        #
+        #  Size of the last parse, for statistics.
+        #
+        self.setCount = len(sets)
+        self.itemCount = sum(len(s) for s in sets)
+
         finalitem = (self.finalState(tokens), 0)
         if finalitem not in sets[-2]:
             if len(tokens) > 0:
@@ -482,6 +701,20 @@ class GenericParser:
                 set.append(item)
             self.links[key].append((predecessor, causal))
 
+    #
+    #  Items of finished Earley set which have transition on sym,
+    #  along with state the transition leads to.
+    #
+    def waiting(self, set, sym):
+        rv = set.waiting.get(sym)
+        if rv is None:
+            rv = set.waiting[sym] = []
+            for item in set:
+                k = self.goto(item[0], sym)
+                if k is not None:
+                    rv.append((item, k))
+        return rv
+
     def makeSet(self, token, sets, i):
         cur, next = sets[i], sets[i+1]
 
@@ -490,6 +723,10 @@ class GenericParser:
             fn, arg = self.gotoT, ttype
         else:
             fn, arg = self.gotoST, token
+        lookahead = ttype is not None and self.lookahead
+        if lookahead:
+            self.pruneSet(cur, i, ttype)
+        firsts = self.firsts
 
         for item in cur:
             ptr = (item, i)
@@ -507,16 +744,23 @@ class GenericParser:
 
             for rule in self.states[state].complete:
                 lhs, rhs = rule
-                for pitem in sets[parent]:
+                why = (item, i, rule)
+                pset = parent
+                if self.leo:
+                    pset, lhs, why = self.leoComplete(sets, parent, lhs, why, i)
+                    if why is None:
+                        continue
+                for pitem, k in self.waiting(sets[pset], lhs):
                     pstate, pparent = pitem
-                    k = self.goto(pstate, lhs)
-                    if k is not None:
-                        why = (item, i, rule)
-                        pptr = (pitem, parent)
+                    pptr = (pitem, pset)
+                    first = lookahead and firsts[k]
+                    if not first or ttype in first:
                         self.add(cur, (k, pparent),
                              i, pptr, why)
-                        nk = self.goto(k, None)
-                        if nk is not None:
+                    nk = self.goto(k, None)
+                    if nk is not None:
+                        first = lookahead and firsts[nk]
+                        if not first or ttype in first:
                             self.add(cur, (nk, i))
 
     def makeSet_fast(self, token, sets, i):
@@ -528,6 +772,10 @@ class GenericParser:
         #
         cur, next = sets[i], sets[i+1]
         ttype = token is not None and self.typestring(token) or None
+        lookahead = ttype is not None and self.lookahead
+        if lookahead:
+            self.pruneSet(cur, i, ttype)
+        firsts = self.firsts
 
         for item in cur:
             ptr = (item, i)
@@ -568,13 +816,17 @@ class GenericParser:
 
             for rule in self.states[state].complete:
                 lhs, rhs = rule
-                for pitem in sets[parent]:
+                why = (item, i, rule)
+                pset = parent
+                if self.leo:
+                    pset, lhs, why = self.leoComplete(sets, parent, lhs, why, i)
+                    if why is None:
+                        continue
+                for pitem, k in self.waiting(sets[pset], lhs):
                     pstate, pparent = pitem
-                    #k = self.goto(pstate, lhs)
-                    k = self.edges.get((pstate, lhs), None)
-                    if k is not None:
-                        why = (item, i, rule)
-                        pptr = (pitem, parent)
+                    pptr = (pitem, pset)
+                    first = lookahead and firsts[k]
+                    if not first or ttype in first:
                         #self.add(cur, (k, pparent),
                         #	 i, pptr, why)
                         #INLINED --v
@@ -585,9 +837,11 @@ class GenericParser:
                             cur.append(new)
                         self.links[key].append((pptr, why))
                         #INLINED --^
-                        #nk = self.goto(k, None)
-                        nk = self.edges.get((k, None), None)
-                        if nk is not None:
+                    #nk = self.goto(k, None)
+                    nk = self.edges.get((k, None), None)
+                    if nk is not None:
+                        first = lookahead and firsts[nk]
+                        if not first or ttype in first:
                             #self.add(cur, (nk, i))
                             #INLINED --v
                             new = (nk, i)
@@ -595,14 +849,109 @@ class GenericParser:
                                 cur.append(new)
                             #INLINED --^
 
+    #
+    #  Right recursion support, as per J. M. I. M. Leo, "A General
+    #  Context-Free Parsing Algorithm Running in Linear Time on Every
+    #  LR(k) Grammar Without Using Lookahead", Theoretical Computer
+    #  Science 82(1), pp. 165-176, 1991.  When completion of sym
+    #  started at set j yields single item, and the only thing that
+    #  item can do is to complete single rule in turn, the item is
+    #  not added to Earley set; completion proceeds right to the top
+    #  of such deterministic chain.  Chains are memoized per (j, sym),
+    #  so completing right-recursive rule costs constant time instead
+    #  of time proportional to recursion depth.  Links of skipped
+    #  items are materialized only when building the tree needs them.
+    #  Ambiguity between rules is resolved the same way as without
+    #  Leo items; when the same rule derives span in several ways,
+    #  pick depends on order of links, which isn't preserved.
+    #
+    #  Chain node is [item, predecessor, rule, next node, last node].
+    #
+    def leoStart(self, tokens):
+        self.leoMemo = {}
+        self.leoPure = {}
+        self.leoTops = {}
+        self.leoPending = {}
+        self.leoFinal = self.finalState(tokens)
+
+    def leoIsPure(self, state):
+        rv = self.leoPure.get(state)
+        if rv is None:
+            X = self.states[state]
+            items = getattr(X, 'items', None)
+            rv = (state != self.leoFinal and items is not None and
+                  len(X.complete) == 1 and
+                  all(pos == len(rule[1]) for rule, pos in items))
+            self.leoPure[state] = rv
+        return rv
+
+    def leoNode(self, sets, j, sym):
+        memo = self.leoMemo
+        first = key = (j, sym)
+        chain = []
+        while key not in memo:
+            #
+            #  Provisional entry stops cycles of unit rules.
+            #
+            memo[key] = None
+            j, sym = key
+            waiting = self.waiting(sets[j], sym)
+            if len(waiting) != 1:
+                break
+            pitem, k = waiting[0]
+            if not self.leoIsPure(k):
+                break
+            rule = self.states[k].complete[0]
+            chain.append((key, [(k, pitem[1]), (pitem, j), rule, None, None]))
+            key = (pitem[1], rule[0])
+        next = memo[key]
+        for key, node in reversed(chain):
+            node[3] = next
+            node[4] = node if next is None else next[4]
+            memo[key] = next = node
+        return memo[first]
+
+    def leoComplete(self, sets, parent, lhs, why, i):
+        node = self.leoNode(sets, parent, lhs)
+        if node is None:
+            return parent, lhs, why
+        self.leoPending.setdefault(i, []).append((node, why))
+        item, rule = node[4][0], node[4][2]
+        #
+        #  Top of the chain is completed only once per set, as if the
+        #  last skipped item was added to it.
+        #
+        key = (item, i)
+        if key in self.leoTops or key in self.links:
+            return parent, lhs, None
+        self.leoTops[key] = 1
+        return item[1], rule[0], (item, i, rule)
+
+    def leoMaterialize(self, i):
+        for node, why in self.leoPending.pop(i, ()):
+            while node is not None:
+                item, pptr, rule, next = node[:4]
+                key = (item, i)
+                if key in self.links:
+                    self.links[key].append((pptr, why))
+                    break
+                self.links[key] = [(pptr, why)]
+                why = (item, i, rule)
+                node = next
+
+    def linksFor(self, key):
+        if key not in self.links and self.leo:
+            self.leoMaterialize(key[1])
+        return self.links[key]
+
     def predecessor(self, key, causal):
-        for p, c in self.links[key]:
+        for p, c in self.linksFor(key):
             if c == causal:
                 return p
         assert 0
 
     def causal(self, key):
-        links = self.links[key]
+        links = self.linksFor(key)
         if len(links) == 1:
             return links[0][1]
         choices = []
@@ -613,21 +962,46 @@ class GenericParser:
             rule2cause[rule] = c
         return rule2cause[self.ambiguity(choices)]
 
-    def deriveEpsilon(self, nt):
+    #
+    #  Tree building is done without recursion, since left-recursive
+    #  rules like "stmts ::= stmts stmt" make trees as deep as input
+    #  is long.  Each frame of the explicit stack holds rule being
+    #  built, its attributes and index of attribute being filled in.
+    #
+    def epsilonFrame(self, nt):
         if len(self.newrules[nt]) > 1:
             rule = self.ambiguity(self.newrules[nt])
         else:
             rule = self.newrules[nt][0]
         #print rule
-
         rhs = rule[1]
-        attr = [None] * len(rhs)
+        return [rule, [None] * len(rhs), len(rhs)]
 
-        for i in range(len(rhs)-1, -1, -1):
-            attr[i] = self.deriveEpsilon(rhs[i])
-        return self.rule2func[self.new2old[rule]](attr)
+    def deriveEpsilon(self, nt):
+        stack = [self.epsilonFrame(nt)]
+        rv = None
+        while 1:
+            frame = stack[-1]
+            rule, attr, i = frame
+            #
+            #  Store derived attribute, unless we just got here.
+            #
+            if i < len(attr):
+                attr[i] = rv
+            i = frame[2] = i - 1
+            if i >= 0:
+                stack.append(self.epsilonFrame(rule[1][i]))
+                continue
+            rv = self.rule2func[self.new2old[rule]](attr)
+            stack.pop()
+            if not stack:
+                return rv
 
-    def buildTree(self, nt, item, tokens, k):
+    #
+    #  Frame additionally holds current item and Earley set number,
+    #  and causal, if nonterminal attribute is being built.
+    #
+    def treeFrame(self, nt, item, k):
         state, parent = item
 
         choices = []
@@ -640,25 +1014,45 @@ class GenericParser:
         #print rule
 
         rhs = rule[1]
-        attr = [None] * len(rhs)
+        return [rule, [None] * len(rhs), len(rhs)-1, item, k, None]
 
-        for i in range(len(rhs)-1, -1, -1):
-            sym = rhs[i]
-            if sym not in self.newrules:
-                if sym != self._BOF:
-                    attr[i] = tokens[k-1]
+    def buildTree(self, nt, item, tokens, k):
+        stack = [self.treeFrame(nt, item, k)]
+        rv = None
+        while 1:
+            frame = stack[-1]
+            rule, attr, i, item, k, why = frame
+            rhs = rule[1]
+            if why is not None:
+                attr[i] = rv
+                item, k = self.predecessor((item, k), why)
+                why = None
+                i = i - 1
+
+            while i >= 0:
+                sym = rhs[i]
+                if sym not in self.newrules:
+                    if sym != self._BOF:
+                        attr[i] = tokens[k-1]
+                        key = (item, k)
+                        item, k = self.predecessor(key, None)
+                #elif self.isnullable(sym):
+                elif self._NULLABLE == sym[0:len(self._NULLABLE)]:
+                    attr[i] = self.deriveEpsilon(sym)
+                else:
                     key = (item, k)
-                    item, k = self.predecessor(key, None)
-            #elif self.isnullable(sym):
-            elif self._NULLABLE == sym[0:len(self._NULLABLE)]:
-                attr[i] = self.deriveEpsilon(sym)
-            else:
-                key = (item, k)
-                why = self.causal(key)
-                attr[i] = self.buildTree(sym, why[0],
-                             tokens, why[1])
-                item, k = self.predecessor(key, why)
-        return self.rule2func[self.new2old[rule]](attr)
+                    why = self.causal(key)
+                    break
+                i = i - 1
+
+            frame[2:] = [i, item, k, why]
+            if why is not None:
+                stack.append(self.treeFrame(sym, why[0], why[1]))
+                continue
+            rv = self.rule2func[self.new2old[rule]](attr)
+            stack.pop()
+            if not stack:
+                return rv
 
     def ambiguity(self, rules):
         #
@@ -734,9 +1128,18 @@ class GenericASTBuilder(GenericParser):
 class GenericASTTraversalPruningException(Exception):
     pass
 
+_PRUNE = object()
+
 class GenericASTTraversal:
+    #
+    #  Handlers may return PRUNE instead of calling prune(), which
+    #  avoids raising an exception per pruned node.
+    #
+    PRUNE = _PRUNE
+
     def __init__(self, ast):
         self.ast = ast
+        self.handlers = {}
 
     def typestring(self, node):
         return node.type
@@ -744,27 +1147,42 @@ class GenericASTTraversal:
     def prune(self):
         raise GenericASTTraversalPruningException
 
+    #
+    #  Handler and exit hook for nodes of given type are looked up
+    #  once, and cached afterwards.
+    #
+    def dispatch(self, type):
+        name = 'n_' + type
+        if hasattr(self, name):
+            func = getattr(self, name)
+        else:
+            func = self.default
+        exit = getattr(self, name + '_exit', None)
+        rv = self.handlers[type] = (func, exit)
+        return rv
+
     def preorder(self, node=None):
         if node is None:
             node = self.ast
 
+        type = self.typestring(node)
+        handlers = self.handlers
+        if type in handlers:
+            func, exit = handlers[type]
+        else:
+            func, exit = self.dispatch(type)
+
         try:
-            name = 'n_' + self.typestring(node)
-            if hasattr(self, name):
-                func = getattr(self, name)
-                func(node)
-            else:
-                self.default(node)
+            if func(node) is _PRUNE:
+                return
         except GenericASTTraversalPruningException:
             return
 
         for kid in node:
             self.preorder(kid)
 
-        name = name + '_exit'
-        if hasattr(self, name):
-            func = getattr(self, name)
-            func(node)
+        if exit is not None:
+            exit(node)
 
     def postorder(self, node=None):
         if node is None:
@@ -773,12 +1191,12 @@ class GenericASTTraversal:
         for kid in node:
             self.postorder(kid)
 
-        name = 'n_' + self.typestring(node)
-        if hasattr(self, name):
-            func = getattr(self, name)
-            func(node)
+        type = self.typestring(node)
+        if type in self.handlers:
+            func, exit = self.handlers[type]
         else:
-            self.default(node)
+            func, exit = self.dispatch(type)
+        func(node)
 
 
     def default(self, node):
@@ -43,3 +43,37 @@ Reformat = namedtuple('Reformat', ('match', 'sub'))
 class StackData(namedtuple('StackData', ('data', 'precedence'))):
     def __new__(cls, data, precedence=None):
         return tuple.__new__(cls, (data, precedence))
+
+
+# Decompiled nested code object: parameter names for functions
+# (None for class bodies), and source of body without indentation
+CodeBody = namedtuple('CodeBody', ('positional', 'varargs', 'kwonly', 'varkw', 'source'))
+
+
+# String composed of fragments, which are strings or other ropes. It
+# allows to compose text of nested nodes without copying, actual string
+# is made only once, when whole rope is converted to it
+class Rope:
+    __slots__ = ('parts',)
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    def __str__(self):
+        # Ropes are as deep as expressions are, so flatten
+        # them without recursion
+        strings = []
+        stack = [self]
+        while stack:
+            part = stack.pop()
+            if part.__class__ is Rope:
+                stack.extend(reversed(part.parts))
+            else:
+                strings.append(part)
+        return ''.join(strings)
+
+    def __format__(self, format_spec):
+        return format(str(self), format_spec)
+
+    def __repr__(self):
+        return 'Rope({!r})'.format(str(self))
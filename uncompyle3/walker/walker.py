@@ -1,12 +1,14 @@
 import re
+from string import Formatter
 
 from uncompyle3.utils.spark import GenericASTTraversal
 from uncompyle3.utils.debug import debug
-from .containers import NodeInfo, FormatChild, FormatRange, FormatAttr, IndentCurrent, IndentIncrease, IndentDecrease, Reformat, StackData
+from .containers import NodeInfo, FormatChild, FormatRange, FormatAttr, IndentCurrent, IndentIncrease, IndentDecrease, Reformat, Rope, StackData
 from .exception import UnknownParameterError
 
 
 INDENT_STEP = ' ' * 4
+INDENT_PATTERN = re.compile('^(?=.)', re.MULTILINE)
 
 
 TABLE_DIRECT = {
@@ -62,6 +64,12 @@ TABLE_DIRECT = {
     'LOAD_CONST':           NodeInfo('{}', (FormatAttr('pattr'),)),
     'assign':               NodeInfo('{}{} = {}\n', (IndentCurrent(), FormatChild(-1), FormatChild(0, 200))),
     'STORE_NAME':           NodeInfo('{}', (FormatAttr('pattr'),)),
+    # Functions & classes
+    'return_stmt':          NodeInfo('{}return {}\n', (IndentCurrent(), FormatChild(0, 200))),
+    'LOAD_FAST':            NodeInfo('{}', (FormatAttr('pattr'),)),
+    'LOAD_GLOBAL':          NodeInfo('{}', (FormatAttr('pattr'),)),
+    'LOAD_DEREF':           NodeInfo('{}', (FormatAttr('pattr'),)),
+    'STORE_FAST':           NodeInfo('{}', (FormatAttr('pattr'),)),
     'kwarg':                NodeInfo('{}={}', (FormatAttr('pattr', 0, Reformat('^\'(?P<data>.*)\'$', '\g<data>')), FormatChild(1))),
     'compare':              NodeInfo('{} {} {}', (FormatChild(0, 19), FormatAttr('pattr', -1), FormatChild(1, 19))),
 }
@@ -99,30 +107,237 @@ PRECEDENCE = {
 }
 
 
+# Compiled entries of TABLE_DIRECT, filled on first use
+RENDERERS = {}
+
+
+def compile_reformat(reformat):
+    pattern = re.compile(reformat.match)
+    return lambda data: pattern.sub(reformat.sub, str(data))
+
+
+def fragment(data):
+    """
+    Convert data of stack item into something rope can contain.
+    """
+    if data.__class__ is str or data.__class__ is Rope:
+        return data
+    return format(data, '')
+
+
+def join_fragments(separator, fragments):
+    """
+    Rope analog of str.join().
+    """
+    parts = []
+    for data in fragments:
+        if parts and separator:
+            parts.append(separator)
+        parts.append(fragment(data))
+    return Rope(parts)
+
+
+def compile_argument(arg):
+    """
+    Compile formatting parameter <arg> into function which does
+    the same to walker state as Walker.engine() does for it.
+    """
+    if isinstance(arg, IndentCurrent):
+        def run(walker, node, datastack):
+            datastack.append(StackData(walker.indent))
+    elif isinstance(arg, IndentIncrease):
+        def run(walker, node, datastack):
+            walker.indent += INDENT_STEP
+            datastack.append(StackData(''))
+    elif isinstance(arg, IndentDecrease):
+        def run(walker, node, datastack):
+            walker.indent = walker.indent[:-4]
+            datastack.append(StackData(''))
+    elif isinstance(arg, FormatChild):
+        child = arg.child
+        if arg.reformat is None:
+            def run(walker, node, datastack):
+                walker.preorder(node[child])
+        else:
+            reformat = compile_reformat(arg.reformat)
+            def run(walker, node, datastack):
+                walker.preorder(node[child])
+                word_old = datastack[-1]
+                datastack[-1] = StackData(reformat(word_old.data), word_old.precedence)
+    elif isinstance(arg, FormatRange):
+        first, last, separator = arg.first, arg.last, arg.separator
+        reformat = compile_reformat(arg.reformat) if arg.reformat is not None else None
+        def run(walker, node, datastack):
+            subnodes = node[first:last]
+            for subnode in subnodes:
+                walker.preorder(subnode)
+            subnodenum = len(subnodes)
+            if subnodenum == 0:
+                datastack.append(StackData(''))
+                return
+            data = join_fragments(separator, [word.data for word in datastack[-subnodenum:]])
+            del datastack[-subnodenum:]
+            if reformat is not None:
+                data = reformat(data)
+            datastack.append(StackData(data))
+    elif isinstance(arg, FormatAttr):
+        attrname, child = arg.attrname, arg.child
+        reformat = compile_reformat(arg.reformat) if arg.reformat is not None else None
+        def run(walker, node, datastack):
+            data = getattr(node[child] if child is not None else node, attrname)
+            if reformat is not None:
+                data = reformat(data)
+            datastack.append(StackData(data))
+    else:
+        raise UnknownParameterError(arg)
+    return run
+
+
+def split_format(format_, arglen):
+    """
+    Split format string into literal text around its replacement
+    fields. Return list of <arglen> + 1 strings, or None if format
+    string has anything besides <arglen> plain {} fields.
+    """
+    literals = []
+    for literal, field_name, format_spec, conversion in Formatter().parse(format_):
+        literals.append(literal)
+        if field_name is None:
+            break
+        if field_name or format_spec or conversion:
+            return None
+    else:
+        literals.append('')
+    if len(literals) != arglen + 1:
+        return None
+    return literals
+
+
+def compile_template(info):
+    """
+    Compile table entry <info> into function, which renders node
+    onto walker's data stack with the same result as interpreting
+    the entry by Walker.engine() has.
+    """
+    format_ = info.format
+    arglen = len(info.arguments)
+    # Constant strings, like operators
+    if arglen == 0:
+        word = StackData(format_)
+        def render(walker, node):
+            walker.datastack.append(word)
+        return render
+    # Attributes of tokens, like names
+    if arglen == 1 and isinstance(info.arguments[0], FormatAttr):
+        arg = info.arguments[0]
+        if arg.child is None and arg.reformat is None:
+            attrname = arg.attrname
+            def render(walker, node):
+                walker.datastack.append(StackData(format_.format(getattr(node, attrname))))
+            return render
+    runs = [compile_argument(arg) for arg in info.arguments]
+    literals = split_format(format_, arglen)
+    if literals is None:
+        def compose(fragments):
+            return format_.format(*fragments)
+    else:
+        # Data of children is put between literal parts of format
+        # string into rope, rather than copied into new string
+        tail = literals[-1]
+        def compose(fragments):
+            parts = []
+            for literal, data in zip(literals, fragments):
+                if literal:
+                    parts.append(literal)
+                parts.append(fragment(data))
+            if tail:
+                parts.append(tail)
+            return Rope(parts)
+    def render(walker, node):
+        datastack = walker.datastack
+        for run in runs:
+            run(walker, node, datastack)
+        data = compose([word.data for word in datastack[-arglen:]])
+        del datastack[-arglen:]
+        datastack.append(StackData(data))
+    return render
+
+
+def indent_source(source, indent):
+    """
+    Prepend <indent> to each non-empty line of <source>.
+    """
+    return INDENT_PATTERN.sub(indent, source)
+
+
+def get_renderer(key):
+    """
+    Get compiled renderer for nodes of type <key>.
+    """
+    render = RENDERERS.get(key)
+    if render is None:
+        render = RENDERERS[key] = compile_template(TABLE_DIRECT[key])
+    return render
+
+
 class Walker(GenericASTTraversal):
 
-    def __init__(self):
+    def __init__(self, compiled=True):
         self.indent = ''
+        # Render nodes using compiled TABLE_DIRECT entries, rather
+        # than interpret them
+        self.compiled = compiled
         GenericASTTraversal.__init__(self, ast=None)
 
-    def gen_source(self, ast):
+    def gen_source(self, ast, bodies=None):
+        return ''.join(self.iter_source(ast, bodies))
+
+    def iter_source(self, ast, bodies=None):
+        """
+        Generate source code of <ast> piece by piece: text of each
+        top-level statement is yielded as soon as it is rendered.
+        <bodies> maps indices of nested code objects in constants
+        to their CodeBody.
+        """
         self.datastack = []
-        self.preorder(ast)
-        return ''.join(item.data for item in self.datastack)
+        self.bodies = bodies if bodies is not None else {}
+        # Top-level statements are rendered one by one, with data
+        # stack emptied after each of them
+        statements = []
+        node = ast
+        while node.type == 'stmts' and len(node) == 2:
+            statements.append(node[1])
+            node = node[0]
+        statements.append(node)
+        for statement in reversed(statements):
+            self.preorder(statement)
+            for item in self.datastack:
+                yield str(item.data)
+            del self.datastack[:]
+
+    def write_source(self, ast, sink):
+        """
+        Write source code of <ast> into file-like object <sink>.
+        """
+        for text in self.iter_source(ast):
+            sink.write(text)
 
     def default(self, node):
-        debug('walker.default({})'.format(''))
-        table = TABLE_DIRECT
         key = node.type
+        debug('walker.default({})', key)
+        table = TABLE_DIRECT
         if key in table:
-            self.engine(table[key], node)
-            self.prune()
+            if self.compiled:
+                get_renderer(key)(self, node)
+            else:
+                self.engine(table[key], node)
+            return self.PRUNE
         else:
             debug('leaving walker.default(), no key')
 
     def engine(self, info, node):
         debug('walker.engine()')
-        debug('entry: \"{}\"'.format(info))
+        debug('entry: "{}"', info)
         for arg in info.arguments:
             if isinstance(arg, IndentCurrent):
                 debug("picked IndentCurrent")
@@ -153,7 +368,7 @@ class Walker(GenericASTTraversal):
                 if subnodenum == 0:
                     word = StackData('')
                 else:
-                    data = arg.separator.join(word.data for word in self.datastack[-subnodenum:])
+                    data = arg.separator.join(str(word.data) for word in self.datastack[-subnodenum:])
                     del self.datastack[-subnodenum:]
                     if arg.reformat is not None:
                         data = self.__reformat(arg.reformat, data)
@@ -177,10 +392,25 @@ class Walker(GenericASTTraversal):
             del self.datastack[-arglen:]
             word = StackData(data)
         self.datastack.append(word)
-        debug("Engine:", self.datastack)
+        # Only the result, dumping whole stack for each node would
+        # make trace quadratic
+        debug('Engine: {}', word.data)
 
     def __reformat(self, reformat, data):
-        return re.sub(reformat.match, reformat.sub, data)
+        return re.sub(reformat.match, reformat.sub, str(data))
+
+    def n_stmts(self, node):
+        # Left-recursive statement sequence makes tree as deep as
+        # there are statements, so walk down the left side of it
+        # here rather than recursively
+        statements = []
+        while len(node) == 2:
+            statements.append(node[1])
+            node = node[0]
+        statements.append(node[0])
+        for statement in reversed(statements):
+            self.preorder(statement)
+        return self.PRUNE
 
     def n_binary_expr(self, node):
         # Run engine on child nodes to fill the stack
@@ -199,19 +429,19 @@ class Walker(GenericASTTraversal):
         # its operation has bigger precedence, in case with equal precedence it's
         # implied that left part is executed first.
         if p_oper is not None and p_left is not None and p_left > p_oper:
-            data_left = '({})'.format(data_left)
+            data_left = Rope(['(', fragment(data_left), ')'])
         # With right part we add parenthesis even in case of equal precedences -
         # despite it has the same arithemtical meaning with or without them,
         # python calculates parenthized part first, and we must reflect it
         # in the source
         if p_oper is not None and p_right is not None and p_right >= p_oper:
-            data_right = '({})'.format(data_right)
+            data_right = Rope(['(', fragment(data_right), ')'])
         # Form word and modify the stack
-        data = '{} {} {}'.format(data_left, data_oper, data_right)
+        data = Rope([fragment(data_left), ' ', fragment(data_oper), ' ', fragment(data_right)])
         word_new = StackData(data, p_oper)
         del self.datastack[-3:]
         self.datastack.append(word_new)
-        self.prune()
+        return self.PRUNE
 
     def format_logic(self, node):
         # Almost the same as binary expression processing, with except for 2 things:
@@ -227,13 +457,70 @@ class Walker(GenericASTTraversal):
         data_oper = TABLE_DIRECT.get(node.type).format
         data_right = self.datastack[-1].data
         if p_oper is not None and p_left is not None and p_left > p_oper:
-            data_left = '({})'.format(data_left)
+            data_left = Rope(['(', fragment(data_left), ')'])
         if p_oper is not None and p_right is not None and p_right > p_oper:
-            data_right = '({})'.format(data_right)
-        data = '{} {} {}'.format(data_left, data_oper, data_right)
+            data_right = Rope(['(', fragment(data_right), ')'])
+        data = Rope([fragment(data_left), ' ', fragment(data_oper), ' ', fragment(data_right)])
         word_new = StackData(data, p_oper)
         del self.datastack[-2:]
         self.datastack.append(word_new)
-        self.prune()
+        return self.PRUNE
 
     n_or = n_and = format_logic
+
+    def n_funcdef(self, node):
+        mkfunc = node[0]
+        body = self.bodies[mkfunc[-3].attr]
+        self.preorder(node[1])
+        name = self.datastack.pop().data
+        # Default values are expressions for positional parameters,
+        # followed by keyword-only ones, rendered as name=value
+        defaults = mkfunc[:-3]
+        for child in defaults:
+            self.preorder(child)
+        values = [word.data for word in self.datastack[len(self.datastack) - len(defaults):]]
+        del self.datastack[len(self.datastack) - len(defaults):]
+        positional_defaults = [value for child, value in zip(defaults, values) if child.type == 'expr']
+        kwonly_defaults = {}
+        for child, value in zip(defaults, values):
+            if child.type == 'kwarg':
+                kwonly_defaults[child[0].pattr[1:-1]] = value
+        params = []
+        first_default = len(body.positional) - len(positional_defaults)
+        for i, param in enumerate(body.positional):
+            if i >= first_default:
+                params.append(Rope([param, '=', fragment(positional_defaults[i - first_default])]))
+            else:
+                params.append(param)
+        if body.varargs is not None:
+            params.append('*{}'.format(body.varargs))
+        elif body.kwonly:
+            params.append('*')
+        for param in body.kwonly:
+            if param in kwonly_defaults:
+                params.append(fragment(kwonly_defaults[param]))
+            else:
+                params.append(param)
+        if body.varkw is not None:
+            params.append('**{}'.format(body.varkw))
+        header = Rope([self.indent, 'def ', fragment(name), '(', join_fragments(', ', params), '):\n'])
+        self.datastack.append(StackData(Rope([header, indent_source(body.source, self.indent + INDENT_STEP)])))
+        return self.PRUNE
+
+    def n_classdef(self, node):
+        mkfunc = node[1]
+        body = self.bodies[mkfunc[-3].attr]
+        self.preorder(node[-1])
+        name = self.datastack.pop().data
+        # Skip class name, which is the first argument of builder
+        bases = node[3:-2]
+        for child in bases:
+            self.preorder(child)
+        values = [word.data for word in self.datastack[len(self.datastack) - len(bases):]]
+        del self.datastack[len(self.datastack) - len(bases):]
+        parts = [self.indent, 'class ', fragment(name)]
+        if values:
+            parts.extend(('(', join_fragments(', ', values), ')'))
+        parts.append(':\n')
+        self.datastack.append(StackData(Rope([Rope(parts), indent_source(body.source, self.indent + INDENT_STEP)])))
+        return self.PRUNE